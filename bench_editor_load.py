@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Нагрузочное сравнение режимов клиента PostEditor: 'thread' (синхронный клиент
+в потоках executor'а) и 'async' (общий пул keep-alive соединений + семафор)
+
+Запросы уходят на локальный фейковый OpenAI-совместимый сервер с заданной задержкой:
+    python bench_editor_load.py [--latency 0.5] [--concurrency 8 32 128]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from news_compressor import estimate_tokens
+
+from post_editor import PostEditor
+
+ORIGINAL_POST = "<b>Главное за день</b>\n\nЦентробанк сохранил ставку. Инфляция замедляется."
+
+
+class FakeOpenAIServer:
+    """Минимальный HTTP/1.1 сервер с keep-alive, отвечающий на chat/completions"""
+
+    def __init__(
+        self,
+        latency: Union[float, Callable[[], float]],
+        error_rate: float = 0.0,
+        reply: Optional[Callable[[Dict], Tuple[str, float]]] = None
+    ):
+        """
+        Args:
+            latency: Задержка ответа (сек) или функция, возвращающая задержку для каждого запроса
+            error_rate: Доля запросов, на которые сервер отвечает 500
+            reply: Функция (тело запроса) -> (ответ модели, дополнительная задержка в сек)
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.reply = reply
+        self.connections = 0
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.port = 0
+        self._loop = asyncio.new_event_loop()
+        self._started = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    def start(self):
+        """Запустить сервер в отдельном потоке со своим event loop"""
+        self._thread.start()
+        self._started.wait()
+
+    def stop(self):
+        """Остановить сервер"""
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def reset(self):
+        """Сбросить счетчики соединений, запросов и токенов"""
+        self.connections = 0
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, '127.0.0.1', 0, backlog=1024)
+        )
+        self.port = server.sockets[0].getsockname()[1]
+        self._started.set()
+        self._loop.run_forever()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b'\r\n\r\n')
+                headers = {}
+                for line in head.decode('latin-1').split('\r\n')[1:]:
+                    if ':' in line:
+                        name, value = line.split(':', 1)
+                        headers[name.strip().lower()] = value.strip()
+                request = json.loads(await reader.readexactly(int(headers.get('content-length', '0'))) or b'{}')
+
+                self.requests += 1
+                delay = self.latency() if callable(self.latency) else self.latency
+                content = ORIGINAL_POST + " Отредактировано."
+                if self.reply is not None:
+                    content, extra_delay = self.reply(request)
+                    delay += extra_delay
+                await asyncio.sleep(delay)
+
+                if random.random() < self.error_rate:
+                    body = json.dumps({'error': {'message': 'fake overload', 'type': 'server_error'}}).encode('utf-8')
+                    writer.write(
+                        b'HTTP/1.1 500 Internal Server Error\r\n'
+                        b'Content-Type: application/json\r\n'
+                        b'Connection: keep-alive\r\n'
+                        + f'Content-Length: {len(body)}\r\n\r\n'.encode('ascii')
+                        + body
+                    )
+                    await writer.drain()
+                    continue
+
+                prompt_tokens = sum(
+                    estimate_tokens(str(message.get('content') or '')) for message in request.get('messages', [])
+                )
+                completion_tokens = estimate_tokens(content)
+                self.prompt_tokens += prompt_tokens
+                self.completion_tokens += completion_tokens
+                body = json.dumps({
+                    'id': f'chatcmpl-{self.requests}',
+                    'object': 'chat.completion',
+                    'created': int(time.time()),
+                    'model': 'fake',
+                    'choices': [{
+                        'index': 0,
+                        'message': {'role': 'assistant', 'content': content},
+                        'finish_reason': 'stop',
+                    }],
+                    'usage': {
+                        'prompt_tokens': prompt_tokens,
+                        'completion_tokens': completion_tokens,
+                        'total_tokens': prompt_tokens + completion_tokens,
+                    },
+                }).encode('utf-8')
+                writer.write(
+                    b'HTTP/1.1 200 OK\r\n'
+                    b'Content-Type: application/json\r\n'
+                    b'Connection: keep-alive\r\n'
+                    + f'Content-Length: {len(body)}\r\n\r\n'.encode('ascii')
+                    + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def run_load(editor: PostEditor, concurrency: int) -> Dict[str, float]:
+    """
+    Запустить одновременные правки и собрать статистику
+
+    Args:
+        editor: Редактор в нужном режиме клиента
+        concurrency: Число одновременных правок
+
+    Returns:
+        Время, задержки и число ошибок
+    """
+    latencies: List[float] = []
+    errors = 0
+
+    async def one_edit():
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            await editor.edit_post(ORIGINAL_POST, "Сделай короче")
+            latencies.append(time.perf_counter() - started)
+        except Exception:
+            errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_edit() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'elapsed': elapsed,
+        'throughput': len(latencies) / elapsed,
+        'p50': statistics.median(latencies) if latencies else 0.0,
+        'max': latencies[-1] if latencies else 0.0,
+        'errors': errors,
+    }
+
+
+async def bench_mode(server: FakeOpenAIServer, mode: str, levels: List[int], max_concurrency: int):
+    """Прогнать все уровни нагрузки для одного режима клиента"""
+    editor = PostEditor(
+        api_key='test',
+        model='fake',
+        client_mode=mode,
+        max_concurrency=max_concurrency,
+        base_url=server.base_url
+    )
+    try:
+        # Прогрев: первое соединение и импорт ленивых модулей клиента
+        await editor.edit_post(ORIGINAL_POST, "Сделай короче")
+        for concurrency in levels:
+            server.reset()
+            stats = await run_load(editor, concurrency)
+            print(
+                f"{mode:<7} {concurrency:>6} {stats['elapsed']:>8.2f}с {stats['throughput']:>8.1f}/с "
+                f"{stats['p50']:>7.2f}с {stats['max']:>7.2f}с {server.connections:>6} "
+                f"{threading.active_count():>7} {stats['errors']:>6}"
+            )
+    finally:
+        await editor.close()
+
+
+def main():
+    """Основная функция бенчмарка"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=0.5, help="задержка ответа фейкового API (сек)")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[8, 32, 128], help="одновременных правок")
+    parser.add_argument('--max-concurrency', type=int, default=64, help="лимит одновременных запросов в режиме async")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(latency=args.latency)
+    server.start()
+    print(f"📊 Нагрузка на PostEditor: задержка API {args.latency}с, лимит async {args.max_concurrency}\n")
+    print(f"{'режим':<7} {'правок':>6} {'время':>9} {'пропуск':>10} {'p50':>8} {'макс':>8} {'соед.':>6} {'потоков':>7} {'ошибок':>6}")
+
+    try:
+        for mode in ('thread', 'async'):
+            asyncio.run(bench_mode(server, mode, args.concurrency, args.max_concurrency))
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Хвостовые задержки правок PostEditor без повторов, с повторами и с хеджированием
+
+Локальный фейковый OpenAI-совместимый сервер отвечает с тяжелым хвостом задержек
+и иногда возвращает 500:
+    python bench_hedging.py [--requests 400] [--concurrency 16] [--error-rate 0.03]
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import Dict, List
+
+from bench_editor_load import ORIGINAL_POST, FakeOpenAIServer
+from post_editor import PostEditor
+from resilient_call import ResilientCaller
+
+POLICIES = {
+    'none': dict(attempts=1),
+    'retry': dict(attempts=3, base_delay=0.05),
+    'retry+hedge': dict(attempts=3, base_delay=0.05, hedge=True, hedge_quantile=0.95),
+}
+
+
+def tail_latency() -> float:
+    """Задержка ответа: в основном быстро, изредка - долгий хвост"""
+    roll = random.random()
+    if roll < 0.94:
+        return random.uniform(0.08, 0.15)
+    if roll < 0.99:
+        return random.uniform(0.6, 1.0)
+    return random.uniform(2.0, 3.0)
+
+
+def percentile(samples: List[float], q: float) -> float:
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+async def run_requests(editor: PostEditor, total: int, concurrency: int) -> Dict[str, float]:
+    """Выполнить total правок не более чем по concurrency одновременно"""
+    limit = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one_edit():
+        nonlocal errors
+        async with limit:
+            started = time.perf_counter()
+            try:
+                await editor.edit_post(ORIGINAL_POST, "Сделай короче")
+                latencies.append(time.perf_counter() - started)
+            except Exception:
+                errors += 1
+
+    await asyncio.gather(*(one_edit() for _ in range(total)))
+    latencies.sort()
+    return {
+        'p50': statistics.median(latencies) if latencies else 0.0,
+        'p95': percentile(latencies, 0.95) if latencies else 0.0,
+        'p99': percentile(latencies, 0.99) if latencies else 0.0,
+        'errors': errors,
+    }
+
+
+async def bench_policy(server: FakeOpenAIServer, name: str, total: int, concurrency: int):
+    """Прогнать нагрузку с одной политикой вызовов"""
+    caller = ResilientCaller(name=name, deadline=30, **POLICIES[name])
+    editor = PostEditor(
+        api_key='test',
+        model='fake',
+        client_mode='async',
+        max_concurrency=concurrency * 2,
+        base_url=server.base_url,
+        caller=caller
+    )
+    try:
+        # Прогрев: статистика задержек для порога хеджирования
+        await run_requests(editor, caller.min_samples * 2, concurrency)
+        caller.retries = caller.hedges = caller.hedge_wins = 0
+        server.reset()
+
+        stats = await run_requests(editor, total, concurrency)
+        print(
+            f"{name:<12} {stats['p50'] * 1000:>7.0f} {stats['p95'] * 1000:>7.0f} {stats['p99'] * 1000:>7.0f} "
+            f"{stats['errors']:>7} {caller.retries:>7} {caller.hedges:>6} {caller.hedge_wins:>7} "
+            f"{server.requests / total:>9.2f}"
+        )
+    finally:
+        await editor.close()
+
+
+def main():
+    """Основная функция бенчмарка"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=400, help="правок на политику")
+    parser.add_argument('--concurrency', type=int, default=16, help="одновременных правок")
+    parser.add_argument('--error-rate', type=float, default=0.03, help="доля ответов 500")
+    parser.add_argument('--seed', type=int, default=1, help="зерно генератора задержек")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    server = FakeOpenAIServer(latency=tail_latency, error_rate=args.error_rate)
+    server.start()
+    print(
+        f"📊 Хвостовые задержки: {args.requests} правок, {args.concurrency} одновременно, "
+        f"ошибок сервера {args.error_rate:.0%}\n"
+    )
+    print(f"{'политика':<12} {'p50 мс':>7} {'p95 мс':>7} {'p99 мс':>7} {'ошибок':>7} {'повторов':>7} {'хеджей':>6} {'выигрыш':>7} {'запр./правку':>9}")
+
+    try:
+        for name in POLICIES:
+            asyncio.run(bench_policy(server, name, args.requests, args.concurrency))
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Сравнение режимов конвейера генерации: two_step (обзор + форматирование)
+и single (пост сразу из результатов поиска)
+
+Настоящие NewsAgent и ContentFormatter обращаются к локальному фейковому
+OpenAI-совместимому серверу. Сервер отвечает записанными в фикстурах ответами
+модели, а задержку считает по размеру промпта, который собрал конвейер,
+и длине ответа:
+    python bench_pipeline.py [--prefill-ms 50] [--decode-ms 2]
+
+Перезаписать ответы модели в фикстурах живыми вызовами (нужны ключи API):
+    python bench_pipeline.py --record
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+from bench_editor_load import FakeOpenAIServer
+from news_compressor import estimate_tokens
+from post_variants import html_violations
+
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_fixtures', 'pipeline.json')
+
+MODES = ('two_step', 'single')
+
+
+class FixtureModel:
+    """Ответы фейковой модели по фикстурам: роль и тема определяются по промпту"""
+
+    def __init__(self, fixtures: List[Dict], prefill_ms_per_1k_tokens: float, decode_ms_per_token: float):
+        """
+        Args:
+            fixtures: Записанные темы, результаты поиска и ответы модели
+            prefill_ms_per_1k_tokens: Время обработки 1000 токенов промпта
+            decode_ms_per_token: Время генерации одного токена ответа
+        """
+        self.fixtures = fixtures
+        self.prefill_ms_per_1k_tokens = prefill_ms_per_1k_tokens
+        self.decode_ms_per_token = decode_ms_per_token
+        # Сырые ответы форматтера по режимам: проверяются до очистки
+        self.posts: Dict[Tuple[str, str], str] = {}
+
+    def find(self, prompt: str) -> Tuple[Dict, str, int]:
+        """Фикстура, режим и номер вызова, которым соответствует промпт"""
+        for fixture in self.fixtures:
+            analysis = fixture['modes']['two_step']['calls'][0]['content']
+            if prompt.startswith("Проанализируйте") and fixture['search_results'] in prompt:
+                return fixture, 'two_step', 0
+            if analysis in prompt:
+                return fixture, 'two_step', 1
+            if fixture['search_results'] in prompt:
+                return fixture, 'single', 0
+        raise LookupError("Промпт не соответствует ни одной фикстуре")
+
+    def __call__(self, request: Dict) -> Tuple[str, float]:
+        messages = request.get('messages', [])
+        prompt = next(
+            (str(message.get('content')) for message in reversed(messages) if message.get('role') == 'user'), ''
+        )
+        fixture, mode, index = self.find(prompt)
+        content = fixture['modes'][mode]['calls'][index]['content']
+        if index == len(fixture['modes'][mode]['calls']) - 1:
+            self.posts[(fixture['topic'], mode)] = content
+
+        prompt_tokens = sum(estimate_tokens(str(message.get('content') or '')) for message in messages)
+        delay = (
+            prompt_tokens * self.prefill_ms_per_1k_tokens / 1000
+            + estimate_tokens(content) * self.decode_ms_per_token
+        ) / 1000
+        return content, delay
+
+
+def run_pipeline(topic: str, search_results: str, mode: str, news_agent, formatters: Dict) -> str:
+    """Пройти конвейер генерации поста в заданном режиме"""
+    if mode == 'two_step':
+        analysis = news_agent.analyze_search_results(topic, search_results)
+        return formatters['two_step'].format_news_post(analysis)
+    return formatters['single'].format_news_post(search_results)
+
+
+def bench(fixtures: List[Dict], server: FakeOpenAIServer, model: FixtureModel) -> Dict[str, Dict[str, float]]:
+    """Прогнать все темы через настоящий конвейер в каждом режиме"""
+    from content_formatter import ContentFormatter
+    from news_agent import NewsAgent
+
+    news_agent = NewsAgent()
+    formatters = {mode: ContentFormatter(pipeline_mode=mode) for mode in MODES}
+
+    # Прогрев: импорт ленивых модулей клиента и первое соединение
+    run_pipeline(fixtures[0]['topic'], fixtures[0]['search_results'], 'single', news_agent, formatters)
+
+    results = {}
+    for mode in MODES:
+        latencies, prompt_tokens, completion_tokens, calls = [], [], [], []
+        for fixture in fixtures:
+            server.reset()
+            started = time.perf_counter()
+            run_pipeline(fixture['topic'], fixture['search_results'], mode, news_agent, formatters)
+            latencies.append(time.perf_counter() - started)
+            prompt_tokens.append(server.prompt_tokens)
+            completion_tokens.append(server.completion_tokens)
+            calls.append(server.requests)
+
+        passed = sum(not html_violations(model.posts[(fixture['topic'], mode)]) for fixture in fixtures)
+        results[mode] = {
+            'latency_p50': statistics.median(latencies),
+            'latency_max': max(latencies),
+            'calls': statistics.mean(calls),
+            'prompt_tokens': statistics.mean(prompt_tokens),
+            'completion_tokens': statistics.mean(completion_tokens),
+            'pass_rate': passed / len(fixtures),
+        }
+    return results
+
+
+def print_report(fixtures: List[Dict], results: Dict[str, Dict[str, float]], model: FixtureModel):
+    """Вывести сравнительную таблицу режимов"""
+    print(f"{'Режим':<10} {'p50, с':>8} {'max, с':>8} {'вызовы':>7} {'prompt':>8} {'compl.':>8} {'pass':>6}")
+    for mode, metrics in results.items():
+        print(
+            f"{mode:<10} {metrics['latency_p50']:>8.2f} {metrics['latency_max']:>8.2f} "
+            f"{metrics['calls']:>7.1f} {metrics['prompt_tokens']:>8.0f} {metrics['completion_tokens']:>8.0f} "
+            f"{metrics['pass_rate']:>6.0%}"
+        )
+
+    two_step, single = results['two_step'], results['single']
+    print(
+        f"\n⚡ single vs two_step: задержка p50 "
+        f"{single['latency_p50'] / two_step['latency_p50']:.0%}, токены "
+        f"{(single['prompt_tokens'] + single['completion_tokens']) / (two_step['prompt_tokens'] + two_step['completion_tokens']):.0%}"
+    )
+
+    for fixture in fixtures:
+        for mode in MODES:
+            violations = html_violations(model.posts[(fixture['topic'], mode)])
+            if violations:
+                print(f"⚠️ {fixture['topic']} [{mode}]: {', '.join(violations)}")
+
+
+def record(fixtures: List[Dict]) -> List[Dict]:
+    """Перезаписать результаты поиска и ответы модели живыми вызовами"""
+    from dotenv import load_dotenv
+    from content_formatter import ContentFormatter
+    from news_agent import NewsAgent
+    from news_research import NewsResearcher, format_results
+
+    load_dotenv()
+    researcher = NewsResearcher()
+    news_agent = NewsAgent()
+    formatters = {mode: ContentFormatter(pipeline_mode=mode) for mode in MODES}
+
+    def call(agent, prompt: str) -> Dict:
+        return {'content': agent.run(prompt).content or ""}
+
+    recorded = []
+    for fixture in fixtures:
+        topic = fixture['topic']
+        print(f"🔎 Запись темы: {topic}")
+        search_results = format_results(asyncio.run(researcher.search(topic)))
+
+        analysis = call(news_agent.analyst, NewsAgent.build_analysis_prompt(topic, search_results))
+        recorded.append({
+            'topic': topic,
+            'search_results': search_results,
+            'modes': {
+                'two_step': {'calls': [
+                    analysis,
+                    call(formatters['two_step'].agent, ContentFormatter.build_prompt(analysis['content'], 'two_step')),
+                ]},
+                'single': {'calls': [
+                    call(formatters['single'].agent, ContentFormatter.build_prompt(search_results, 'single')),
+                ]},
+            },
+        })
+    return recorded
+
+
+def main():
+    """Основная функция бенчмарка"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--record', action='store_true', help="перезаписать ответы модели живыми вызовами")
+    parser.add_argument('--fixtures', default=FIXTURES_PATH, help="путь к файлу фикстур")
+    parser.add_argument('--prefill-ms', type=float, default=50, help="мс на 1000 токенов промпта")
+    parser.add_argument('--decode-ms', type=float, default=2, help="мс на токен ответа")
+    args = parser.parse_args()
+
+    with open(args.fixtures, encoding='utf-8') as f:
+        fixtures = json.load(f)
+
+    if args.record:
+        fixtures = record(fixtures)
+        with open(args.fixtures, 'w', encoding='utf-8') as f:
+            json.dump(fixtures, f, ensure_ascii=False, indent=2)
+        print(f"💾 Фикстуры сохранены: {args.fixtures}\n")
+
+    model = FixtureModel(fixtures, args.prefill_ms, args.decode_ms)
+    server = FakeOpenAIServer(latency=0.0, reply=model)
+    server.start()
+    # Клиент OpenAI внутри агентов берет адрес и ключ из окружения
+    os.environ['OPENAI_BASE_URL'] = server.base_url
+    os.environ['OPENAI_API_KEY'] = 'test'
+
+    print(
+        f"📊 Сравнение режимов конвейера ({len(fixtures)} тем): "
+        f"{args.prefill_ms:g} мс на 1k токенов промпта, {args.decode_ms:g} мс на токен ответа\n"
+    )
+    try:
+        print_report(fixtures, bench(fixtures, server, model), model)
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
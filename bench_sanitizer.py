@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Сравнение однопроходной очистки HTML (telegram_html.sanitize_html)
+с прежней цепочкой замен из ContentFormatter.sanitize
+
+    python bench_sanitizer.py [--iterations 1000]
+"""
+
+import argparse
+import json
+import os
+import re
+import timeit
+from typing import Callable, List
+
+from telegram_html import sanitize_html, visible_length
+
+# Фикстуры bench_pipeline.py (без импорта: тот тянет клиент OpenAI)
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_fixtures', 'pipeline.json')
+
+
+def legacy_sanitize(content: str) -> str:
+    """Прежняя очистка: последовательность замен по всему тексту"""
+    if len(content) > 1000:
+        content = content[:980] + "..."
+
+    content = re.sub(r'<br\s*/?>', '\n', content)
+    content = re.sub(r'<BR\s*/?>', '\n', content)
+
+    content = content.replace('**', '')
+    content = content.replace('*', '')
+    content = content.replace('_', '')
+    content = content.replace('`', '')
+    content = content.replace('#', '')
+
+    content = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', content)
+    content = re.sub(r'www\.(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', content)
+
+    content = re.sub(r'\s+', ' ', content)
+    content = content.strip()
+
+    if len(content) > 1000:
+        content = content[:997] + "..."
+
+    return content
+
+
+def sample_posts() -> List[str]:
+    """Ответы модели из фикстур и синтетические тяжелые случаи"""
+    with open(FIXTURES_PATH, encoding='utf-8') as f:
+        fixtures = json.load(f)
+
+    # Очищается только ответ форматтера - последний вызов каждого режима
+    posts = [
+        mode['calls'][-1]['content']
+        for fixture in fixtures
+        for mode in fixture['modes'].values()
+    ]
+    posts.append(
+        "<b>🚀 **Главное** за день</b><br><br>"
+        + "Компания выпустила #обновление с 🔥 новыми функциями (подробнее: https://example.com/news?id=1&x=2). " * 12
+        + "<i>Итог: <b>стоит попробовать</i>"
+    )
+    return posts
+
+
+def measure(func: Callable[[str], str], posts: List[str], iterations: int, repeat: int = 5) -> float:
+    """Время обработки одного поста в микросекундах (лучший из нескольких замеров)"""
+    timings = timeit.repeat(lambda: [func(post) for post in posts], number=iterations, repeat=repeat)
+    return min(timings) / (iterations * len(posts)) * 1e6
+
+
+def main():
+    """Основная функция бенчмарка"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=1000, help="число прогонов по набору постов")
+    args = parser.parse_args()
+
+    posts = sample_posts()
+    print(f"📊 Очистка HTML: {len(posts)} постов, {args.iterations} прогонов\n")
+
+    for name, func in (('legacy', legacy_sanitize), ('single-pass', sanitize_html)):
+        per_post = measure(func, posts, args.iterations)
+        lengths = [visible_length(func(post)) for post in posts]
+        newlines = sum(func(post).count('\n') for post in posts)
+        print(
+            f"{name:<12} {per_post:>8.1f} мкс/пост  "
+            f"макс. видимая длина {max(lengths):>5}  переносов строк {newlines:>3}"
+        )
+
+
+if __name__ == "__main__":
+    main()
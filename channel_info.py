@@ -0,0 +1,195 @@
+"""
+Каналы для публикации и кэш сведений о них: публикация без проверочных запросов к Telegram
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+from news_cache import SingleFlight, TTLCache
+from telegram_html import sanitize_html, visible_length
+
+logger = logging.getLogger(__name__)
+
+# Статусы участника, с которыми бот может публиковать в канале
+ADMIN_STATUSES = ('administrator', 'creator')
+
+# Фрагменты ошибок Telegram, после которых сведения о канале устарели
+_ACCESS_ERRORS = (
+    'chat not found', 'not enough rights', 'need administrator rights',
+    'have no rights', 'forbidden', 'bot was blocked', 'bot was kicked',
+)
+
+
+class ChannelTarget:
+    """Канал для публикации и его ограничения оформления"""
+
+    __slots__ = ('chat_id', 'max_length')
+
+    def __init__(self, chat_id: Union[int, str], max_length: Optional[int] = None):
+        """
+        Args:
+            chat_id: Числовой ID или @username канала
+            max_length: Лимит видимой длины поста в этом канале (None - как сгенерирован)
+        """
+        self.chat_id = chat_id
+        self.max_length = max_length
+
+    def format(self, content: str) -> str:
+        """Подогнать пост под ограничения канала (обрезка по границе предложения)"""
+        if self.max_length is None or visible_length(content) <= self.max_length:
+            return content
+        return sanitize_html(content, max_length=self.max_length)
+
+
+def parse_channel_id(value: str) -> Union[int, str]:
+    """ID канала как число, если это возможно, иначе строка (@username)"""
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def parse_channels(value: str) -> List[ChannelTarget]:
+    """
+    Разобрать список каналов из строки вида "@main, -1001234567890:800, @spb:600"
+
+    После двоеточия - необязательный лимит длины поста для канала.
+    """
+    targets = []
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        chat_id, _, max_length = item.rpartition(':')
+        if chat_id and max_length.isdigit():
+            targets.append(ChannelTarget(parse_channel_id(chat_id.strip()), int(max_length)))
+        else:
+            targets.append(ChannelTarget(parse_channel_id(item)))
+    return targets
+
+
+def is_access_error(error: BaseException) -> bool:
+    """Ошибка отправки вызвана потерей прав или доступа к каналу"""
+    message = str(error).lower()
+    return any(fragment in message for fragment in _ACCESS_ERRORS)
+
+
+class ChannelInfo:
+    """Сведения о канале, нужные для публикации"""
+
+    __slots__ = ('chat_id', 'title', 'is_admin')
+
+    def __init__(self, chat_id: Union[int, str], title: str, is_admin: Optional[bool]):
+        """
+        Args:
+            chat_id: Числовой ID канала
+            title: Название канала
+            is_admin: Бот - администратор с правом публикации (None - проверить не удалось)
+        """
+        self.chat_id = chat_id
+        self.title = title
+        self.is_admin = is_admin
+
+
+class ChannelInfoCache:
+    """
+    Сведения о каналах с временем жизни
+
+    На пути публикации остается только send_message: get_chat и проверка
+    прав выполняются при прогреве на старте, в фоновом обновлении и после
+    ошибки доступа (invalidate). Одновременные промахи по одному каналу
+    объединяются в один запрос.
+    """
+
+    def __init__(self, bot, ttl: float = 3600, clock: Callable[[], float] = time.monotonic):
+        """
+        Инициализация кэша
+
+        Args:
+            bot: Экземпляр aiogram.Bot
+            ttl: Время жизни сведений о канале (сек)
+            clock: Источник времени (для тестов)
+        """
+        self.bot = bot
+        self.ttl = ttl
+        self.bot_id: Optional[int] = None
+        self._cache = TTLCache(ttl=ttl, max_size=64, clock=clock)
+        self._flight = SingleFlight()
+        self._targets = set()
+        # Последние полученные сведения, в том числе устаревшие и с отказом в правах - для /status
+        self._last: Dict[str, ChannelInfo] = {}
+
+    @property
+    def fetches(self) -> int:
+        """Сколько раз сведения запрашивались у Telegram"""
+        return self._flight.calls
+
+    async def warm(self, targets: Iterable[Union[int, str]], bot_user: Any = None):
+        """
+        Загрузить сведения о каналах заранее (ошибки только логируются)
+
+        Прежние сведения заменяются только успешным ответом: временный сбой
+        Telegram не выбивает из кэша рабочую запись.
+
+        Args:
+            targets: ID или @username каналов
+            bot_user: Результат bot.get_me(), если он уже получен
+        """
+        if bot_user is not None:
+            self.bot_id = bot_user.id
+        for target in targets:
+            self._targets.add(target)
+            try:
+                info = await self._flight.do(str(target), lambda: self._fetch(target))
+                logger.info(f"Канал {target}: {info.title} (ID: {info.chat_id}, администратор: {info.is_admin})")
+            except Exception as e:
+                logger.warning(f"Не удалось получить сведения о канале {target}: {e}")
+
+    async def run(self):
+        """Обновлять сведения о прогретых каналах до истечения их срока"""
+        while True:
+            await asyncio.sleep(self.ttl * 0.8)
+            await self.warm(list(self._targets))
+
+    async def get(self, target: Union[int, str]) -> ChannelInfo:
+        """
+        Сведения о канале из кэша или от Telegram
+
+        Raises:
+            Exception: Ошибка get_chat - канал не найден или недоступен
+        """
+        info = self._cache.get(str(target))
+        if info is not None:
+            return info
+        return await self._flight.do(str(target), lambda: self._fetch(target))
+
+    def peek(self, target: Union[int, str]) -> Optional[ChannelInfo]:
+        """Последние полученные сведения о канале без запроса к Telegram (None - не запрашивались)"""
+        return self._last.get(str(target))
+
+    def invalidate(self, target: Union[int, str]):
+        """Забыть сведения о канале: следующая публикация проверит его заново"""
+        self._cache.invalidate(str(target))
+
+    async def _fetch(self, target: Union[int, str]) -> ChannelInfo:
+        chat = await self.bot.get_chat(target)
+        try:
+            if self.bot_id is None:
+                self.bot_id = (await self.bot.get_me()).id
+            # Статус самого бота вместо выгрузки всего списка администраторов
+            member = await self.bot.get_chat_member(chat.id, self.bot_id)
+            is_admin = member.status in ADMIN_STATUSES and getattr(member, 'can_post_messages', None) is not False
+        except Exception as e:
+            logger.warning(f"Не удалось проверить права администратора в канале {target}: {e}")
+            is_admin = None
+
+        info = ChannelInfo(chat.id, chat.title, is_admin)
+        self._last[str(target)] = info
+        # Отказ в правах не кэшируется: после исправления публикация сразу заработает
+        if is_admin is not False:
+            self._cache.set(str(target), info)
+        else:
+            self.invalidate(target)
+        return info
@@ -1,22 +1,194 @@
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
 from textwrap import dedent
+from typing import Callable, Iterator, List, Optional
 from optimai_data.content_instructions import instructions
+from news_compressor import compress, estimate_tokens
+from telegram_html import sanitize_html
+from post_variants import VARIANT_SEPARATOR, plural_ru, rank_variants, split_variants
+from resilient_call import STREAM_RETRIES, ResilientCaller
+from rate_limiter import current_priority, usage_tokens
+from generation_pool import PerThread
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Режимы конвейера: 'two_step' - аналитик готовит обзор, форматтер пишет пост;
+# 'single' - форматтер пишет пост сразу из результатов поиска за один вызов
+PIPELINE_MODES = ('two_step', 'single')
+
+# Запас на ответ одного варианта поста в оценке токенов для ограничителя
+POST_OUTPUT_TOKENS = 800
 
 class ContentFormatter:
-    def __init__(self):
-        self.agent = Agent(
+    def __init__(
+        self,
+        pipeline_mode: str = 'two_step',
+        token_budget: int = 0,
+        prefill_ms_per_1k_tokens: float = 50,
+        caller: Optional[ResilientCaller] = None
+    ):
+        """
+        Инициализация форматтера
+        
+        Args:
+            pipeline_mode: Режим конвейера ('two_step' или 'single')
+            token_budget: Бюджет токенов исходных новостей в промпте (0 - без сжатия)
+            prefill_ms_per_1k_tokens: Оценка времени обработки 1000 токенов промпта моделью
+            caller: Настройки повторов, хеджирования и общего ограничителя вызовов модели
+        """
+        if pipeline_mode not in PIPELINE_MODES:
+            raise ValueError(f"Неизвестный режим конвейера: {pipeline_mode}")
+        self.pipeline_mode = pipeline_mode
+        self.token_budget = token_budget
+        self.prefill_ms_per_1k_tokens = prefill_ms_per_1k_tokens
+        self.caller = (caller or ResilientCaller()).clone('formatter')
+        # Свой агент на каждый поток пула генерации: один экземпляр
+        # нельзя вызывать из нескольких потоков одновременно
+        self._agents = PerThread(self._build_agent)
+        # Поток нельзя повторить с середины, поэтому у потокового агента
+        # остаются встроенные повторы клиента до начала ответа
+        self._stream_agents = PerThread(lambda: self._build_agent(STREAM_RETRIES))
+    
+    @property
+    def agent(self) -> Agent:
+        """Агент текущего потока"""
+        return self._agents.get()
+    
+    @staticmethod
+    def _build_agent(max_retries: int = 0) -> Agent:
+        # Обычные вызовы повторяет ResilientCaller: встроенные повторы клиента умножили бы их
+        return Agent(
             name="OptimaAI Content Creator",
-            model=OpenAIChat(id="gpt-4o"),
+            model=OpenAIChat(id="gpt-4o", max_retries=max_retries),
             instructions=instructions,
             markdown=False,
         )
     
     def format_news_post(self, raw_news: str) -> str:
         """Форматировать новости в пост для Telegram канала OptimaAI"""
+        prompt_news, stats = self._compress(raw_news)
+        
+        started = time.perf_counter()
+        prompt = self.build_prompt(prompt_news, self.pipeline_mode)
+        response = self.caller.call_sync(
+            self._run_agent, prompt, tokens=estimate_tokens(prompt) + POST_OUTPUT_TOKENS
+        )
+        if stats:
+            logger.info(
+                f"Форматирование заняло {time.perf_counter() - started:.2f} с "
+                f"(расчетная экономия на промпте ~{stats['saved_ms']:.0f} мс, не замер)"
+            )
+        
+        # Получаем HTML-контент
+        content = response.content if response.content else "Ошибка форматирования"
+        return self.sanitize(content)
+    
+    def format_news_variants(
+        self,
+        raw_news: str,
+        count: int,
+        overlap: Optional[Callable[[str], float]] = None
+    ) -> List[str]:
+        """
+        Написать несколько вариантов поста одним вызовом модели
+        
+        Args:
+            raw_news: Исходные новости
+            count: Сколько вариантов запросить
+            overlap: Сходство текста с уже опубликованными постами (0..1)
+            
+        Returns:
+            Очищенные варианты от лучшего к худшему (хотя бы один)
+        """
+        prompt_news, _ = self._compress(raw_news)
+        prompt = self.build_variants_prompt(prompt_news, count, self.pipeline_mode)
+        response = self.caller.call_sync(
+            self._run_agent, prompt, tokens=estimate_tokens(prompt) + POST_OUTPUT_TOKENS * count
+        )
+        candidates = split_variants(response.content or "")
+        if not candidates:
+            return [self.sanitize("Ошибка форматирования")]
+        
+        ranked = rank_variants(candidates[:count], max_length=1000, overlap=overlap)
+        logger.info(
+            f"Получено вариантов: {len(candidates)}, оценки: "
+            + ", ".join(f"{score:.2f}" for score, _ in ranked)
+        )
+        return [self.sanitize(candidate) for _, candidate in ranked]
+    
+    def stream_news_post(self, raw_news: str) -> Iterator[str]:
+        """
+        Форматировать новости потоково (блокирующий итератор фрагментов)
+        
+        Фрагменты не очищены: итоговый текст нужно пропустить через sanitize().
+        """
+        prompt_news, _ = self._compress(raw_news)
+        prompt = self.build_prompt(prompt_news, self.pipeline_mode)
+        limiter = self.caller.limiter
+        reservation = None
+        if limiter is not None:
+            # Поток идет мимо обертки повторов, место в очереди занимается здесь
+            reservation = limiter.acquire_sync(
+                estimate_tokens(prompt) + POST_OUTPUT_TOKENS, current_priority(self.caller.priority),
+                timeout=self.caller.deadline
+            )
+        
+        agent = self._stream_agents.get()
+        parts = []
+        try:
+            for chunk in agent.run(prompt, stream=True):
+                delta = getattr(chunk, 'content', None)
+                if isinstance(delta, str) and delta:
+                    parts.append(delta)
+                    yield delta
+        finally:
+            if reservation is not None:
+                # После потока agno складывает метрики в run_response; без них - оценка по выводу
+                actual_tokens = usage_tokens(getattr(agent, 'run_response', None))
+                if actual_tokens is None:
+                    actual_tokens = estimate_tokens(prompt) + estimate_tokens(''.join(parts))
+                limiter.settle(reservation, actual_tokens)
+    
+    def _run_agent(self, prompt: str):
+        """Вызов агента потока, в котором выполняется попытка (хедж идет в соседнем потоке)"""
+        return self.agent.run(prompt)
+    
+    def _compress(self, raw_news: str):
+        """
+        Сжать исходные новости до бюджета токенов
+        
+        Returns:
+            Пара (текст для промпта, статистика сжатия или None без сжатия)
+        """
+        if not self.token_budget:
+            return raw_news, None
+        
+        compressed, stats = compress(raw_news, self.token_budget)
+        saved_tokens = stats['original_tokens'] - stats['compressed_tokens']
+        stats['saved_ms'] = saved_tokens * self.prefill_ms_per_1k_tokens / 1000
+        logger.info(
+            f"Новости сжаты: ~{stats['original_tokens']} -> ~{stats['compressed_tokens']} токенов "
+            f"({stats['ratio']:.0%}), расчетная экономия ~{stats['saved_ms']:.0f} мс по prefill_ms_per_1k_tokens"
+        )
+        return compressed, stats
+    
+    @staticmethod
+    def build_prompt(raw_news: str, pipeline_mode: str = 'two_step') -> str:
+        """Собрать промпт форматирования для исходных новостей"""
+        if pipeline_mode == 'single':
+            source_description = (
+                "Данные - сырые результаты поиска из нескольких источников: выбери самую "
+                "значимую и свежую новость, сверь факты между источниками и не добавляй "
+                "того, чего в них нет."
+            )
+        else:
+            source_description = ""
         
-        prompt = dedent(f"""
+        return dedent(f"""
             Преобразуй следующие новостные данные в HTML-пост для Telegram канала OptimaAI.
+            {source_description}
             
             КРИТИЧЕСКИ ВАЖНЫЕ ТРЕБОВАНИЯ:
             - СТРОГИЙ ЛИМИТ: максимум 1000 символов включая HTML теги
@@ -44,40 +216,18 @@ class ContentFormatter:
             
             Создай HTML-пост до 1000 символов, готовый для отправки через Telegram Bot API.
         """)
-        
-        response = self.agent.run(prompt)
-        
-        # Получаем HTML-контент
-        content = response.content if response.content else "Ошибка форматирования"
-        
-        # Проверяем длину и обрезаем если необходимо
-        if len(content) > 1000:
-            # Обрезаем до 980 символов и добавляем многоточие
-            content = content[:980] + "..."
-        
-        # Очистка от неподдерживаемых тегов и символов
-        import re
-        # Удаляем <br> теги (заменяем на обычные переносы)
-        content = re.sub(r'<br\s*/?>', '\n', content)
-        content = re.sub(r'<BR\s*/?>', '\n', content)
-        
-        # Удаляем markdown символы
-        content = content.replace('**', '')
-        content = content.replace('*', '')
-        content = content.replace('_', '')
-        content = content.replace('`', '')
-        content = content.replace('#', '')
-        
-        # Удаляем URL-ссылки
-        content = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', content)
-        content = re.sub(r'www\.(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', content)
-        
-        # Очищаем лишние пробелы
-        content = re.sub(r'\s+', ' ', content)  # Множественные пробелы в один
-        content = content.strip()
-        
-        # Финальная проверка длины
-        if len(content) > 1000:
-            content = content[:997] + "..."
-            
-        return content
\ No newline at end of file
+    
+    @classmethod
+    def build_variants_prompt(cls, raw_news: str, count: int, pipeline_mode: str = 'two_step') -> str:
+        """Собрать промпт, запрашивающий несколько независимых вариантов поста"""
+        variants = plural_ru(count, ('разный вариант', 'разных варианта', 'разных вариантов'))
+        return cls.build_prompt(raw_news, pipeline_mode) + dedent(f"""
+            Напиши {count} {variants} поста по этим данным: с разными заголовками,
+            подачей и акцентами. Каждый вариант отдельно соблюдает все требования выше.
+            Раздели варианты строкой {VARIANT_SEPARATOR} и не добавляй ничего, кроме самих постов.
+        """)
+    
+    @staticmethod
+    def sanitize(content: str) -> str:
+        """Привести ответ модели к требованиям Telegram: длина, теги, без markdown"""
+        return sanitize_html(content, max_length=1000)
\ No newline at end of file
@@ -0,0 +1,181 @@
+"""
+Планировщик заблаговременной генерации черновиков по настроенным темам
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def parse_quiet_hours(value: str) -> Optional[Tuple[int, int]]:
+    """
+    Разобрать интервал тихих часов вида "0-7" или "22-6"
+
+    Returns:
+        Пара (начало, конец) или None, если генерация разрешена всегда
+    """
+    value = value.strip()
+    if not value:
+        return None
+
+    start, end = (int(part) for part in value.split('-', 1))
+    return start % 24, end % 24
+
+
+def parse_topics(value: str) -> List[str]:
+    """Разобрать список тем, разделенных запятыми"""
+    return [topic.strip() for topic in value.split(',') if topic.strip()]
+
+
+class DraftScheduler:
+    """Очередь готовых черновиков по темам, пополняемая в тихие часы"""
+
+    def __init__(
+        self,
+        generate: Callable[[str], Awaitable[Any]],
+        topics: List[str],
+        quiet_hours: Optional[Tuple[int, int]] = None,
+        max_age: float = 10800,
+        queue_size: int = 2,
+        min_interval: float = 300,
+        is_busy: Callable[[], bool] = lambda: False,
+        check_interval: float = 60,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Инициализация планировщика
+
+        Args:
+            generate: Корутина генерации черновика по теме (None - не удалось). Черновик
+                хранится и выдается как есть: вместе с текстом в нем могут быть источники
+            topics: Темы для заблаговременной генерации
+            quiet_hours: Часы (начало, конец), когда разрешена генерация
+            max_age: Максимальный возраст черновика в секундах
+            queue_size: Максимум готовых черновиков на тему
+            min_interval: Минимальный интервал между генерациями в секундах
+            is_busy: Проверка занятости интерактивными запросами
+            check_interval: Период проверки очередей в секундах
+            clock: Источник времени (для тестов)
+        """
+        self.generate = generate
+        self.topics = topics
+        self.quiet_hours = quiet_hours
+        self.max_age = max_age
+        self.queue_size = queue_size
+        self.min_interval = min_interval
+        self.is_busy = is_busy
+        self.check_interval = check_interval
+        self._clock = clock
+        # Черновики хранятся как (время создания, черновик), новые - справа
+        self._queues: Dict[str, Deque[Tuple[float, Any]]] = {topic: deque() for topic in topics}
+        self._last_generation = 0.0
+        self.generated = 0
+        self.served = 0
+
+    def is_quiet_time(self, now: Optional[datetime] = None) -> bool:
+        """Проверить, попадает ли текущее время в тихие часы"""
+        if self.quiet_hours is None:
+            return True
+
+        hour = (now or datetime.now()).hour
+        start, end = self.quiet_hours
+        if start <= end:
+            return start <= hour < end
+        return hour >= start or hour < end
+
+    def purge_stale(self) -> int:
+        """Удалить устаревшие черновики и вернуть их количество"""
+        deadline = self._clock() - self.max_age
+        removed = 0
+        for queue in self._queues.values():
+            while queue and queue[0][0] < deadline:
+                queue.popleft()
+                removed += 1
+        return removed
+
+    def take(self, topic: Optional[str] = None) -> Optional[Tuple[str, Any]]:
+        """
+        Забрать самый свежий черновик
+
+        Args:
+            topic: Тема (None - любая тема)
+
+        Returns:
+            Пара (тема, черновик) или None, если очередь пуста
+        """
+        self.purge_stale()
+
+        if topic is not None:
+            candidates = [
+                name for name in self._queues
+                if name.lower() == topic.lower() and self._queues[name]
+            ]
+        else:
+            candidates = [name for name, queue in self._queues.items() if queue]
+
+        if not candidates:
+            return None
+
+        freshest = max(candidates, key=lambda name: self._queues[name][-1][0])
+        _, draft = self._queues[freshest].pop()
+        self.served += 1
+        return freshest, draft
+
+    def ready_counts(self) -> Dict[str, int]:
+        """Количество готовых черновиков по темам"""
+        self.purge_stale()
+        return {topic: len(queue) for topic, queue in self._queues.items()}
+
+    def _next_topic(self) -> Optional[str]:
+        """Тема с самой короткой незаполненной очередью"""
+        open_topics = [
+            topic for topic, queue in self._queues.items()
+            if len(queue) < self.queue_size
+        ]
+        if not open_topics:
+            return None
+        return min(open_topics, key=lambda topic: len(self._queues[topic]))
+
+    async def tick(self) -> bool:
+        """
+        Сгенерировать один черновик, если это сейчас разрешено
+
+        Returns:
+            True, если черновик был добавлен в очередь
+        """
+        self.purge_stale()
+
+        if not self.is_quiet_time() or self.is_busy():
+            return False
+        if self._clock() - self._last_generation < self.min_interval:
+            return False
+
+        topic = self._next_topic()
+        if topic is None:
+            return False
+
+        self._last_generation = self._clock()
+        try:
+            draft = await self.generate(topic)
+        except Exception as e:
+            logger.warning(f"Не удалось заранее сгенерировать черновик по теме '{topic}': {e}")
+            return False
+
+        if not draft:
+            return False
+
+        self._queues[topic].append((self._clock(), draft))
+        self.generated += 1
+        logger.info(f"Черновик по теме '{topic}' добавлен в очередь ({len(self._queues[topic])})")
+        return True
+
+    async def run(self):
+        """Периодически пополнять очереди черновиков"""
+        while True:
+            await self.tick()
+            await asyncio.sleep(self.check_interval)
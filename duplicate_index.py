@@ -0,0 +1,248 @@
+"""
+Индекс почти-дубликатов опубликованных постов и заголовков источников (SimHash)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+# 8 полос по 8 бит: при расстоянии Хэмминга до 7 хотя бы одна полоса совпадает
+BANDS = 8
+BAND_BITS = HASH_BITS // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+
+# Теги и сущности HTML не должны влиять на отпечаток
+_MARKUP = re.compile(r'<[^>]+>|&\w+;')
+_WORD = re.compile(r'\w+')
+
+
+def _features(text: str) -> List[str]:
+    """
+    Разбить текст на признаки для отпечатка - слова без разметки
+
+    На постах до 1000 символов шинглы из нескольких слов слишком чувствительны:
+    правка одного слова меняет несколько шинглов и уводит отпечаток далеко.
+    """
+    return _WORD.findall(_MARKUP.sub(' ', text.lower()))
+
+
+def simhash(text: str) -> int:
+    """Вычислить 64-битный SimHash текста"""
+    return _simhash(_features(text))
+
+
+def _simhash(features: List[str]) -> int:
+    """SimHash по готовым признакам (0 - признаков нет)"""
+    # Хэши признаков как строки из 0/1: голосование по битам считается по столбцам через zip
+    rows = [
+        format(int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), 'big'), '064b')
+        for feature in features
+    ]
+    if not rows:
+        return 0
+
+    half = len(rows) / 2
+    bits = ''.join('1' if column.count('1') > half else '0' for column in map(''.join, zip(*rows)))
+    return int(bits, 2)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Расстояние Хэмминга между отпечатками"""
+    return bin(a ^ b).count('1')
+
+
+class DuplicateIndex:
+    """
+    Персистентный индекс отпечатков с поиском почти-дубликатов по полосам
+
+    Файл - журнал JSON Lines: новые записи дописываются в конец, а целиком файл
+    переписывается, только когда устаревших строк в нем больше, чем живых.
+    Поиск идет из потоков пула генерации, добавление - из event loop, поэтому
+    обращения к записям и полосам защищены блокировкой.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_distance: int = 6,
+        window: float = 86400,
+        retention: float = 7 * 86400
+    ):
+        """
+        Инициализация индекса
+
+        Args:
+            path: Файл для хранения индекса (None - только в памяти)
+            max_distance: Максимальное расстояние Хэмминга для дубликата (до 7)
+            window: Окно поиска дубликатов в секундах
+            retention: Срок хранения записей в секундах
+        """
+        self.path = path
+        self.max_distance = min(max_distance, BANDS - 1)
+        self.window = window
+        self.retention = retention
+        self._entries: Dict[int, Dict] = {}
+        self._bands: List[Dict[int, Set[int]]] = [{} for _ in range(BANDS)]
+        self._next_id = 0
+        # Добавленные с save=False записи, еще не дописанные в журнал
+        self._pending: List[Dict] = []
+        # Строк в файле журнала, включая удаленные из памяти записи
+        self._logged = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, text: str, kind: str = 'post', save: bool = True) -> int:
+        """
+        Добавить текст в индекс
+
+        Args:
+            text: Текст поста или заголовок источника
+            kind: Тип записи ('post' или 'headline')
+            save: Сразу дописать запись в файл (иначе - при следующем save)
+
+        Returns:
+            Отпечаток текста (0 - в тексте нет слов, он не индексируется)
+        """
+        features = _features(text)
+        if not features:
+            return 0
+
+        fingerprint = _simhash(features)
+        entry = {
+            'hash': fingerprint,
+            'kind': kind,
+            'text': text[:200],
+            'created_at': time.time(),
+        }
+        with self._lock:
+            self._insert(entry)
+            if self.path:
+                self._pending.append(entry)
+        if save:
+            self.save()
+        return fingerprint
+
+    def find(self, text: str, kind: Optional[str] = None) -> Optional[Dict]:
+        """
+        Найти ближайший почти-дубликат в окне поиска
+
+        Args:
+            text: Проверяемый текст
+            kind: Искать только среди записей этого типа
+
+        Returns:
+            Запись индекса с полем 'distance' или None (и для текста без слов)
+        """
+        features = _features(text)
+        if not features:
+            return None
+
+        fingerprint = _simhash(features)
+        since = time.time() - self.window
+
+        with self._lock:
+            candidates: Set[int] = set()
+            for band, buckets in enumerate(self._bands):
+                candidates |= buckets.get(fingerprint >> (band * BAND_BITS) & BAND_MASK, set())
+
+            best = None
+            for entry_id in candidates:
+                entry = self._entries[entry_id]
+                if entry['created_at'] < since or (kind and entry['kind'] != kind):
+                    continue
+                distance = hamming_distance(fingerprint, entry['hash'])
+                if distance <= self.max_distance and (best is None or distance < best['distance']):
+                    best = dict(entry, distance=distance)
+        return best
+
+    def prune(self) -> int:
+        """Удалить записи старше срока хранения и вернуть их количество"""
+        with self._lock:
+            return self._prune()
+
+    def _prune(self) -> int:
+        deadline = time.time() - self.retention
+        expired = [entry_id for entry_id, entry in self._entries.items() if entry['created_at'] < deadline]
+        for entry_id in expired:
+            entry = self._entries.pop(entry_id)
+            for band, buckets in enumerate(self._bands):
+                key = entry['hash'] >> (band * BAND_BITS) & BAND_MASK
+                bucket = buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(entry_id)
+                    if not bucket:
+                        del buckets[key]
+        return len(expired)
+
+    def save(self):
+        """Дописать новые записи в журнал, при необходимости сжав его"""
+        if not self.path:
+            return
+
+        with self._lock:
+            self._prune()
+            if self._logged + len(self._pending) > 2 * len(self._entries) + 100:
+                self._compact()
+            elif self._pending:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.writelines(json.dumps(entry, ensure_ascii=False) + '\n' for entry in self._pending)
+                self._logged += len(self._pending)
+                self._pending.clear()
+
+    def _compact(self):
+        """Переписать журнал только живыми записями атомарной заменой файла"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps(entry, ensure_ascii=False) + '\n' for entry in self._entries.values())
+        os.replace(tmp_path, self.path)
+        self._logged = len(self._entries)
+        self._pending.clear()
+
+    def _insert(self, entry: Dict):
+        """Добавить запись в хранилище и полосы индекса"""
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = entry
+        for band, buckets in enumerate(self._bands):
+            key = entry['hash'] >> (band * BAND_BITS) & BAND_MASK
+            buckets.setdefault(key, set()).add(entry_id)
+
+    def _load(self):
+        """Загрузить индекс с диска"""
+        if not self.path or not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                content = f.read()
+            # Прежний формат - один JSON-массив, сразу переписывается журналом
+            lines = json.loads(content) if content.startswith('[') else content.splitlines()
+        except (OSError, ValueError) as e:
+            logger.error(f"Не удалось загрузить индекс дубликатов {self.path}: {e}")
+            return
+
+        for line in lines:
+            if isinstance(line, str) and not line.strip():
+                continue
+            try:
+                self._insert(json.loads(line) if isinstance(line, str) else line)
+            except ValueError:
+                # Строка, недописанная при остановке процесса
+                logger.warning(f"Пропущена поврежденная строка индекса дубликатов {self.path}")
+            self._logged += 1
+        removed = self.prune()
+        if content.startswith('['):
+            with self._lock:
+                self._compact()
+        logger.info(f"Индекс дубликатов загружен: {len(self)} записей (удалено устаревших: {removed})")
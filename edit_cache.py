@@ -0,0 +1,109 @@
+"""
+Заблаговременное выполнение быстрых правок поста и кэш их результатов
+"""
+
+import asyncio
+import hashlib
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+EditKey = Tuple[str, str]
+
+
+def content_hash(content: str) -> str:
+    """Ключ текста поста: одинаковый текст дает одинаковые правки"""
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+class EditPrefetcher:
+    """
+    Параллельно запускает быстрые правки поста в фоне и хранит результаты
+    по ключу (хэш текста, тип правки)
+
+    Записи привязаны к постам: когда последний пост с этим текстом удаляется,
+    незавершенные правки отменяются, а готовые результаты выбрасываются.
+    """
+
+    def __init__(self, edit: Callable[[str, str], Awaitable[str]]):
+        """
+        Инициализация кэша правок
+
+        Args:
+            edit: Корутина правки (текст поста, инструкция) -> отредактированный текст
+        """
+        self._edit = edit
+        self._tasks: Dict[EditKey, asyncio.Task] = {}
+        self._owners: Dict[str, Set[EditKey]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def prefetch(self, post_id: str, content: str, instructions: Dict[str, str]):
+        """
+        Запустить правки, которых еще нет в кэше
+
+        Args:
+            post_id: ID поста, которому принадлежат результаты
+            content: Текст, к которому применяются правки
+            instructions: Тип правки -> инструкция
+        """
+        digest = content_hash(content)
+        owned = self._owners.setdefault(post_id, set())
+        for edit_type, instruction in instructions.items():
+            key = (digest, edit_type)
+            owned.add(key)
+            if key not in self._tasks:
+                self._tasks[key] = asyncio.create_task(self._run(key, content, instruction))
+
+    async def take(self, content: str, edit_type: str) -> Optional[str]:
+        """
+        Получить готовый результат правки
+
+        Незавершенная заготовка отменяется: она идет с фоновым приоритетом,
+        и пользователь не должен ее ждать - правка выполняется заново сразу.
+
+        Returns:
+            Отредактированный текст или None, если правки нет, она не удалась или еще не готова
+        """
+        key = (content_hash(content), edit_type)
+        task = self._tasks.get(key)
+        if task is None:
+            self.misses += 1
+            return None
+
+        if not task.done():
+            task.cancel()
+            del self._tasks[key]
+            self.misses += 1
+            return None
+
+        result = None if task.cancelled() else task.result()
+        if result is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return result
+
+    def evict(self, post_id: str):
+        """Удалить результаты поста, которые не нужны другим постам"""
+        owned = self._owners.pop(post_id, set())
+        still_used = set().union(*self._owners.values()) if self._owners else set()
+        for key in owned - still_used:
+            task = self._tasks.pop(key, None)
+            if task is not None:
+                task.cancel()
+
+    async def _run(self, key: EditKey, content: str, instruction: str) -> Optional[str]:
+        """Выполнить правку; неудачная попытка убирается из кэша, чтобы ее можно было повторить"""
+        try:
+            return await self._edit(content, instruction)
+        except Exception as e:
+            logger.warning(f"Не удалось заранее выполнить правку '{key[1]}': {e}")
+            if self._tasks.get(key) is asyncio.current_task():
+                del self._tasks[key]
+            return None
@@ -0,0 +1,190 @@
+"""
+Пул воркеров для генерации контента вне event loop
+"""
+
+import asyncio
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, Generic, Iterable, Optional, TypeVar
+
+from rate_limiter import PRIORITY_BACKGROUND, priority_scope
+from stream_preview import iterate_in_thread
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class GenerationLimitError(Exception):
+    """У пользователя уже запущено максимальное число генераций"""
+
+
+class PerThread(Generic[T]):
+    """
+    Отдельный экземпляр объекта на каждый поток
+
+    Agent.run из agno хранит состояние запуска (run_response) в самом агенте,
+    поэтому один агент нельзя вызывать из нескольких потоков пула одновременно:
+    ответ одного запроса может достаться другому.
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        """
+        Args:
+            factory: Создает экземпляр при первом обращении из потока
+        """
+        self._factory = factory
+        self._local = threading.local()
+
+    def get(self) -> T:
+        """Экземпляр текущего потока"""
+        instance = getattr(self._local, 'instance', None)
+        if instance is None:
+            instance = self._local.instance = self._factory()
+        return instance
+
+
+class GenerationPool:
+    """Ограниченный пул для блокирующих вызовов агентов (Agent.run)"""
+
+    def __init__(self, max_workers: int = 4, per_user_limit: int = 1, background_workers: int = 1):
+        """
+        Инициализация пула генерации
+
+        Args:
+            max_workers: Максимум одновременно выполняемых вызовов агентов
+            per_user_limit: Максимум одновременных генераций на пользователя
+            background_workers: Максимум одновременных фоновых (спекулятивных) вызовов
+        """
+        self.max_workers = max_workers
+        self.per_user_limit = per_user_limit
+        self.background_workers = background_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="generation"
+        )
+        self._semaphore = asyncio.Semaphore(max_workers)
+        self._background_semaphore = asyncio.Semaphore(background_workers)
+        self._user_inflight: Dict[int, int] = {}
+        self._active = 0
+        self._queued = 0
+
+    @property
+    def active(self) -> int:
+        """Количество выполняющихся сейчас вызовов"""
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        """Количество вызовов, ожидающих свободного воркера"""
+        return self._queued
+
+    def user_inflight(self, user_id: int) -> int:
+        """Количество активных генераций пользователя"""
+        return self._user_inflight.get(user_id, 0)
+
+    @asynccontextmanager
+    async def user_slot(self, user_id: Optional[int]):
+        """
+        Занять слот генерации пользователя на время выполнения блока
+
+        Args:
+            user_id: ID пользователя (None - без ограничения)
+
+        Raises:
+            GenerationLimitError: Если лимит пользователя исчерпан
+        """
+        if user_id is None:
+            yield
+            return
+
+        if self.user_inflight(user_id) >= self.per_user_limit:
+            raise GenerationLimitError(
+                f"У пользователя {user_id} уже {self.per_user_limit} активных генераций"
+            )
+
+        self._user_inflight[user_id] = self.user_inflight(user_id) + 1
+        try:
+            yield
+        finally:
+            remaining = self._user_inflight[user_id] - 1
+            if remaining:
+                self._user_inflight[user_id] = remaining
+            else:
+                del self._user_inflight[user_id]
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Выполнить блокирующую функцию в пуле, не блокируя event loop
+
+        Args:
+            func: Блокирующая функция (например, news_agent.get_latest_news)
+            *args: Позиционные аргументы функции
+            **kwargs: Именованные аргументы функции
+
+        Returns:
+            Результат выполнения функции
+        """
+        self._queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._queued -= 1
+
+        self._active += 1
+        try:
+            loop = asyncio.get_running_loop()
+            # run_in_executor не переносит контекст, а с ним и приоритет запросов
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(
+                self._executor,
+                partial(context.run, func, *args, **kwargs)
+            )
+        finally:
+            self._active -= 1
+            self._semaphore.release()
+
+    async def stream(self, func: Callable[..., Iterable[Any]], *args) -> AsyncIterator[Any]:
+        """
+        Итерировать блокирующий поток токенов модели, занимая воркер пула
+
+        Args:
+            func: Функция, возвращающая блокирующий итератор фрагментов текста
+            *args: Аргументы функции
+
+        Yields:
+            Фрагменты по мере генерации
+        """
+        self._queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._queued -= 1
+
+        self._active += 1
+        try:
+            async for item in iterate_in_thread(func, *args, executor=self._executor):
+                yield item
+        finally:
+            self._active -= 1
+            self._semaphore.release()
+
+    async def run_background(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Выполнить блокирующую функцию с низким приоритетом
+
+        Фоновые вызовы занимают не больше background_workers воркеров,
+        поэтому интерактивные запросы всегда находят свободное место в пуле,
+        а их запросы к модели встают в конец очереди общего ограничителя.
+        """
+        async with self._background_semaphore:
+            with priority_scope(PRIORITY_BACKGROUND):
+                return await self.run(func, *args, **kwargs)
+
+    def shutdown(self):
+        """Остановить пул, не дожидаясь завершения текущих вызовов"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
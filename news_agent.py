@@ -5,13 +5,81 @@ from agno.tools.tavily import TavilyTools
 from agno.tools.exa import ExaTools
 from textwrap import dedent
 import json
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+from resilient_call import ResilientCaller
+from generation_pool import PerThread
+from news_compressor import estimate_tokens
+
+NO_NEWS_MESSAGE = "Не удалось получить новости"
+
+# Оценки токенов для общего ограничителя: исследователь делает несколько ходов
+# с результатами поиска в контексте, аналитику нужен только ответ
+RESEARCH_TOKENS = 8000
+ANALYSIS_OUTPUT_TOKENS = 1500
+
+ANALYST_INSTRUCTIONS = dedent("""
+    Вы - опытный новостной аналитик! 📰
+    
+    Ваши задачи:
+    1. Проанализировать переданные результаты поиска из нескольких источников
+    2. Отобрать самые актуальные и важные новости за последние 24 часа
+    3. Сопоставить информацию из разных источников
+    4. Сосредоточиться на значимых событиях и трендах
+    
+    Стиль подачи:
+    - Представляйте информацию в ясном, журналистском стиле
+    - Используйте маркированные списки для ключевых моментов
+    - Указывайте дату и время для каждой новости, если они известны
+    - Выделяйте тренды и настроения рынка
+    - Завершайте кратким анализом общей картины
+    - Не выдумывайте факты, которых нет в результатах поиска
+""")
 
 class NewsAgent:
-    def __init__(self):
-        self.agent = Agent(
+    def __init__(self, caller: Optional[ResilientCaller] = None):
+        """
+        Инициализация агентов новостей
+        
+        Args:
+            caller: Настройки повторов и хеджирования вызовов модели
+                (у каждого агента своя статистика задержек)
+        """
+        caller = caller or ResilientCaller()
+        self.analyst_caller = caller.clone('analyst')
+        self.research_caller = caller.clone('researcher')
+        
+        # Агенты создаются на каждый поток пула генерации: один экземпляр
+        # нельзя вызывать из нескольких потоков одновременно
+        self._analysts = PerThread(self._build_analyst)
+        self._researchers = PerThread(self._build_researcher)
+    
+    @property
+    def analyst(self) -> Agent:
+        """Аналитик текущего потока"""
+        return self._analysts.get()
+    
+    @property
+    def agent(self) -> Agent:
+        """Исследователь текущего потока"""
+        return self._researchers.get()
+    
+    @staticmethod
+    def _build_analyst() -> Agent:
+        # Аналитик без инструментов: получает готовые результаты поиска за один ход
+        return Agent(
+            name="News Analyst",
+            # Повторы выполняет ResilientCaller: встроенные повторы клиента умножили бы их
+            model=OpenAIChat(id="gpt-4o", max_retries=0),
+            instructions=ANALYST_INSTRUCTIONS,
+            markdown=True,
+        )
+    
+    @staticmethod
+    def _build_researcher() -> Agent:
+        return Agent(
             name="News Researcher",
-            model=OpenAIChat(id="gpt-4o"),
+            # Повторы выполняет ResilientCaller: встроенные повторы клиента умножили бы их
+            model=OpenAIChat(id="gpt-4o", max_retries=0),
             tools=[
                 DuckDuckGoTools(),
                 TavilyTools(),
@@ -40,9 +108,29 @@ class NewsAgent:
     
     def get_latest_news(self, topic: str = "latest news") -> str:
         """Получить последние новости по заданной теме"""
-        response = self.agent.run(
+        # Агент берется в потоке, где выполняется попытка: хедж идет в другом потоке
+        # и не должен делить агента с основным запросом
+        response = self.research_caller.call_sync(
+            lambda prompt: self.agent.run(prompt),
             f"Найдите и проанализируйте последние новости по теме: {topic}. "
             f"Используйте все доступные инструменты поиска для получения "
-            f"наиболее актуальной информации."
+            f"наиболее актуальной информации.",
+            tokens=RESEARCH_TOKENS
+        )
+        return response.content if response.content else NO_NEWS_MESSAGE
+    
+    def analyze_search_results(self, topic: str, search_results: str) -> str:
+        """Проанализировать готовые результаты поиска по теме за один вызов модели"""
+        prompt = self.build_analysis_prompt(topic, search_results)
+        response = self.analyst_caller.call_sync(
+            lambda prompt: self.analyst.run(prompt), prompt, tokens=estimate_tokens(prompt) + ANALYSIS_OUTPUT_TOKENS
+        )
+        return response.content if response.content else NO_NEWS_MESSAGE
+    
+    @staticmethod
+    def build_analysis_prompt(topic: str, search_results: str) -> str:
+        """Собрать промпт анализа готовых результатов поиска"""
+        return (
+            f"Проанализируйте последние новости по теме: {topic}.\n\n"
+            f"Результаты поиска:\n\n{search_results}"
         )
-        return response.content if response.content else "Не удалось получить новости"
\ No newline at end of file
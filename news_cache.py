@@ -0,0 +1,137 @@
+"""
+Кэш результатов исследования новостей по нормализованной теме
+и объединение одновременных запросов по одной теме
+"""
+
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+def normalize_topic(topic: str) -> str:
+    """
+    Нормализовать тему для использования в качестве ключа
+
+    Регистр, пунктуация и лишние пробелы не влияют на ключ:
+    "ИИ,  новости!" и "ии новости" дают одинаковый результат.
+    """
+    return ' '.join(re.findall(r'\w+', topic.lower()))
+
+
+class TTLCache:
+    """LRU-кэш с ограничением размера и временем жизни записей"""
+
+    def __init__(
+        self,
+        ttl: float = 900,
+        max_size: int = 128,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Инициализация кэша
+
+        Args:
+            ttl: Время жизни записи в секундах
+            max_size: Максимальное количество записей
+            clock: Источник времени (для тестов)
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self._clock = clock
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Получить свежее значение по ключу
+
+        Returns:
+            Значение или None, если записи нет или она устарела
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any):
+        """Сохранить значение, вытеснив самые давно использованные записи"""
+        self._entries[key] = (self._clock() + self.ttl, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: str):
+        """Удалить запись по ключу"""
+        self._entries.pop(key, None)
+
+    def purge_expired(self) -> int:
+        """Удалить устаревшие записи и вернуть их количество"""
+        now = self._clock()
+        expired = [key for key, (expires_at, _) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+        return len(expired)
+
+    @property
+    def hit_rate(self) -> float:
+        """Доля попаданий среди всех обращений"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class SingleFlight:
+    """Объединение одновременных вызовов с одинаковым ключом в один"""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.shared = 0
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    def __contains__(self, key: str) -> bool:
+        """Выполняется ли сейчас работа с ключом key"""
+        return key in self._inflight
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Выполнить func один раз для всех одновременных вызовов с ключом key
+
+        Args:
+            key: Ключ объединения (нормализованная тема)
+            func: Фабрика корутины, выполняющей работу
+
+        Returns:
+            Общий результат выполнения (исключение получат все ожидающие)
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.shared += 1
+
+        # Отмена одного ожидающего не должна прерывать работу для остальных
+        return await asyncio.shield(task)
@@ -0,0 +1,134 @@
+"""
+Локальное экстрактивное сжатие новостей перед промптом форматирования
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+# Границы предложений и строк (маркированные списки аналитика - отдельные строки)
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?…])\s+|\n+')
+_WORD = re.compile(r'\w+')
+_MARKDOWN_PREFIX = re.compile(r'^\s*(?:#+|[-*•]|\d+[.)])\s*')
+
+# Признаки свежести: даты, время, относительные указания
+_RECENCY = re.compile(
+    r'\b(?:сегодня|вчера|утром|вечером|ночью|только что|час(?:а|ов)? назад|'
+    r'today|yesterday|hours? ago|\d{1,2}:\d{2}|\d{4}-\d{2}-\d{2}|\d{1,2}\.\d{1,2}\.\d{2,4}|'
+    r'январ\w*|феврал\w*|март\w*|апрел\w*|ма[йя]\w*|июн\w*|июл\w*|август\w*|'
+    r'сентябр\w*|октябр\w*|ноябр\w*|декабр\w*)\b',
+    re.IGNORECASE
+)
+
+# Короткие служебные слова не должны влиять на значимость предложения
+_MIN_WORD_LENGTH = 3
+
+
+def estimate_tokens(text: str) -> int:
+    """Оценить число токенов (для кириллицы в среднем ~3 символа на токен)"""
+    return math.ceil(len(text) / 3)
+
+
+def split_sentences(text: str) -> List[str]:
+    """Разбить текст на уникальные предложения и строки без markdown-префиксов"""
+    sentences = []
+    seen = set()
+    for part in _SENTENCE_SPLIT.split(text):
+        part = _MARKDOWN_PREFIX.sub('', part).replace('**', '').strip()
+        if _WORD.search(part) and part not in seen:
+            seen.add(part)
+            sentences.append(part)
+    return sentences
+
+
+def score_sentences(sentences: List[str]) -> List[float]:
+    """
+    Оценить значимость предложений: TF-IDF + позиция + свежесть
+
+    Args:
+        sentences: Предложения в исходном порядке
+
+    Returns:
+        Оценки в том же порядке
+    """
+    tokenized = [
+        [word for word in _WORD.findall(sentence.lower()) if len(word) >= _MIN_WORD_LENGTH]
+        for sentence in sentences
+    ]
+    document_frequency = Counter(word for words in tokenized for word in set(words))
+    total = len(sentences)
+
+    scores = []
+    for position, words in enumerate(tokenized):
+        if words:
+            counts = Counter(words)
+            tf_idf = sum(
+                count * math.log((1 + total) / (1 + document_frequency[word]))
+                for word, count in counts.items()
+            ) / math.sqrt(len(words))
+        else:
+            tf_idf = 0.0
+
+        # Начало текста обычно содержит главное
+        position_bonus = 1.0 - position / max(total, 1)
+        recency_bonus = 0.5 if _RECENCY.search(sentences[position]) else 0.0
+        scores.append(tf_idf + position_bonus + recency_bonus)
+
+    return scores
+
+
+def _truncate(sentence: str, token_budget: int) -> str:
+    """Обрезать предложение до бюджета токенов по границе слова"""
+    limit = max(token_budget, 1) * 3
+    if len(sentence) <= limit:
+        return sentence
+    cut = sentence[:limit - 1].rsplit(' ', 1)[0].rstrip(' ,;:-')
+    return (cut or sentence[:limit - 1]) + "…"
+
+
+def compress(text: str, token_budget: int) -> Tuple[str, Dict[str, float]]:
+    """
+    Оставить самые значимые предложения в пределах бюджета токенов
+
+    Args:
+        text: Исходный текст новостей
+        token_budget: Максимальное число токенов результата
+
+    Returns:
+        Пара (сжатый текст в исходном порядке предложений, статистика)
+    """
+    original_tokens = estimate_tokens(text)
+    if original_tokens <= token_budget:
+        return text, {
+            'original_tokens': original_tokens,
+            'compressed_tokens': original_tokens,
+            'ratio': 1.0,
+        }
+
+    sentences = split_sentences(text)
+    scores = score_sentences(sentences)
+
+    selected = set()
+    used_tokens = 0
+    for index in sorted(range(len(sentences)), key=lambda i: scores[i], reverse=True):
+        sentence_tokens = estimate_tokens(sentences[index]) + 1
+        if used_tokens + sentence_tokens > token_budget:
+            continue
+        selected.add(index)
+        used_tokens += sentence_tokens
+
+    if selected:
+        compressed = "\n".join(sentences[index] for index in sorted(selected))
+    elif sentences:
+        # Каждое предложение длиннее бюджета: главное обрезается по границе слова
+        top = max(range(len(sentences)), key=lambda i: scores[i])
+        compressed = _truncate(sentences[top], token_budget)
+    else:
+        compressed = text
+    compressed_tokens = estimate_tokens(compressed)
+    return compressed, {
+        'original_tokens': original_tokens,
+        'compressed_tokens': compressed_tokens,
+        'ratio': compressed_tokens / original_tokens if original_tokens else 1.0,
+    }
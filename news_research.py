@@ -0,0 +1,222 @@
+"""
+Параллельный поиск новостей по всем настроенным источникам с общим дедлайном
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Результат поиска: {'title', 'url', 'snippet', 'source', 'published'}
+SearchResult = Dict[str, str]
+
+
+def _search_duckduckgo(topic: str, max_results: int, timeout: float = 10) -> List[SearchResult]:
+    """Поиск новостей через DuckDuckGo"""
+    from duckduckgo_search import DDGS
+
+    items = DDGS(timeout=max(1, round(timeout))).news(keywords=topic, max_results=max_results) or []
+    return [
+        {
+            'title': item.get('title', ''),
+            'url': item.get('url', ''),
+            'snippet': item.get('body', ''),
+            'source': 'DuckDuckGo',
+            'published': item.get('date', ''),
+        }
+        for item in items
+    ]
+
+
+def _search_tavily(topic: str, max_results: int, timeout: float = 60) -> List[SearchResult]:
+    """Поиск новостей через Tavily"""
+    from tavily import TavilyClient
+
+    client = TavilyClient(api_key=os.getenv('TAVILY_API_KEY'))
+    response = client.search(query=topic, topic="news", max_results=max_results, timeout=max(1, round(timeout)))
+    return [
+        {
+            'title': item.get('title', ''),
+            'url': item.get('url', ''),
+            'snippet': item.get('content', ''),
+            'source': 'Tavily',
+            'published': item.get('published_date', ''),
+        }
+        for item in response.get('results', [])
+    ]
+
+
+def _search_exa(topic: str, max_results: int) -> List[SearchResult]:
+    """Поиск новостей через Exa"""
+    from exa_py import Exa
+
+    client = Exa(api_key=os.getenv('EXA_API_KEY'))
+    since = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+    response = client.search_and_contents(
+        topic,
+        num_results=max_results,
+        text={"max_characters": 1000},
+        start_published_date=since,
+    )
+    return [
+        {
+            'title': item.title or '',
+            'url': item.url or '',
+            'snippet': item.text or '',
+            'source': 'Exa',
+            'published': item.published_date or '',
+        }
+        for item in response.results
+    ]
+
+
+def default_providers(timeout: float = 10) -> Dict[str, Callable[[str, int], List[SearchResult]]]:
+    """
+    Источники, для которых есть ключи API (DuckDuckGo ключа не требует)
+
+    Args:
+        timeout: HTTP-таймаут источников, которые его поддерживают (сек)
+    """
+    providers = {'duckduckgo': partial(_search_duckduckgo, timeout=timeout)}
+    if os.getenv('TAVILY_API_KEY'):
+        providers['tavily'] = partial(_search_tavily, timeout=timeout)
+    if os.getenv('EXA_API_KEY'):
+        providers['exa'] = _search_exa
+    return providers
+
+
+def _normalize_url(url: str) -> str:
+    """Привести URL к виду для сравнения (без схемы, www, параметров и слеша)"""
+    url = re.sub(r'^https?://(www\.)?', '', url.strip().lower())
+    return url.split('?', 1)[0].split('#', 1)[0].rstrip('/')
+
+
+def _normalize_title(title: str) -> str:
+    """Привести заголовок к виду для сравнения"""
+    return ' '.join(re.findall(r'\w+', title.lower()))
+
+
+def merge_results(results: List[SearchResult]) -> List[SearchResult]:
+    """
+    Объединить результаты источников, удалив дубликаты по URL и заголовку
+
+    Args:
+        results: Результаты всех источников в порядке поступления
+
+    Returns:
+        Список уникальных результатов
+    """
+    seen_urls = set()
+    seen_titles = set()
+    merged = []
+
+    for result in results:
+        url_key = _normalize_url(result.get('url', ''))
+        title_key = _normalize_title(result.get('title', ''))
+        if (url_key and url_key in seen_urls) or (title_key and title_key in seen_titles):
+            continue
+        if url_key:
+            seen_urls.add(url_key)
+        if title_key:
+            seen_titles.add(title_key)
+        merged.append(result)
+
+    return merged
+
+
+def format_results(results: List[SearchResult]) -> str:
+    """Представить результаты поиска текстом для промпта модели"""
+    blocks = []
+    for index, result in enumerate(results, 1):
+        header = f"{index}. {result['title']}"
+        meta = ", ".join(part for part in (result['source'], result['published']) if part)
+        blocks.append(
+            f"{header}\n"
+            f"Источник: {meta}\n"
+            f"URL: {result['url']}\n"
+            f"{result['snippet'].strip()}"
+        )
+    return "\n\n".join(blocks)
+
+
+class NewsResearcher:
+    """Одновременный опрос поисковых источников с глобальным дедлайном"""
+
+    def __init__(
+        self,
+        deadline: float = 8.0,
+        max_results: int = 8,
+        providers: Optional[Dict[str, Callable[[str, int], List[SearchResult]]]] = None,
+        max_workers: Optional[int] = None
+    ):
+        """
+        Инициализация исследователя
+
+        Args:
+            deadline: Общий лимит времени на поиск в секундах
+            max_results: Максимум результатов от каждого источника
+            providers: Источники поиска (по умолчанию - все настроенные с HTTP-таймаутом, равным дедлайну)
+            max_workers: Потоков для вызовов источников (по умолчанию - по два на источник)
+        """
+        self.deadline = deadline
+        self.max_results = max_results
+        self.providers = providers if providers is not None else default_providers(deadline)
+        # Отмена задачи не прерывает вызов источника в потоке: отдельный ограниченный пул
+        # не дает зависшим источникам занять общий пул asyncio и плодить потоки
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or max(1, 2 * len(self.providers)), thread_name_prefix="news-research"
+        )
+
+    async def search(self, topic: str) -> List[SearchResult]:
+        """
+        Опросить все источники параллельно и объединить результаты к дедлайну
+
+        Args:
+            topic: Тема поиска
+
+        Returns:
+            Уникальные результаты источников, ответивших до дедлайна
+        """
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        tasks = {
+            asyncio.ensure_future(loop.run_in_executor(
+                self._executor, contextvars.copy_context().run, provider, topic, self.max_results
+            )): name
+            for name, provider in self.providers.items()
+        }
+        if not tasks:
+            return []
+
+        done, pending = await asyncio.wait(tasks, timeout=self.deadline)
+
+        # Вызов, еще не взятый потоком, отменяется; начатый дорабатывает до своего таймаута
+        for task in pending:
+            task.cancel()
+            logger.warning(f"Источник {tasks[task]} не ответил за {self.deadline} с")
+
+        collected = []
+        # Порядок источников фиксирован, чтобы объединение было детерминированным
+        for task, name in tasks.items():
+            if task not in done:
+                continue
+            try:
+                collected.extend(task.result())
+            except Exception as e:
+                logger.warning(f"Ошибка поиска в источнике {name}: {e}")
+
+        merged = merge_results(collected)
+        logger.info(
+            f"Поиск по теме '{topic}': {len(merged)} уникальных результатов "
+            f"из {len(collected)} от {len(done)}/{len(tasks)} источников "
+            f"за {time.monotonic() - started:.2f} с"
+        )
+        return merged
@@ -3,26 +3,102 @@
 """
 
 import openai
+import httpx
 import asyncio
 import logging
-from typing import Optional
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple
 from textwrap import dedent
+from stream_preview import iterate_in_thread
+from news_compressor import estimate_tokens
+from post_patch import PatchError, apply_patch, parse_patch
+from post_scorer import score_post
+from resilient_call import STREAM_RETRIES, ResilientCaller
+from rate_limiter import PRIORITY_INTERACTIVE, current_priority, usage_tokens
 
 logger = logging.getLogger(__name__)
 
+CLIENT_MODES = ('thread', 'async')
+
+# Режимы правки: 'full' - модель переписывает пост целиком,
+# 'patch' - модель возвращает точечные замены, при неудаче - полная перезапись
+EDIT_MODES = ('full', 'patch')
+
+# Патч короче поста: лимит вывода меньше, чем у полной перезаписи
+PATCH_MAX_TOKENS = 600
+
+# Ответ анализа, когда пост уже соответствует всем правилам канала
+NO_SUGGESTIONS_MESSAGE = "Пост соответствует правилам канала: длина, разметка, заголовок и абзацы в порядке"
+
 class PostEditor:
     """Класс для редактирования постов с помощью OpenAI"""
     
-    def __init__(self, api_key: str, model: str = "gpt-4o"):
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gpt-4o",
+        client_mode: str = 'thread',
+        max_concurrency: int = 8,
+        timeout: float = 60.0,
+        base_url: Optional[str] = None,
+        edit_mode: str = 'full',
+        caller: Optional[ResilientCaller] = None
+    ):
         """
         Инициализация редактора постов
         
         Args:
             api_key: API ключ OpenAI
             model: Модель для использования (по умолчанию gpt-4o)
+            client_mode: 'thread' - синхронный клиент в потоках executor'а,
+                'async' - асинхронный клиент с общим пулом keep-alive соединений
+            max_concurrency: Максимум одновременных запросов в режиме 'async'
+            timeout: Таймаут одного запроса к API (сек)
+            base_url: Адрес OpenAI-совместимого API (по умолчанию официальный)
+            edit_mode: 'full' - полная перезапись поста, 'patch' - точечные замены
+            caller: Обертка повторов, хеджирования и общего ограничителя запросов
+                (по умолчанию - повторы без хеджа и без ограничителя)
         """
-        self.client = openai.OpenAI(api_key=api_key)
+        if client_mode not in CLIENT_MODES:
+            raise ValueError(f"Неизвестный режим клиента: {client_mode}")
+        if edit_mode not in EDIT_MODES:
+            raise ValueError(f"Неизвестный режим правки: {edit_mode}")
+        
         self.model = model
+        self.client_mode = client_mode
+        self.edit_mode = edit_mode
+        # Статистика последней правки и суммарная экономия токенов вывода
+        self.last_edit_stats: Optional[Dict[str, Any]] = None
+        self.saved_tokens_total = 0
+        self.timeout = timeout
+        self.caller = caller or ResilientCaller(name='editor', priority=PRIORITY_INTERACTIVE)
+        # Повторы выполняет общая обертка, встроенные повторы клиента отключены
+        self.client = openai.OpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0)
+        self.async_client: Optional[openai.AsyncOpenAI] = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        
+        if client_mode == 'async':
+            # Один пул соединений на все запросы: TLS-рукопожатие не повторяется,
+            # а лишние запросы ждут семафора, а не свободного соединения
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=max_concurrency,
+                    max_keepalive_connections=max_concurrency
+                ),
+                timeout=timeout
+            )
+            self.async_client = openai.AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                timeout=timeout,
+                max_retries=0,
+                http_client=http_client
+            )
+    
+    async def close(self):
+        """Закрыть пул соединений асинхронного клиента"""
+        if self.async_client is not None:
+            await self.async_client.close()
         
     async def edit_post(self, original_post: str, edit_instructions: str) -> str:
         """
@@ -40,42 +116,18 @@ class PostEditor:
         """
         try:
             logger.info("Начало редактирования поста с помощью ИИ")
+            started = time.perf_counter()
             
-            # Создаем системный промпт
-            system_prompt = dedent("""
-                Вы - эксперт редактор контента для Telegram каналов. 
-                
-                Ваши задачи:
-                1. Внимательно прочитать оригинальный пост
-                2. Понять инструкции по редактированию
-                3. Применить изменения, сохраняя общий стиль и структуру
-                4. Убедиться, что пост остается привлекательным и читаемым
-                5. Сохранить эмодзи и форматирование, если не указано иное
-                
-                Правила:
-                - Отвечайте только отредактированным постом
-                - Не добавляйте комментарии или объяснения
-                - Сохраняйте длину поста подходящей для Telegram (до 4096 символов)
-                - Если инструкции неясны, делайте разумные предположения
-            """).strip()
+            patch_tokens = 0
+            if self.edit_mode == 'patch':
+                edited_post, patch_tokens = await self._edit_with_patch(original_post, edit_instructions)
+                if edited_post is not None:
+                    self._report_edit('patch', patch_tokens, edited_post, started)
+                    return edited_post
             
-            # Создаем пользовательский промпт
-            user_prompt = dedent(f"""
-                Оригинальный пост:
-                {original_post}
-                
-                Инструкции по редактированию:
-                {edit_instructions}
-                
-                Пожалуйста, примените указанные изменения к оригинальному посту.
-            """).strip()
+            system_prompt, user_prompt = self._build_edit_prompts(original_post, edit_instructions)
             
-            # Выполняем запрос к OpenAI в отдельном потоке
-            response = await asyncio.to_thread(
-                self._make_openai_request,
-                system_prompt,
-                user_prompt
-            )
+            response = await self._request(system_prompt, user_prompt)
             
             edited_post = response.choices[0].message.content.strip()
             
@@ -83,47 +135,376 @@ class PostEditor:
             if not edited_post:
                 raise Exception("Получен пустой ответ от ИИ")
             
-            logger.info("Пост успешно отредактирован")
+            output_tokens = patch_tokens + self._output_tokens(response, edited_post)
+            self._report_edit('fallback' if self.edit_mode == 'patch' else 'full', output_tokens, edited_post, started)
             return edited_post
             
         except Exception as e:
             logger.error(f"Ошибка редактирования поста: {e}")
             raise Exception(f"Не удалось отредактировать пост: {str(e)}")
     
-    def _make_openai_request(self, system_prompt: str, user_prompt: str):
+    async def _edit_with_patch(self, original_post: str, edit_instructions: str) -> Tuple[Optional[str], int]:
         """
-        Выполнить запрос к OpenAI API
+        Попробовать отредактировать пост точечными заменами
+        
+        Args:
+            original_post: Оригинальный текст поста
+            edit_instructions: Инструкции по редактированию
+            
+        Returns:
+            Пара (отредактированный пост или None, если патч не применился;
+            токены вывода, потраченные на патч)
+        """
+        system_prompt, user_prompt = self._build_patch_prompts(original_post, edit_instructions)
+        response = await self._request(
+            system_prompt,
+            user_prompt,
+            max_tokens=PATCH_MAX_TOKENS,
+            temperature=0.3,
+            response_format={"type": "json_object"}
+        )
+        content = response.choices[0].message.content or ""
+        output_tokens = self._output_tokens(response, content)
+        
+        try:
+            edited_post = apply_patch(original_post, parse_patch(content)).strip()
+        except PatchError as e:
+            logger.warning(f"Патч не применился, переписываем пост целиком: {e}")
+            return None, output_tokens
+        
+        if not edited_post:
+            logger.warning("Патч удалил весь пост, переписываем пост целиком")
+            return None, output_tokens
+        
+        # Замены по фрагментам могут разорвать теги - проверка локальная и почти бесплатная
+        if 'tags' in score_post(edited_post).rules and 'tags' not in score_post(original_post).rules:
+            logger.warning("Патч сломал разметку, переписываем пост целиком")
+            return None, output_tokens
+        return edited_post, output_tokens
+    
+    @staticmethod
+    def _output_tokens(response, content: str) -> int:
+        """Токены вывода из ответа API (или оценка по длине текста, если usage нет)"""
+        usage = getattr(response, 'usage', None)
+        if usage is not None and getattr(usage, 'completion_tokens', None):
+            return usage.completion_tokens
+        return estimate_tokens(content)
+    
+    def _report_edit(self, mode: str, output_tokens: int, edited_post: str, started: float):
+        """
+        Записать и залогировать экономию токенов вывода относительно полной перезаписи
+        
+        Args:
+            mode: 'patch', 'full' или 'fallback' (патч не применился)
+            output_tokens: Токены вывода, фактически потраченные на правку
+            edited_post: Итоговый текст (полная перезапись вывела бы его целиком)
+            started: Время начала правки (time.perf_counter)
+        """
+        full_tokens = estimate_tokens(edited_post)
+        saved_tokens = full_tokens - output_tokens if mode != 'full' else 0
+        self.saved_tokens_total += saved_tokens
+        self.last_edit_stats = {
+            'mode': mode,
+            'output_tokens': output_tokens,
+            'full_tokens': full_tokens,
+            'saved_tokens': saved_tokens,
+            'elapsed': time.perf_counter() - started,
+        }
+        logger.info(
+            f"Пост отредактирован ({mode}): {output_tokens} токенов вывода, "
+            f"полная перезапись ~{full_tokens}, экономия ~{saved_tokens}, "
+            f"{self.last_edit_stats['elapsed']:.2f} с"
+        )
+    
+    async def edit_post_stream(self, original_post: str, edit_instructions: str) -> AsyncIterator[str]:
+        """
+        Редактировать пост потоково
+        
+        В режиме 'patch' примененный патч отдается одним фрагментом;
+        если патч не применился, полная перезапись идет потоком.
+        
+        Args:
+            original_post: Оригинальный текст поста
+            edit_instructions: Инструкции по редактированию
+            
+        Yields:
+            Фрагменты отредактированного поста по мере генерации
+        """
+        if self.edit_mode == 'patch':
+            started = time.perf_counter()
+            edited_post, patch_tokens = await self._edit_with_patch(original_post, edit_instructions)
+            if edited_post is not None:
+                self._report_edit('patch', patch_tokens, edited_post, started)
+                yield edited_post
+                return
+        
+        logger.info("Начало потокового редактирования поста с помощью ИИ")
+        system_prompt, user_prompt = self._build_edit_prompts(original_post, edit_instructions)
+        
+        if self.async_client is None:
+            async for delta in iterate_in_thread(self._stream_openai_request, system_prompt, user_prompt):
+                yield delta
+            return
+        
+        limiter = self.caller.limiter
+        reservation = None
+        if limiter is not None:
+            # Поток идет мимо обертки повторов, поэтому место в очереди занимается здесь
+            reservation = await asyncio.wait_for(
+                limiter.acquire(
+                    self._request_tokens(system_prompt, user_prompt),
+                    current_priority(self.caller.priority)
+                ),
+                self.caller.deadline
+            )
+        
+        parts = []
+        actual_tokens = None
+        try:
+            # Слот семафора занят, пока ответ не дочитан до конца
+            async with self._semaphore:
+                # Поток нельзя повторить или продублировать с середины, поэтому
+                # для него остаются встроенные повторы клиента до начала ответа
+                stream = await self.async_client.with_options(max_retries=STREAM_RETRIES).chat.completions.create(
+                    **self._request_params(system_prompt, user_prompt),
+                    stream=True,
+                    stream_options={'include_usage': True},
+                    timeout=self.timeout
+                )
+                async for chunk in stream:
+                    # Расход приходит последним фрагментом без текста
+                    actual_tokens = usage_tokens(chunk) or actual_tokens
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        parts.append(chunk.choices[0].delta.content)
+                        yield parts[-1]
+        finally:
+            if reservation is not None:
+                limiter.settle(reservation, self._streamed_tokens(system_prompt, user_prompt, parts, actual_tokens))
+    
+    @staticmethod
+    def _build_edit_prompts(original_post: str, edit_instructions: str) -> Tuple[str, str]:
+        """
+        Собрать системный и пользовательский промпты редактирования
+        
+        Args:
+            original_post: Оригинальный текст поста
+            edit_instructions: Инструкции по редактированию
+            
+        Returns:
+            Пара (системный промпт, пользовательский промпт)
+        """
+        # Создаем системный промпт
+        system_prompt = dedent("""
+            Вы - эксперт редактор контента для Telegram каналов. 
+            
+            Ваши задачи:
+            1. Внимательно прочитать оригинальный пост
+            2. Понять инструкции по редактированию
+            3. Применить изменения, сохраняя общий стиль и структуру
+            4. Убедиться, что пост остается привлекательным и читаемым
+            5. Сохранить эмодзи и форматирование, если не указано иное
+            
+            Правила:
+            - Отвечайте только отредактированным постом
+            - Не добавляйте комментарии или объяснения
+            - Сохраняйте длину поста подходящей для Telegram (до 4096 символов)
+            - Если инструкции неясны, делайте разумные предположения
+        """).strip()
+        
+        # Создаем пользовательский промпт
+        user_prompt = dedent(f"""
+            Оригинальный пост:
+            {original_post}
+            
+            Инструкции по редактированию:
+            {edit_instructions}
+            
+            Пожалуйста, примените указанные изменения к оригинальному посту.
+        """).strip()
+        
+        return system_prompt, user_prompt
+    
+    @staticmethod
+    def _build_patch_prompts(original_post: str, edit_instructions: str) -> Tuple[str, str]:
+        """
+        Собрать промпты правки, в ответ на которые модель возвращает JSON-патч
+        
+        Args:
+            original_post: Оригинальный текст поста
+            edit_instructions: Инструкции по редактированию
+            
+        Returns:
+            Пара (системный промпт, пользовательский промпт)
+        """
+        system_prompt = dedent("""
+            Вы - эксперт редактор контента для Telegram каналов.
+            Вы вносите изменения в пост точечными заменами, не переписывая его целиком.
+            
+            Ответ - только JSON-объект:
+            {"replacements": [{"find": "точный фрагмент поста", "replace": "новый текст"}]}
+            
+            Правила:
+            - "find" копирует фрагмент оригинала символ в символ, включая HTML теги и эмодзи
+            - Каждый "find" встречается в посте ровно один раз: при необходимости захватите
+              соседние слова
+            - Замены применяются по порядку к уже измененному тексту
+            - Чтобы добавить текст, замените соседний фрагмент на этот фрагмент плюс новый текст
+            - Сохраняйте стиль, форматирование и длину поста подходящей для Telegram
+            - Не меняйте то, чего не требуют инструкции
+        """).strip()
+        
+        user_prompt = dedent(f"""
+            Оригинальный пост:
+            {original_post}
+            
+            Инструкции по редактированию:
+            {edit_instructions}
+        """).strip()
+        
+        return system_prompt, user_prompt
+    
+    def _request_params(self, system_prompt: str, user_prompt: str, **overrides) -> Dict[str, Any]:
+        """
+        Параметры запроса к OpenAI API
         
         Args:
             system_prompt: Системный промпт
             user_prompt: Пользовательский промпт
+            **overrides: Параметры, заменяющие значения по умолчанию
             
         Returns:
-            Ответ от OpenAI API
+            Именованные аргументы для chat.completions.create
         """
-        return self.client.chat.completions.create(
-            model=self.model,
-            messages=[
+        return {
+            'model': self.model,
+            'messages': [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
-            max_tokens=2000,
-            temperature=0.7,
-            top_p=0.9,
-            frequency_penalty=0.1,
-            presence_penalty=0.1
+            'max_tokens': 2000,
+            'temperature': 0.7,
+            'top_p': 0.9,
+            'frequency_penalty': 0.1,
+            'presence_penalty': 0.1,
+            **overrides,
+        }
+    
+    async def _request(self, system_prompt: str, user_prompt: str, **overrides):
+        """
+        Выполнить запрос к OpenAI API в текущем режиме клиента
+        
+        Args:
+            system_prompt: Системный промпт
+            user_prompt: Пользовательский промпт
+            **overrides: Параметры запроса, заменяющие значения по умолчанию
+            
+        Returns:
+            Ответ от OpenAI API
+        """
+        if self.async_client is None:
+            # Синхронный клиент блокирует поток, поэтому выполняется в executor'е
+            return await asyncio.to_thread(self._make_openai_request, system_prompt, user_prompt, **overrides)
+        
+        return await self.caller.call(
+            self._make_async_request, system_prompt, user_prompt,
+            tokens=self._request_tokens(system_prompt, user_prompt, **overrides),
+            **overrides
         )
     
+    def _request_tokens(self, system_prompt: str, user_prompt: str, **overrides) -> int:
+        """Оценка токенов запроса для ограничителя: промпт плюс предел ответа"""
+        max_tokens = self._request_params(system_prompt, user_prompt, **overrides)['max_tokens']
+        return estimate_tokens(system_prompt) + estimate_tokens(user_prompt) + max_tokens
+    
+    async def _make_async_request(self, system_prompt: str, user_prompt: str, **overrides):
+        """Одна попытка асинхронного запроса; хедж занимает собственный слот семафора"""
+        async with self._semaphore:
+            return await self.async_client.chat.completions.create(
+                **self._request_params(system_prompt, user_prompt, **overrides),
+                timeout=self.timeout
+            )
+    
+    def _make_openai_request(self, system_prompt: str, user_prompt: str, **overrides):
+        """
+        Выполнить запрос к OpenAI API
+        
+        Args:
+            system_prompt: Системный промпт
+            user_prompt: Пользовательский промпт
+            **overrides: Параметры запроса, заменяющие значения по умолчанию
+            
+        Returns:
+            Ответ от OpenAI API
+        """
+        return self.caller.call_sync(
+            self.client.chat.completions.create,
+            tokens=self._request_tokens(system_prompt, user_prompt, **overrides),
+            **self._request_params(system_prompt, user_prompt, **overrides)
+        )
+    
+    def _stream_openai_request(self, system_prompt: str, user_prompt: str) -> Iterator[str]:
+        """
+        Выполнить потоковый запрос к OpenAI API
+        
+        Args:
+            system_prompt: Системный промпт
+            user_prompt: Пользовательский промпт
+            
+        Yields:
+            Фрагменты ответа по мере генерации
+        """
+        limiter = self.caller.limiter
+        reservation = None
+        if limiter is not None:
+            reservation = limiter.acquire_sync(
+                self._request_tokens(system_prompt, user_prompt),
+                current_priority(self.caller.priority),
+                timeout=self.caller.deadline
+            )
+        
+        parts = []
+        actual_tokens = None
+        try:
+            stream = self.client.with_options(max_retries=STREAM_RETRIES).chat.completions.create(
+                **self._request_params(system_prompt, user_prompt),
+                stream=True,
+                stream_options={'include_usage': True}
+            )
+            for chunk in stream:
+                actual_tokens = usage_tokens(chunk) or actual_tokens
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield parts[-1]
+        finally:
+            if reservation is not None:
+                limiter.settle(reservation, self._streamed_tokens(system_prompt, user_prompt, parts, actual_tokens))
+    
+    @staticmethod
+    def _streamed_tokens(system_prompt: str, user_prompt: str, parts, actual_tokens: Optional[int]) -> int:
+        """Расход потокового запроса: usage из последнего фрагмента или оценка по выведенному тексту"""
+        if actual_tokens is not None:
+            return actual_tokens
+        return estimate_tokens(system_prompt) + estimate_tokens(user_prompt) + estimate_tokens(''.join(parts))
+    
     async def suggest_improvements(self, post: str) -> str:
         """
         Предложить улучшения для поста
         
+        Пост сначала проверяется локально: если он соответствует всем правилам
+        канала, модель не вызывается, а найденные нарушения передаются модели,
+        чтобы она не тратила ответ на их поиск.
+        
         Args:
             post: Текст поста для анализа
             
         Returns:
             Предложения по улучшению
         """
+        check = score_post(post)
+        if check.passed:
+            logger.info("Пост соответствует правилам канала, анализ моделью пропущен")
+            return NO_SUGGESTIONS_MESSAGE
+        
         try:
             system_prompt = dedent("""
                 Вы - эксперт по контент-маркетингу для Telegram каналов.
@@ -137,30 +518,40 @@ class PostEditor:
                 - Вовлеченности аудитории
             """).strip()
             
-            user_prompt = f"Проанализируйте этот пост и предложите 3-5 конкретных улучшений:\n\n{post}"
-            
-            response = await asyncio.to_thread(
-                self._make_openai_request,
-                system_prompt,
-                user_prompt
+            user_prompt = (
+                f"Проанализируйте этот пост и предложите 3-5 конкретных улучшений:\n\n{post}\n\n"
+                f"Автоматическая проверка уже нашла: {'; '.join(text for _, text in check.issues)}"
             )
             
+            response = await self._request(system_prompt, user_prompt)
+            
             return response.choices[0].message.content.strip()
             
         except Exception as e:
             logger.error(f"Ошибка анализа поста: {e}")
-            return "Не удалось проанализировать пост"
+            # Советы по нарушенным правилам не требуют модели
+            return "\n".join(f"• {suggestion}" for suggestion in check.suggestions())
     
-    async def optimize_for_engagement(self, post: str) -> str:
+    async def optimize_for_engagement(self, post: str, force: bool = False) -> str:
         """
         Оптимизировать пост для максимальной вовлеченности
         
+        Пост, который уже соответствует всем правилам канала, возвращается
+        без вызова модели. Переписанный пост проверяется локально: если он
+        нарушает больше правил, чем исходный, остается исходный.
+        
         Args:
             post: Оригинальный пост
+            force: Переписать пост, даже если он соответствует правилам
             
         Returns:
             Оптимизированный пост
         """
+        original_check = score_post(post)
+        if original_check.passed and not force:
+            logger.info("Пост соответствует правилам канала, оптимизация моделью пропущена")
+            return post
+        
         try:
             system_prompt = dedent("""
                 Вы - эксперт по созданию вирусного контента для Telegram.
@@ -176,13 +567,14 @@ class PostEditor:
             
             user_prompt = f"Оптимизируйте этот пост для максимальной вовлеченности:\n\n{post}"
             
-            response = await asyncio.to_thread(
-                self._make_openai_request,
-                system_prompt,
-                user_prompt
-            )
+            response = await self._request(system_prompt, user_prompt)
             
-            return response.choices[0].message.content.strip()
+            optimized_post = response.choices[0].message.content.strip()
+            # Эмодзи просит сам промпт оптимизации, поэтому они не считаются нарушением
+            if score_post(optimized_post, allow_emoji=True).score < score_post(post, allow_emoji=True).score:
+                logger.warning("Оптимизированный пост нарушает больше правил, чем исходный, оставляем исходный")
+                return post
+            return optimized_post
             
         except Exception as e:
             logger.error(f"Ошибка оптимизации поста: {e}")
@@ -0,0 +1,172 @@
+"""
+История версий поста: правки хранятся дельтами от оригинала, отмена и возврат без вызовов модели
+"""
+
+import sys
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Tuple
+
+# Дельта - замены диапазонов оригинала: (начало, конец, новый текст)
+Delta = List[Tuple[int, int, str]]
+
+# Накладные расходы одной замены (два индекса) в пересчете на символы
+_OP_OVERHEAD = 8
+
+
+def make_delta(base: str, text: str) -> Delta:
+    """Вычислить дельту, превращающую base в text"""
+    matcher = SequenceMatcher(None, base, text, autojunk=False)
+    return [
+        (i1, i2, text[j1:j2])
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != 'equal'
+    ]
+
+
+def apply_delta(base: str, delta: Delta) -> str:
+    """Восстановить текст из оригинала и дельты"""
+    parts = []
+    position = 0
+    for start, end, replacement in delta:
+        parts.append(base[position:start])
+        parts.append(replacement)
+        position = end
+    parts.append(base[position:])
+    return ''.join(parts)
+
+
+def delta_size(delta: Delta) -> int:
+    """Примерный объем дельты в символах"""
+    return sum(len(replacement) + _OP_OVERHEAD for _, _, replacement in delta)
+
+
+class PostHistory:
+    """
+    Цепочка версий поста с отменой и возвратом
+
+    Версия 0 - оригинал, остальные хранятся дельтами от него. При превышении
+    лимитов удаляются самые старые правки, оригинал остается всегда.
+    """
+
+    __slots__ = ('original', 'max_versions', 'max_chars', '_deltas', '_size', '_index', '_text')
+
+    def __init__(self, original: str, max_versions: int = 20, max_chars: int = 20000):
+        """
+        Инициализация истории
+
+        Args:
+            original: Исходный текст поста
+            max_versions: Максимум хранимых правок (без оригинала)
+            max_chars: Максимальный суммарный объем дельт в символах
+        """
+        self.original = original
+        self.max_versions = max_versions
+        self.max_chars = max_chars
+        self._deltas: List[Delta] = []
+        self._size = 0
+        self._index = 0
+        self._text = original
+
+    def __len__(self) -> int:
+        """Число версий, включая оригинал"""
+        return len(self._deltas) + 1
+
+    @property
+    def text(self) -> str:
+        """Текущая версия"""
+        return self._text
+
+    @property
+    def index(self) -> int:
+        """Номер текущей версии (0 - оригинал)"""
+        return self._index
+
+    @property
+    def size(self) -> int:
+        """Объем хранимых дельт в символах"""
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        """Примерный объем истории в памяти процесса (байт)"""
+        total = sys.getsizeof(self) + sys.getsizeof(self.original) + sys.getsizeof(self._deltas)
+        if self._text is not self.original:
+            total += sys.getsizeof(self._text)
+        for delta in self._deltas:
+            total += sys.getsizeof(delta) + sum(
+                sys.getsizeof(op) + sys.getsizeof(replacement) for op in delta for replacement in op[2:]
+            )
+        return total
+
+    @property
+    def can_undo(self) -> bool:
+        return self._index > 0
+
+    @property
+    def can_redo(self) -> bool:
+        return self._index < len(self._deltas)
+
+    def push(self, text: str) -> str:
+        """
+        Добавить новую версию после текущей
+
+        Отмененные версии после текущей отбрасываются, как в обычном редакторе.
+
+        Returns:
+            Текущая версия
+        """
+        if text == self._text:
+            return self._text
+
+        for delta in self._deltas[self._index:]:
+            self._size -= delta_size(delta)
+        del self._deltas[self._index:]
+
+        delta = make_delta(self.original, text)
+        self._deltas.append(delta)
+        self._size += delta_size(delta)
+
+        # Самые старые правки вытесняются первыми; последняя версия остается всегда
+        while len(self._deltas) > 1 and (
+            len(self._deltas) > self.max_versions or self._size > self.max_chars
+        ):
+            self._size -= delta_size(self._deltas.pop(0))
+
+        self._index = len(self._deltas)
+        self._text = text
+        return self._text
+
+    def undo(self) -> str:
+        """Перейти к предыдущей версии и вернуть ее текст"""
+        if self.can_undo:
+            self._move(self._index - 1)
+        return self._text
+
+    def redo(self) -> str:
+        """Перейти к следующей версии и вернуть ее текст"""
+        if self.can_redo:
+            self._move(self._index + 1)
+        return self._text
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Состояние истории для сохранения в JSON"""
+        return {
+            'original': self.original,
+            'max_versions': self.max_versions,
+            'max_chars': self.max_chars,
+            'deltas': self._deltas,
+            'index': self._index,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'PostHistory':
+        """Восстановить историю из to_dict()"""
+        history = cls(data['original'], max_versions=data['max_versions'], max_chars=data['max_chars'])
+        history._deltas = [[tuple(op) for op in delta] for delta in data['deltas']]
+        history._size = sum(delta_size(delta) for delta in history._deltas)
+        history._move(data['index'])
+        return history
+
+    def _move(self, index: int):
+        self._index = index
+        self._text = apply_delta(self.original, self._deltas[index - 1]) if index else self.original
@@ -0,0 +1,69 @@
+"""
+Точечные правки поста: разбор JSON-патча от модели и его применение к тексту
+"""
+
+import json
+import re
+from typing import List, Tuple
+
+Replacement = Tuple[str, str]
+
+# Модель иногда оборачивает JSON в блок ```json ... ```
+_CODE_FENCE = re.compile(r'^\s*```(?:json)?\s*|\s*```\s*$')
+
+
+class PatchError(ValueError):
+    """Патч не удалось разобрать или однозначно применить"""
+
+
+def parse_patch(text: str) -> List[Replacement]:
+    """
+    Разобрать ответ модели вида {"replacements": [{"find": "...", "replace": "..."}]}
+
+    Args:
+        text: Ответ модели
+
+    Returns:
+        Список пар (искомый фрагмент, замена)
+
+    Raises:
+        PatchError: Если ответ не является корректным патчем
+    """
+    try:
+        data = json.loads(_CODE_FENCE.sub('', text))
+    except json.JSONDecodeError as e:
+        raise PatchError(f"Ответ не является JSON: {e}")
+
+    items = data.get('replacements') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise PatchError("В патче нет замен")
+
+    replacements = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise PatchError("Замена должна быть объектом")
+        find, replace = item.get('find'), item.get('replace')
+        if not isinstance(find, str) or not find or not isinstance(replace, str):
+            raise PatchError("У замены должны быть непустое поле 'find' и строка 'replace'")
+        replacements.append((find, replace))
+    return replacements
+
+
+def apply_patch(post: str, replacements: List[Replacement]) -> str:
+    """
+    Применить замены по порядку
+
+    Каждый искомый фрагмент должен встречаться в текущем тексте ровно один раз,
+    иначе неясно, что именно модель хотела заменить.
+
+    Raises:
+        PatchError: Если фрагмент не найден или встречается несколько раз
+    """
+    for find, replace in replacements:
+        count = post.count(find)
+        if count != 1:
+            problem = "не найден" if count == 0 else f"встречается {count} раз"
+            raise PatchError(f"Фрагмент {find[:40]!r} {problem}")
+        post = post.replace(find, replace)
+
+    return post
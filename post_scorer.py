@@ -0,0 +1,175 @@
+"""
+Локальная проверка поста по правилам канала (optimai_data/content_instructions.py)
+
+Проверка занимает микросекунды, поэтому редактор сначала оценивает пост сам
+и обращается к модели, только если переписывать действительно есть что.
+"""
+
+import re
+from typing import Iterable, List, Tuple
+
+from telegram_html import ALLOWED_TAGS, visible_length
+
+MAX_LENGTH = 1000           # Лимит видимой длины поста
+MAX_HEADLINE_LENGTH = 90    # Заголовок должен помещаться в одну-две строки превью
+MAX_PARAGRAPH_LENGTH = 450  # Абзац длиннее читается на телефоне сплошной стеной
+
+_TAG = re.compile(r'<(/?)([a-zA-Z][\w-]*)[^>]*?(/?)>')
+_HEADLINE = re.compile(r'^\s*<(b|strong)>(.*?)</\1>', re.DOTALL)
+_MARKDOWN = re.compile(r'\*\*|__|```|^#+\s|\[[^\]]+\]\([^)]+\)', re.MULTILINE)
+_HASHTAG = re.compile(r'(?<![\w&])#\w')
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+_EMOJI = re.compile('[\U0001F000-\U0001FAFF\u2600-\u27BF\u2B00-\u2BFF\u200D\uFE0F]')
+
+# Вес нарушения в оценке: обрезка и сломанная разметка портят пост сильнее стиля
+RULE_WEIGHTS = {
+    'length': 0.4,
+    'tags': 0.4,
+    'headline': 0.2,
+    'markdown': 0.2,
+    'emoji': 0.1,
+    'paragraphs': 0.1,
+}
+
+# Готовые советы по каждому правилу: для них модель не нужна
+RULE_SUGGESTIONS = {
+    'length': "Сократите пост до {max_length} символов видимого текста, сохранив главный вывод",
+    'tags': "Исправьте разметку: только теги Telegram (<b>, <i>, <u>, <a>, <code>, <pre>), все теги закрыты",
+    'headline': "Начните пост с короткого заголовка в <b>...</b> (до {max_headline} символов)",
+    'markdown': "Уберите markdown-разметку и хэштеги: оформление только HTML-тегами",
+    'emoji': "Уберите эмодзи: в канале они используются только по явной просьбе",
+    'paragraphs': "Разбейте текст на абзацы по {max_paragraph} символов и меньше, отделяя их пустой строкой",
+}
+
+
+def tag_errors(content: str) -> List[str]:
+    """
+    Проверить теги на поддержку Telegram и парность
+
+    Returns:
+        Список ошибок разметки (пустой - теги корректны)
+    """
+    errors = []
+    stack = []
+    unsupported = set()
+    for closing, name, self_closing in _TAG.findall(content):
+        name = name.lower()
+        if name not in ALLOWED_TAGS:
+            unsupported.add(name)
+        elif closing:
+            if not stack or stack.pop() != name:
+                errors.append(f"несбалансированный тег </{name}>")
+        elif not self_closing:
+            stack.append(name)
+
+    if unsupported:
+        errors.append(f"неподдерживаемые теги: {sorted(unsupported)}")
+    if stack:
+        errors.append(f"незакрытые теги: {stack}")
+    return errors
+
+
+class PostScore:
+    """Результат проверки поста: найденные нарушения и итоговая оценка"""
+
+    def __init__(self, issues: List[Tuple[str, str]], length: int):
+        """
+        Args:
+            issues: Пары (правило из RULE_WEIGHTS, описание нарушения)
+            length: Видимая длина поста
+        """
+        self.issues = issues
+        self.length = length
+
+    @property
+    def rules(self) -> List[str]:
+        """Нарушенные правила без повторов, в порядке проверки"""
+        return list(dict.fromkeys(rule for rule, _ in self.issues))
+
+    @property
+    def passed(self) -> bool:
+        """Пост соответствует всем правилам"""
+        return not self.issues
+
+    @property
+    def score(self) -> float:
+        """Оценка от 0 до 1 (1 - нарушений нет)"""
+        return max(0.0, 1.0 - sum(RULE_WEIGHTS[rule] for rule in self.rules))
+
+    def suggestions(
+        self,
+        max_length: int = MAX_LENGTH,
+        max_headline: int = MAX_HEADLINE_LENGTH,
+        max_paragraph: int = MAX_PARAGRAPH_LENGTH
+    ) -> List[str]:
+        """Готовые советы по нарушенным правилам"""
+        return [
+            RULE_SUGGESTIONS[rule].format(
+                max_length=max_length, max_headline=max_headline, max_paragraph=max_paragraph
+            )
+            for rule in self.rules
+        ]
+
+
+def score_post(
+    content: str,
+    max_length: int = MAX_LENGTH,
+    max_headline: int = MAX_HEADLINE_LENGTH,
+    max_paragraph: int = MAX_PARAGRAPH_LENGTH,
+    allow_emoji: bool = False
+) -> PostScore:
+    """
+    Проверить пост по правилам канала
+
+    Args:
+        content: HTML-текст поста
+        max_length: Лимит видимой длины
+        max_headline: Лимит длины заголовка
+        max_paragraph: Лимит длины абзаца
+        allow_emoji: Эмодзи запрошены явно и не считаются нарушением
+
+    Returns:
+        Найденные нарушения и оценка
+    """
+    issues = []
+
+    length = visible_length(content)
+    if length > max_length:
+        issues.append(('length', f"длина {length} из {max_length}"))
+
+    for error in tag_errors(content):
+        issues.append(('tags', error))
+
+    headline = _HEADLINE.match(content)
+    if headline is None:
+        issues.append(('headline', "нет заголовка <b>"))
+    else:
+        headline_length = visible_length(headline.group(2))
+        if headline_length > max_headline:
+            issues.append(('headline', f"заголовок {headline_length} из {max_headline}"))
+        elif not headline_length:
+            issues.append(('headline', "пустой заголовок"))
+
+    if _MARKDOWN.search(content):
+        issues.append(('markdown', "markdown-разметка"))
+    if _HASHTAG.search(content):
+        issues.append(('markdown', "хэштеги"))
+
+    if not allow_emoji and _EMOJI.search(content):
+        issues.append(('emoji', "эмодзи"))
+
+    body = content[headline.end():] if headline else content
+    paragraphs = [part for part in _PARAGRAPH_BREAK.split(body.strip()) if part.strip()]
+    if not paragraphs:
+        issues.append(('paragraphs', "нет текста после заголовка"))
+    else:
+        longest = max(visible_length(part) for part in paragraphs)
+        if longest > max_paragraph:
+            issues.append(('paragraphs', f"абзац {longest} из {max_paragraph}"))
+
+    return PostScore(issues, length)
+
+
+def score_posts(contents: Iterable[str], **limits) -> List[PostScore]:
+    """Проверить пачку постов (варианты, черновики) с одинаковыми лимитами"""
+    return [score_post(content, **limits) for content in contents]
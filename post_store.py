@@ -0,0 +1,683 @@
+"""
+Хранилище постов, ожидающих подтверждения: в памяти, в SQLite (переживает перезапуск)
+или в Redis (общее для нескольких процессов бота)
+"""
+
+import asyncio
+import heapq
+import json
+import logging
+import sqlite3
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from post_history import PostHistory
+
+logger = logging.getLogger(__name__)
+
+STORE_BACKENDS = ('memory', 'sqlite', 'redis')
+
+# Скрипты Redis выполняются атомарно: между проверкой и записью не вклинится другой процесс.
+# Обновление полей существующего поста (KEYS[1] - хэш поста, ARGV - пары поле/значение)
+_REDIS_UPDATE = """
+if redis.call('HEXISTS', KEYS[1], 'created_at') == 0 then
+    return false
+end
+if #ARGV > 0 then
+    redis.call('HSET', KEYS[1], unpack(ARGV))
+end
+return redis.call('HGETALL', KEYS[1])
+"""
+
+# Чтение и удаление поста (KEYS[1] - хэш поста, KEYS[2] - индекс по времени, ARGV[1] - ID поста)
+_REDIS_TAKE = """
+local fields = redis.call('HGETALL', KEYS[1])
+if #fields == 0 then
+    return false
+end
+redis.call('DEL', KEYS[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+return fields
+"""
+
+# Индекс (user_id, created_at) отдает посты пользователя уже упорядоченными,
+# индекс created_at - просроченные посты без полного просмотра таблицы
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending_posts (
+    post_id TEXT PRIMARY KEY,
+    user_id INTEGER,
+    created_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pending_posts_user ON pending_posts (user_id, created_at);
+CREATE INDEX IF NOT EXISTS pending_posts_created ON pending_posts (created_at);
+"""
+
+
+def encode_post(post_data: Dict[str, Any]) -> str:
+    """Сериализовать данные поста в JSON (история версий и время создания - отдельно)"""
+    data = {key: value for key, value in post_data.items() if key not in ('history', 'created_at')}
+    if post_data.get('history') is not None:
+        data['history'] = post_data['history'].to_dict()
+    return json.dumps(data, ensure_ascii=False)
+
+
+def decode_post(data: str, created_at: float) -> Dict[str, Any]:
+    """Восстановить данные поста из encode_post()"""
+    post_data = json.loads(data)
+    if post_data.get('history') is not None:
+        post_data['history'] = PostHistory.from_dict(post_data['history'])
+    post_data['created_at'] = datetime.fromtimestamp(created_at)
+    return post_data
+
+
+def encode_fields(fields: Dict[str, Any]) -> Dict[str, str]:
+    """Сериализовать поля поста по отдельности (для хэша Redis)"""
+    encoded = {}
+    for key, value in fields.items():
+        if key == 'history' and value is not None:
+            value = value.to_dict()
+        elif key == 'created_at':
+            value = value.timestamp()
+        encoded[key] = json.dumps(value, ensure_ascii=False)
+    return encoded
+
+
+def decode_fields(encoded: Dict[str, str]) -> Dict[str, Any]:
+    """Восстановить поля поста из encode_fields()"""
+    post_data = {key: json.loads(value) for key, value in encoded.items()}
+    if post_data.get('history') is not None:
+        post_data['history'] = PostHistory.from_dict(post_data['history'])
+    post_data['created_at'] = datetime.fromtimestamp(post_data['created_at'])
+    return post_data
+
+
+class PostStore:
+    """
+    Интерфейс хранилища постов
+
+    Данные поста - словарь с полями content, original_content, history, topic,
+    user_id, created_at и т.д. Изменения сохраняются только через update():
+    get() может вернуть копию.
+    """
+
+    async def get(self, post_id: str) -> Optional[Dict[str, Any]]:
+        """Данные поста или None, если поста нет"""
+        raise NotImplementedError
+
+    async def put(self, post_id: str, post_data: Dict[str, Any]):
+        """Сохранить пост целиком (новый или с заменой)"""
+        raise NotImplementedError
+
+    async def update(self, post_id: str, **fields) -> Optional[Dict[str, Any]]:
+        """
+        Атомарно изменить поля поста
+
+        Returns:
+            Обновленные данные или None, если пост уже удален
+        """
+        raise NotImplementedError
+
+    async def delete(self, post_id: str):
+        """Удалить пост (отсутствующий пост - не ошибка)"""
+        raise NotImplementedError
+
+    async def take(self, post_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Атомарно забрать пост из хранилища (для публикации)
+
+        Из нескольких одновременных вызовов, в том числе из разных процессов,
+        данные получает только один - пост не будет опубликован дважды.
+
+        Returns:
+            Данные поста или None, если его уже забрали или удалили
+        """
+        raise NotImplementedError
+
+    async def user_posts(self, user_id: int, limit: int = 10) -> List[Tuple[str, Dict[str, Any]]]:
+        """Посты пользователя от новых к старым: пары (post_id, данные)"""
+        raise NotImplementedError
+
+    async def expire(self, max_age: float) -> List[str]:
+        """Удалить посты старше max_age секунд и вернуть их ID"""
+        raise NotImplementedError
+
+    async def next_expiry(self, max_age: float) -> Optional[float]:
+        """Время (unix), когда истечет срок самого старого поста, или None, если постов нет"""
+        raise NotImplementedError
+
+    async def count(self) -> int:
+        """Количество постов в хранилище"""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        """Расход памяти процесса на посты (пусто, если посты хранятся вне процесса)"""
+        return {}
+
+    async def close(self):
+        """Освободить ресурсы хранилища"""
+
+
+_MISSING = object()
+
+
+def _text_bytes(value: Any) -> int:
+    """Объем строк и списков строк в памяти процесса (байт)"""
+    if isinstance(value, str):
+        return sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_text_bytes(item) for item in value)
+    return 0
+
+
+class PostRecord:
+    """
+    Компактная запись поста для хранилища в памяти
+
+    Ведет себя как словарь данных поста, но текущая версия и оригинал
+    не хранятся отдельными копиями: их отдает история версий.
+    """
+
+    __slots__ = (
+        'history', 'topic', 'sources', 'variants', 'alternative',
+        'user_id', 'created_at', 'edit_current', 'extra',
+    )
+
+    # Поля, которые вычисляются из истории версий
+    _DERIVED = ('content', 'original_content')
+
+    def __init__(self, post_data: Dict[str, Any]):
+        """
+        Args:
+            post_data: Данные поста в виде словаря (history или original_content обязательны)
+        """
+        self.extra: Optional[Dict[str, Any]] = None
+        history = post_data.get('history')
+        self.history = history if history is not None else PostHistory(post_data['original_content'])
+        for key, value in post_data.items():
+            if key != 'history':
+                self[key] = value
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any):
+        if key == 'content':
+            # Текущая версия меняется только через историю
+            if value != self.history.text:
+                self.history.push(value)
+        elif key == 'original_content':
+            if value != self.history.original:
+                self.history = PostHistory(value, self.history.max_versions, self.history.max_chars)
+        elif key in self.__slots__ and key != 'extra':
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key == 'content':
+            return self.history.text
+        if key == 'original_content':
+            return self.history.original
+        if key in self.__slots__ and key != 'extra':
+            return getattr(self, key, default)
+        return self.extra.get(key, default) if self.extra else default
+
+    def update(self, fields: Dict[str, Any]):
+        for key, value in fields.items():
+            self[key] = value
+
+    def keys(self) -> Iterator[str]:
+        yield from self._DERIVED
+        for key in self.__slots__:
+            if key != 'extra' and hasattr(self, key):
+                yield key
+        if self.extra:
+            yield from self.extra
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        for key in self.keys():
+            yield key, self[key]
+
+    @property
+    def nbytes(self) -> int:
+        """Примерный объем записи в памяти процесса (байт)"""
+        total = sys.getsizeof(self) + self.history.nbytes
+        for key in ('topic', 'sources', 'variants', 'alternative'):
+            total += _text_bytes(getattr(self, key, None))
+        if self.extra:
+            total += sys.getsizeof(self.extra) + sum(_text_bytes(value) for value in self.extra.values())
+        return total
+
+
+class MemoryPostStore(PostStore):
+    """
+    Хранилище в памяти процесса: посты теряются при перезапуске
+
+    Посты хранятся компактными записями PostRecord. Сроки жизни - в куче
+    по времени создания, поэтому expire() извлекает только просроченные
+    посты за O(log n) каждый. При превышении лимита записей или байт
+    вытесняются посты, к которым дольше всего не обращались (LRU).
+    """
+
+    def __init__(
+        self,
+        max_posts: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        on_evict: Optional[Callable[[str], None]] = None
+    ):
+        """
+        Инициализация хранилища
+
+        Args:
+            max_posts: Максимум постов (None - без ограничения)
+            max_bytes: Максимальный объем постов в памяти, байт (None - без ограничения)
+            on_evict: Вызывается с ID поста, вытесненного по лимиту
+        """
+        self.max_posts = max_posts
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        # Порядок - от давно использованных к недавним
+        self._posts: 'OrderedDict[str, PostRecord]' = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._bytes = 0
+        # user_id -> ID постов в порядке создания (dict как упорядоченное множество)
+        self._by_user: Dict[int, Dict[str, None]] = {}
+        # (время создания, post_id); записи удаленных постов отбрасываются при извлечении
+        self._deadlines: List[Tuple[float, str]] = []
+        self.evicted = 0
+        self.expired = 0
+
+    async def get(self, post_id: str) -> Optional[PostRecord]:
+        record = self._posts.get(post_id)
+        if record is not None:
+            self._posts.move_to_end(post_id)
+        return record
+
+    async def put(self, post_id: str, post_data: Dict[str, Any]):
+        await self.delete(post_id)
+        record = PostRecord(post_data)
+        if record.get('created_at') is None:
+            record['created_at'] = datetime.now()
+        self._posts[post_id] = record
+        self._by_user.setdefault(record.get('user_id'), {})[post_id] = None
+        heapq.heappush(self._deadlines, (record.created_at.timestamp(), post_id))
+        self._resize(post_id)
+        self._enforce_limits()
+
+    async def update(self, post_id: str, **fields) -> Optional[PostRecord]:
+        record = self._posts.get(post_id)
+        if record is None:
+            return None
+        record.update(fields)
+        self._posts.move_to_end(post_id)
+        self._resize(post_id)
+        self._enforce_limits()
+        return record
+
+    async def delete(self, post_id: str):
+        self._remove(post_id)
+
+    async def take(self, post_id: str) -> Optional[PostRecord]:
+        return self._remove(post_id)
+
+    async def user_posts(self, user_id: int, limit: int = 10) -> List[Tuple[str, Dict[str, Any]]]:
+        post_ids = list(self._by_user.get(user_id, {}))[-limit:]
+        return [(post_id, self._posts[post_id]) for post_id in reversed(post_ids)]
+
+    async def expire(self, max_age: float) -> List[str]:
+        cutoff = time.time() - max_age
+        expired = []
+        while self._deadlines and self._deadlines[0][0] < cutoff:
+            created_at, post_id = heapq.heappop(self._deadlines)
+            record = self._posts.get(post_id)
+            # Пост мог быть удален или пересоздан с тем же ID
+            if record is not None and record.created_at.timestamp() == created_at:
+                self._remove(post_id)
+                expired.append(post_id)
+        self.expired += len(expired)
+        return expired
+
+    async def next_expiry(self, max_age: float) -> Optional[float]:
+        self._drop_stale_deadlines()
+        return self._deadlines[0][0] + max_age if self._deadlines else None
+
+    async def count(self) -> int:
+        return len(self._posts)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'posts': len(self._posts),
+            'bytes': self._bytes,
+            'bytes_per_post': self._bytes / len(self._posts) if self._posts else 0.0,
+            'evicted': self.evicted,
+            'expired': self.expired,
+        }
+
+    def _remove(self, post_id: str) -> Optional[PostRecord]:
+        record = self._posts.pop(post_id, None)
+        if record is None:
+            return None
+        self._bytes -= self._sizes.pop(post_id)
+        user_posts = self._by_user.get(record.get('user_id'))
+        if user_posts is not None:
+            user_posts.pop(post_id, None)
+            if not user_posts:
+                del self._by_user[record.get('user_id')]
+        return record
+
+    def _resize(self, post_id: str):
+        size = self._posts[post_id].nbytes
+        self._bytes += size - self._sizes.get(post_id, 0)
+        self._sizes[post_id] = size
+
+    def _enforce_limits(self):
+        """Вытеснить давно не использованные посты; последний пост остается всегда"""
+        while len(self._posts) > 1 and (
+            (self.max_posts is not None and len(self._posts) > self.max_posts)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            post_id, _ = next(iter(self._posts.items()))
+            self._remove(post_id)
+            self.evicted += 1
+            logger.info(f"Пост {post_id} вытеснен из памяти по лимиту хранилища")
+            if self.on_evict is not None:
+                self.on_evict(post_id)
+
+    def _drop_stale_deadlines(self):
+        while self._deadlines:
+            created_at, post_id = self._deadlines[0]
+            record = self._posts.get(post_id)
+            if record is not None and record.created_at.timestamp() == created_at:
+                return
+            heapq.heappop(self._deadlines)
+
+
+class SQLitePostStore(PostStore):
+    """
+    Хранилище в SQLite с журналом WAL
+
+    Все запросы выполняет один выделенный поток: event loop не блокируется
+    на диске, а изменения полей (чтение-изменение-запись) не перемешиваются.
+    """
+
+    def __init__(self, path: str = 'pending_posts.db'):
+        """
+        Инициализация хранилища
+
+        Args:
+            path: Путь к файлу базы данных
+        """
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="post-store")
+        self._connection: Optional[sqlite3.Connection] = None
+
+    async def get(self, post_id: str) -> Optional[Dict[str, Any]]:
+        return await self._run(self._get, post_id)
+
+    async def put(self, post_id: str, post_data: Dict[str, Any]):
+        await self._run(self._put, post_id, post_data)
+
+    async def update(self, post_id: str, **fields) -> Optional[Dict[str, Any]]:
+        return await self._run(self._update, post_id, fields)
+
+    async def delete(self, post_id: str):
+        await self._run(self._execute, "DELETE FROM pending_posts WHERE post_id = ?", (post_id,))
+
+    async def take(self, post_id: str) -> Optional[Dict[str, Any]]:
+        return await self._run(self._take, post_id)
+
+    async def user_posts(self, user_id: int, limit: int = 10) -> List[Tuple[str, Dict[str, Any]]]:
+        rows = await self._run(
+            self._query,
+            "SELECT post_id, data, created_at FROM pending_posts "
+            "WHERE user_id = ? ORDER BY created_at DESC LIMIT ?",
+            (user_id, limit)
+        )
+        return [(post_id, decode_post(data, created_at)) for post_id, data, created_at in rows]
+
+    async def expire(self, max_age: float) -> List[str]:
+        return await self._run(self._expire, time.time() - max_age)
+
+    async def next_expiry(self, max_age: float) -> Optional[float]:
+        rows = await self._run(self._query, "SELECT MIN(created_at) FROM pending_posts", ())
+        return rows[0][0] + max_age if rows[0][0] is not None else None
+
+    async def count(self) -> int:
+        rows = await self._run(self._query, "SELECT COUNT(*) FROM pending_posts", ())
+        return rows[0][0]
+
+    async def close(self):
+        await self._run(self._close)
+        self._executor.shutdown(wait=True)
+
+    async def _run(self, func, *args):
+        """Выполнить функцию в потоке хранилища"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args))
+
+    # Методы ниже выполняются только в потоке хранилища
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            # Соединение создается и используется одним и тем же потоком хранилища
+            connection = sqlite3.connect(self.path)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # В WAL-режиме NORMAL не теряет целостность, а fsync выполняется только на контрольных точках
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def _execute(self, sql: str, params: tuple):
+        connection = self._connect()
+        with connection:
+            connection.execute(sql, params)
+
+    def _query(self, sql: str, params: tuple) -> List[tuple]:
+        return self._connect().execute(sql, params).fetchall()
+
+    def _get(self, post_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(
+            "SELECT data, created_at FROM pending_posts WHERE post_id = ?", (post_id,)
+        ).fetchone()
+        return decode_post(*row) if row else None
+
+    def _put(self, post_id: str, post_data: Dict[str, Any]):
+        created_at = post_data.get('created_at') or datetime.now()
+        self._execute(
+            "INSERT OR REPLACE INTO pending_posts (post_id, user_id, created_at, data) VALUES (?, ?, ?, ?)",
+            (post_id, post_data.get('user_id'), created_at.timestamp(), encode_post(post_data))
+        )
+
+    def _update(self, post_id: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        post_data = self._get(post_id)
+        if post_data is None:
+            return None
+        post_data.update(fields)
+        self._put(post_id, post_data)
+        return post_data
+
+    def _take(self, post_id: str) -> Optional[Dict[str, Any]]:
+        # Одна команда DELETE ... RETURNING атомарна и для других процессов с той же базой
+        connection = self._connect()
+        with connection:
+            row = connection.execute(
+                "DELETE FROM pending_posts WHERE post_id = ? RETURNING data, created_at", (post_id,)
+            ).fetchone()
+        return decode_post(*row) if row else None
+
+    def _expire(self, cutoff: float) -> List[str]:
+        connection = self._connect()
+        with connection:
+            expired = [
+                post_id for post_id, in connection.execute(
+                    "SELECT post_id FROM pending_posts WHERE created_at < ?", (cutoff,)
+                )
+            ]
+            connection.execute("DELETE FROM pending_posts WHERE created_at < ?", (cutoff,))
+        return expired
+
+    def _close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def _pairs(flat: List[str]) -> Dict[str, str]:
+    """Ответ HGETALL из скрипта Lua (плоский список) в словарь"""
+    return dict(zip(flat[::2], flat[1::2]))
+
+
+class RedisPostStore(PostStore):
+    """
+    Хранилище в Redis, общее для нескольких процессов бота
+
+    Пост - хэш, в котором каждое поле сериализовано отдельно, поэтому update()
+    записывает только свои поля и не затирает поля, измененные другим процессом.
+    update() и take() - скрипты Lua: проверка существования и запись (или чтение
+    и удаление) выполняются одним атомарным шагом. Отсортированные множества
+    по времени создания служат индексами постов пользователя и просроченных постов.
+    """
+
+    def __init__(self, client, prefix: str = 'optimai'):
+        """
+        Инициализация хранилища
+
+        Args:
+            client: Асинхронный клиент Redis (redis.asyncio) с decode_responses=True
+            prefix: Префикс ключей
+        """
+        self.client = client
+        self.prefix = prefix
+        self._update_script = client.register_script(_REDIS_UPDATE)
+        self._take_script = client.register_script(_REDIS_TAKE)
+
+    def _post_key(self, post_id: str) -> str:
+        return f"{self.prefix}:post:{post_id}"
+
+    def _user_key(self, user_id: int) -> str:
+        return f"{self.prefix}:user:{user_id}"
+
+    @property
+    def _created_key(self) -> str:
+        return f"{self.prefix}:created"
+
+    async def get(self, post_id: str) -> Optional[Dict[str, Any]]:
+        encoded = await self.client.hgetall(self._post_key(post_id))
+        # Хэш без created_at - обрывок запоздалого update() удаленного поста
+        return decode_fields(encoded) if 'created_at' in encoded else None
+
+    async def put(self, post_id: str, post_data: Dict[str, Any]):
+        post_data = {**post_data, 'created_at': post_data.get('created_at') or datetime.now()}
+        created_at = post_data['created_at'].timestamp()
+        key = self._post_key(post_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.hset(key, mapping=encode_fields(post_data))
+            pipe.zadd(self._user_key(post_data.get('user_id')), {post_id: created_at})
+            pipe.zadd(self._created_key, {post_id: created_at})
+            await pipe.execute()
+
+    async def update(self, post_id: str, **fields) -> Optional[Dict[str, Any]]:
+        args = [item for pair in encode_fields(fields).items() for item in pair]
+        flat = await self._update_script(keys=[self._post_key(post_id)], args=args)
+        # Удаленный пост скрипт не трогает: обрывков от запоздалых правок не остается
+        return decode_fields(_pairs(flat)) if flat else None
+
+    async def delete(self, post_id: str) -> bool:
+        """Удалить пост; True, если удалил именно этот вызов"""
+        key = self._post_key(post_id)
+        user_id = await self.client.hget(key, 'user_id')
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.zrem(self._created_key, post_id)
+            if user_id is not None:
+                pipe.zrem(self._user_key(json.loads(user_id)), post_id)
+            deleted, *_ = await pipe.execute()
+        return bool(deleted)
+
+    async def take(self, post_id: str) -> Optional[Dict[str, Any]]:
+        # Чтение и удаление одним скриптом: данные получает ровно один процесс
+        flat = await self._take_script(keys=[self._post_key(post_id), self._created_key], args=[post_id])
+        if not flat:
+            return None
+        encoded = _pairs(flat)
+        if 'user_id' in encoded:
+            # Индекс пользователя только ускоряет выборку: user_posts() пропускает удаленные посты
+            await self.client.zrem(self._user_key(json.loads(encoded['user_id'])), post_id)
+        return decode_fields(encoded) if 'created_at' in encoded else None
+
+    async def user_posts(self, user_id: int, limit: int = 10) -> List[Tuple[str, Dict[str, Any]]]:
+        post_ids = await self.client.zrevrange(self._user_key(user_id), 0, limit - 1)
+        posts = []
+        for post_id in post_ids:
+            post_data = await self.get(post_id)
+            if post_data is not None:
+                posts.append((post_id, post_data))
+        return posts
+
+    async def expire(self, max_age: float) -> List[str]:
+        post_ids = await self.client.zrangebyscore(self._created_key, '-inf', time.time() - max_age)
+        # Просроченный пост может одновременно удалять другой процесс - учитываем только свои
+        return [post_id for post_id in post_ids if await self.delete(post_id)]
+
+    async def next_expiry(self, max_age: float) -> Optional[float]:
+        oldest = await self.client.zrange(self._created_key, 0, 0, withscores=True)
+        return oldest[0][1] + max_age if oldest else None
+
+    async def count(self) -> int:
+        return await self.client.zcard(self._created_key)
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def create_post_store(
+    backend: str = 'memory',
+    path: str = 'pending_posts.db',
+    redis_url: Optional[str] = None,
+    max_posts: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    on_evict: Optional[Callable[[str], None]] = None
+) -> PostStore:
+    """
+    Создать хранилище постов
+
+    Args:
+        backend: 'memory', 'sqlite' или 'redis'
+        path: Путь к базе данных для 'sqlite'
+        redis_url: Адрес Redis для 'redis' (redis://host:port/db)
+        max_posts: Лимит постов, только для 'memory'
+        max_bytes: Лимит памяти под посты (байт), только для 'memory'
+        on_evict: Вызывается с ID поста, вытесненного из 'memory' по лимиту
+    """
+    if backend == 'memory':
+        return MemoryPostStore(max_posts, max_bytes, on_evict)
+    if max_posts is not None or max_bytes is not None:
+        logger.warning(
+            f"Лимиты постов max_posts={max_posts}, max_bytes={max_bytes} действуют только "
+            f"для хранилища 'memory' и игнорируются для '{backend}'"
+        )
+    if backend == 'sqlite':
+        return SQLitePostStore(path)
+    if backend == 'redis':
+        if not redis_url:
+            raise ValueError("Для хранилища постов 'redis' нужен адрес Redis")
+        import redis.asyncio as redis
+
+        return RedisPostStore(redis.from_url(redis_url, decode_responses=True))
+    raise ValueError(f"Неизвестное хранилище постов: {backend}")
@@ -0,0 +1,102 @@
+"""
+Несколько вариантов поста из одного ответа модели и локальный выбор лучшего
+"""
+
+import re
+from typing import Callable, List, Optional, Tuple
+
+from post_scorer import tag_errors
+from telegram_html import visible_length
+
+# Строка-разделитель вариантов в ответе модели ("===", "=== Вариант 2 ===")
+VARIANT_SEPARATOR = '==='
+_SEPARATOR_LINE = re.compile(r'^[ \t]*={3,}[^\n]*$', re.MULTILINE)
+
+_MARKDOWN = re.compile(r'\*\*|```|^#+\s', re.MULTILINE)
+_LINK = re.compile(r'https?://|www\.')
+
+# Штрафы оценки: обрезка по длине теряет вывод поста, дубликат хуже мелких ошибок разметки
+LENGTH_PENALTY = 1.0
+SHORT_PENALTY = 0.2
+HTML_PENALTY = 0.25
+DUPLICATE_PENALTY = 1.0
+
+
+def plural_ru(count: int, forms: Tuple[str, str, str]) -> str:
+    """Форма слова для числа, например ('вариант', 'варианта', 'вариантов')"""
+    if count % 10 == 1 and count % 100 != 11:
+        return forms[0]
+    if 2 <= count % 10 <= 4 and not 12 <= count % 100 <= 14:
+        return forms[1]
+    return forms[2]
+
+
+def split_variants(text: str) -> List[str]:
+    """Разбить ответ модели на непустые варианты по строкам-разделителям"""
+    return [part.strip() for part in _SEPARATOR_LINE.split(text) if part.strip()]
+
+
+def html_violations(content: str) -> List[str]:
+    """
+    Проверить ответ модели на требования к разметке (до очистки)
+
+    Returns:
+        Список нарушений (пустой - разметка корректна)
+    """
+    violations = tag_errors(content)
+    if _MARKDOWN.search(content):
+        violations.append("markdown-разметка")
+    if _LINK.search(content):
+        violations.append("прямые ссылки")
+    if not content.lstrip().startswith('<b>'):
+        violations.append("нет заголовка <b>")
+    return violations
+
+
+def score_variant(
+    content: str,
+    max_length: int = 1000,
+    overlap: Optional[Callable[[str], float]] = None
+) -> float:
+    """
+    Оценить вариант поста: чем выше, тем меньше его испортит очистка
+
+    Args:
+        content: Ответ модели до очистки
+        max_length: Лимит видимой длины поста
+        overlap: Сходство с уже опубликованным (0 - новое, 1 - дубликат)
+
+    Returns:
+        Оценка не больше 1.0
+    """
+    score = 1.0
+
+    length = visible_length(content)
+    if length > max_length:
+        score -= LENGTH_PENALTY * min(1.0, (length - max_length) / max_length)
+    elif length < max_length * 0.4:
+        score -= SHORT_PENALTY
+
+    score -= HTML_PENALTY * len(html_violations(content))
+
+    if overlap is not None:
+        score -= DUPLICATE_PENALTY * overlap(content)
+
+    return score
+
+
+def rank_variants(
+    candidates: List[str],
+    max_length: int = 1000,
+    overlap: Optional[Callable[[str], float]] = None
+) -> List[Tuple[float, str]]:
+    """
+    Упорядочить варианты от лучшего к худшему
+
+    При равной оценке сохраняется порядок модели.
+
+    Returns:
+        Пары (оценка, вариант до очистки)
+    """
+    scored = [(score_variant(candidate, max_length, overlap), candidate) for candidate in candidates]
+    return sorted(scored, key=lambda item: item[0], reverse=True)
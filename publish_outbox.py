@@ -0,0 +1,577 @@
+"""
+Очередь публикаций в SQLite: подтвержденный пост сохраняется до отправки
+и уходит в каналы с учетом лимитов Telegram и повторов
+"""
+
+import asyncio
+import json
+import logging
+import random
+import sqlite3
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from resilient_call import is_transient
+
+logger = logging.getLogger(__name__)
+
+# Лимиты Telegram для ботов: ~30 сообщений в секунду всего и ~20 в минуту в один чат
+GLOBAL_RPS = 30
+CHAT_RPM = 20
+
+# Имена классов временных ошибок aiogram (проверяются по MRO, без импорта библиотеки)
+_TRANSIENT_TELEGRAM_ERRORS = {'TelegramNetworkError', 'TelegramServerError'}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS publish_outbox (
+    job_id TEXT PRIMARY KEY,
+    chat_id TEXT NOT NULL,
+    content TEXT NOT NULL,
+    sources TEXT NOT NULL,
+    notify TEXT,
+    attempts INTEGER NOT NULL,
+    next_attempt REAL NOT NULL,
+    created_at REAL NOT NULL,
+    group_id TEXT,
+    owner TEXT,
+    lease_until REAL,
+    status TEXT,
+    result TEXT,
+    error TEXT
+);
+"""
+
+# Колонки, добавленные после первой версии схемы
+_MIGRATIONS = {
+    'group_id': "ALTER TABLE publish_outbox ADD COLUMN group_id TEXT",
+    'owner': "ALTER TABLE publish_outbox ADD COLUMN owner TEXT",
+    'lease_until': "ALTER TABLE publish_outbox ADD COLUMN lease_until REAL",
+    'status': "ALTER TABLE publish_outbox ADD COLUMN status TEXT",
+    'result': "ALTER TABLE publish_outbox ADD COLUMN result TEXT",
+    'error': "ALTER TABLE publish_outbox ADD COLUMN error TEXT",
+}
+
+_COLUMNS = (
+    "job_id, chat_id, content, sources, notify, attempts, next_attempt, created_at, group_id, "
+    "status, result, error"
+)
+
+# Статусы, после которых публикация больше не отправляется
+FINAL_STATUSES = ('published', 'failed')
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Пауза, которую требует Telegram (TelegramRetryAfter.retry_after), или None"""
+    delay = getattr(error, 'retry_after', None)
+    return float(delay) if isinstance(delay, (int, float)) else None
+
+
+def is_transient_send_error(error: BaseException) -> bool:
+    """Ошибка отправки временная: сеть или сервер Telegram"""
+    return is_transient(error) or any(cls.__name__ in _TRANSIENT_TELEGRAM_ERRORS for cls in type(error).__mro__)
+
+
+class StoredSendError(Exception):
+    """Окончательная ошибка публикации, восстановленная из базы: текст и имя исходного класса"""
+
+    def __init__(self, message: str, kind: str = 'Exception'):
+        super().__init__(message)
+        self.kind = kind
+
+
+class OutboxJob:
+    """Публикация в одном канале"""
+
+    __slots__ = (
+        'job_id', 'chat_id', 'content', 'sources', 'notify',
+        'attempts', 'next_attempt', 'created_at', 'status', 'result', 'error',
+        'group_id', 'group',
+    )
+
+    def __init__(
+        self,
+        job_id: str,
+        chat_id: str,
+        content: str,
+        sources: List[str],
+        notify: Optional[Dict[str, Any]],
+        attempts: int = 0,
+        next_attempt: float = 0.0,
+        created_at: Optional[float] = None,
+        group_id: Optional[str] = None
+    ):
+        """
+        Args:
+            job_id: ID публикации
+            chat_id: Канал (ID или @username)
+            content: HTML-текст поста
+            sources: Заголовки источников для индекса дубликатов
+            notify: Данные для уведомления о результате (сообщение с подтверждением)
+            attempts: Сделано попыток
+            next_attempt: Время (unix), раньше которого отправлять нельзя
+            created_at: Время постановки в очередь (unix)
+            group_id: ID публикации одного поста в нескольких каналах
+        """
+        self.job_id = job_id
+        self.chat_id = chat_id
+        self.content = content
+        self.sources = sources
+        self.notify = notify
+        self.attempts = attempts
+        self.next_attempt = next_attempt
+        self.created_at = time.time() if created_at is None else created_at
+        # 'queued' -> 'sending' -> 'published' | 'retrying' | 'failed'
+        self.status = 'queued'
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.group_id = group_id or job_id
+        # Публикации того же поста в других каналах (общий список на группу)
+        self.group: List['OutboxJob'] = [self]
+
+    @classmethod
+    def from_row(cls, row: Sequence) -> 'OutboxJob':
+        """Публикация из строки базы (колонки _COLUMNS)"""
+        job_id, chat_id, content, sources, notify, attempts, next_attempt, created_at, group_id = row[:9]
+        status, result, error = row[9:]
+        job = cls(
+            job_id, chat_id, content, json.loads(sources),
+            json.loads(notify) if notify is not None else None,
+            attempts, next_attempt, created_at, group_id
+        )
+        if status is not None:
+            job.status = status
+            job.result = result
+            if error is not None:
+                stored = json.loads(error)
+                job.error = StoredSendError(stored['message'], stored['kind'])
+        return job
+
+
+class PublishOutbox:
+    """
+    Персистентная очередь публикаций с планировщиком
+
+    Пост записывается в базу до ответа на подтверждение и удаляется только
+    после отправки или окончательной ошибки во всех каналах группы, поэтому
+    перезапуск бота его не теряет (в худшем случае пост, отправленный прямо
+    перед падением, уйдет повторно), а итог группы включает каналы, отправленные
+    до перезапуска. Несколько процессов бота могут делить одну базу: публикация
+    принадлежит процессу, пока он продлевает аренду, и только после ее
+    истечения переходит к другому. Планировщик выдерживает общий лимит отправки и лимит на канал,
+    выполняет паузу TelegramRetryAfter точно в срок и повторяет временные
+    ошибки с растущей паузой. Разные каналы отправляются параллельно,
+    в один канал - строго по очереди.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str, str, List[str]], Awaitable[Any]],
+        path: str = 'publish_outbox.db',
+        on_update: Optional[Callable[[OutboxJob], Awaitable[None]]] = None,
+        global_rps: float = GLOBAL_RPS,
+        chat_rpm: float = CHAT_RPM,
+        attempts: int = 5,
+        base_delay: float = 2.0,
+        max_delay: float = 300.0,
+        lease: float = 60.0,
+        owner: Optional[str] = None,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        Инициализация очереди
+
+        Args:
+            send: Корутинная функция send(chat_id, content, sources), возвращает результат отправки
+            path: Путь к файлу базы данных
+            on_update: Вызывается при постановке в очередь и после каждой попытки
+            global_rps: Отправок в секунду по всем каналам
+            chat_rpm: Отправок в минуту в один канал
+            attempts: Максимум попыток при временных ошибках
+            base_delay: Пауза перед первым повтором (удваивается с каждой попыткой)
+            max_delay: Максимальная пауза перед повтором
+            lease: Срок аренды публикаций процессом (сек), продлевается каждую треть срока
+            owner: ID процесса-владельца публикаций. Постоянный ID позволяет после перезапуска
+                сразу забрать свои публикации, случайный (по умолчанию) - только после истечения аренды
+            clock: Источник времени unix (для тестов)
+        """
+        self.send = send
+        self.path = path
+        self.on_update = on_update
+        self.global_interval = 1 / global_rps
+        self.chat_interval = 60 / chat_rpm
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease = lease
+        self.owner = owner or uuid.uuid4().hex
+        self._clock = clock
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="publish-outbox")
+        self._connection: Optional[sqlite3.Connection] = None
+        # Канал -> публикации в порядке постановки
+        self._queues: Dict[str, Deque[OutboxJob]] = {}
+        self._chat_ready: Dict[str, float] = {}
+        self._global_ready = 0.0
+        self._sending: Dict[str, asyncio.Task] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._renewer: Optional[asyncio.Task] = None
+        # Уведомления по одной группе идут по очереди, чтобы старый статус не затер новый
+        self._notify_locks: Dict[str, asyncio.Lock] = {}
+
+        self.published = 0
+        self.failed = 0
+        self.retries = 0
+
+    async def start(self):
+        """Забрать неотправленные публикации без живого владельца и запустить планировщик"""
+        self._wakeup = asyncio.Event()
+        await self._adopt(include_own=True)
+        self._runner = asyncio.create_task(self.run())
+        self._renewer = asyncio.create_task(self._renew_leases())
+
+    async def _adopt(self, include_own: bool = False):
+        """Поставить в очередь публикации, аренда которых свободна или истекла"""
+        jobs = await self._run(self._claim, self._clock(), include_own)
+        groups: Dict[str, List[OutboxJob]] = {}
+        queued = 0
+        for job in jobs:
+            job.group = groups.setdefault(job.group_id, [])
+            job.group.append(job)
+            # Завершенные публикации группы нужны только для итогового статуса
+            if job.status not in FINAL_STATUSES:
+                self._queues.setdefault(job.chat_id, deque()).append(job)
+                queued += 1
+        if queued:
+            logger.info(f"Восстановлено публикаций из очереди: {queued}")
+            self._wakeup.set()
+
+    async def _renew_leases(self):
+        """Продлевать аренду своих публикаций и подбирать брошенные другими процессами"""
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                await self._run(self._renew, self._clock())
+                await self._adopt()
+            except Exception as e:
+                logger.warning(f"Не удалось продлить аренду публикаций: {e}")
+
+    async def enqueue(
+        self,
+        chat_id,
+        content: str,
+        sources: Optional[List[str]] = None,
+        notify: Optional[Dict[str, Any]] = None
+    ) -> OutboxJob:
+        """Поставить пост в очередь для одного канала (см. enqueue_many)"""
+        jobs = await self.enqueue_many([(chat_id, content)], sources, notify)
+        return jobs[0]
+
+    async def enqueue_many(
+        self,
+        posts: Sequence[Tuple[Any, str]],
+        sources: Optional[List[str]] = None,
+        notify: Optional[Dict[str, Any]] = None
+    ) -> List[OutboxJob]:
+        """
+        Поставить пост в очередь для нескольких каналов одной транзакцией
+
+        Возвращается после записи в базу и уведомления. Уведомление
+        о постановке (статус 'queued') отправляется до того, как публикации
+        станут доступны планировщику, поэтому оно не может прийти позже
+        уведомления о результате. Каналы отправляются параллельно.
+
+        Args:
+            posts: Пары (канал - ID или @username, HTML-текст поста для этого канала)
+            sources: Заголовки источников
+            notify: Данные для on_update (должны сериализоваться в JSON)
+
+        Returns:
+            Публикации группы в порядке posts
+        """
+        group_id = uuid.uuid4().hex
+        jobs = [
+            OutboxJob(uuid.uuid4().hex, str(chat_id), content, list(sources or []), notify, group_id=group_id)
+            for chat_id, content in posts
+        ]
+        for job in jobs:
+            job.group = jobs
+        await self._run(self._insert, jobs)
+        await self._notify(jobs[0])
+        for job in jobs:
+            self._queues.setdefault(job.chat_id, deque()).append(job)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return jobs
+
+    def stats(self) -> Dict[str, int]:
+        """Публикации в очереди и итоги с момента запуска"""
+        return {
+            'queued': sum(len(queue) for queue in self._queues.values()),
+            'sending': len(self._sending),
+            'published': self.published,
+            'failed': self.failed,
+            'retries': self.retries,
+        }
+
+    async def run(self):
+        """Планировщик: отправлять публикации, как только это позволяют лимиты"""
+        while True:
+            now = self._clock()
+            chat_id, ready_at = self._next_ready()
+            if chat_id is None or ready_at > now:
+                self._wakeup.clear()
+                timeout = None if chat_id is None else ready_at - now
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job = self._queues[chat_id].popleft()
+            self._global_ready = max(now, self._global_ready) + self.global_interval
+            self._chat_ready[chat_id] = now + self.chat_interval
+            self._sending[chat_id] = asyncio.create_task(self._deliver(job))
+
+    async def close(self):
+        """Остановить планировщик; неотправленные публикации остаются в базе"""
+        tasks = [task for task in (self._runner, self._renewer, *self._sending.values()) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._run(self._close)
+        self._executor.shutdown(wait=True)
+
+    def _next_ready(self):
+        """Канал, чья очередная публикация может уйти раньше всех, и время, когда это возможно"""
+        best_chat, best_at = None, None
+        for chat_id, queue in self._queues.items():
+            # В канал отправляется не больше одной публикации одновременно
+            if not queue or chat_id in self._sending:
+                continue
+            ready_at = max(queue[0].next_attempt, self._chat_ready.get(chat_id, 0.0))
+            if best_at is None or ready_at < best_at:
+                best_chat, best_at = chat_id, ready_at
+        if best_chat is None:
+            return None, None
+        return best_chat, max(best_at, self._global_ready)
+
+    async def _deliver(self, job: OutboxJob):
+        job.status = 'sending'
+        job.attempts += 1
+        try:
+            # Аренда могла истечь (например, процесс стоял на паузе) - тогда публикацию отправит новый владелец
+            if not await self._run(self._extend, job.job_id, self._clock()):
+                logger.warning(f"Публикация {job.job_id} перешла к другому процессу")
+                job.status = 'queued'
+                return
+            job.result = await self.send(job.chat_id, job.content, job.sources)
+            job.status = 'published'
+            self.published += 1
+            await self._finish(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job.error = e
+            await self._handle_error(job, e)
+        finally:
+            self._sending.pop(job.chat_id, None)
+            if not self._queues.get(job.chat_id):
+                self._queues.pop(job.chat_id, None)
+            self._wakeup.set()
+
+        await self._notify(job)
+
+    async def _notify(self, job: OutboxJob):
+        if self.on_update is None:
+            return
+        lock = self._notify_locks.setdefault(job.group_id, asyncio.Lock())
+        try:
+            async with lock:
+                await self.on_update(job)
+        except Exception as e:
+            logger.warning(f"Не удалось сообщить о публикации {job.job_id}: {e}")
+        finally:
+            if all(member.status in FINAL_STATUSES for member in job.group):
+                self._notify_locks.pop(job.group_id, None)
+
+    async def _handle_error(self, job: OutboxJob, error: Exception):
+        """Отложить публикацию до следующей попытки или снять ее с очереди"""
+        delay = retry_after(error)
+        if delay is not None:
+            # Пауза по требованию Telegram не расходует попытки и задерживает весь канал
+            job.attempts -= 1
+            self._chat_ready[job.chat_id] = max(self._chat_ready.get(job.chat_id, 0.0), self._clock() + delay)
+        elif job.attempts < self.attempts and is_transient_send_error(error):
+            delay = random.uniform(0.5, 1.0) * min(self.max_delay, self.base_delay * 2 ** (job.attempts - 1))
+        else:
+            job.status = 'failed'
+            self.failed += 1
+            logger.error(f"Публикация {job.job_id} в {job.chat_id} не удалась: {error}")
+            await self._finish(job)
+            return
+
+        self.retries += 1
+        job.status = 'retrying'
+        job.next_attempt = self._clock() + delay
+        logger.warning(f"Публикация {job.job_id} в {job.chat_id}: {error}, повтор через {delay:.1f} с")
+        await self._run(self._reschedule, job)
+        # Публикация остается первой в своем канале
+        self._queues.setdefault(job.chat_id, deque()).appendleft(job)
+
+    async def _finish(self, job: OutboxJob):
+        """
+        Записать итог публикации и обновить группу итогами из базы
+
+        Каналы группы могли отправить другой процесс или этот процесс до перезапуска:
+        их итоги берутся из той же транзакции, поэтому каждый итог виден ровно
+        одной следующей публикации группы в правильном порядке.
+        """
+        for row in await self._run(self._finalize, job):
+            stored = OutboxJob.from_row(row)
+            member = next((member for member in job.group if member.job_id == stored.job_id), None)
+            if member is None:
+                stored.group = job.group
+                job.group.append(stored)
+            elif member.status not in FINAL_STATUSES:
+                member.status, member.result, member.error = stored.status, stored.result, stored.error
+
+    async def _run(self, func, *args):
+        """Выполнить функцию в потоке базы"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args))
+
+    # Методы ниже выполняются только в потоке базы
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(self.path)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+            # База из версии без групп публикаций
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(publish_outbox)")}
+            for column, migration in _MIGRATIONS.items():
+                if column not in columns:
+                    connection.execute(migration)
+            self._connection = connection
+        return self._connection
+
+    def _insert(self, jobs: List[OutboxJob]):
+        connection = self._connect()
+        with connection:
+            connection.executemany(
+                "INSERT INTO publish_outbox (job_id, chat_id, content, sources, notify, attempts, "
+                "next_attempt, created_at, group_id, owner, lease_until) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        job.job_id, job.chat_id, job.content,
+                        json.dumps(job.sources, ensure_ascii=False),
+                        json.dumps(job.notify, ensure_ascii=False) if job.notify is not None else None,
+                        job.attempts, job.next_attempt, job.created_at, job.group_id,
+                        self.owner, self._clock() + self.lease,
+                    )
+                    for job in jobs
+                ]
+            )
+
+    def _reschedule(self, job: OutboxJob):
+        connection = self._connect()
+        with connection:
+            connection.execute(
+                "UPDATE publish_outbox SET attempts = ?, next_attempt = ? WHERE job_id = ?",
+                (job.attempts, job.next_attempt, job.job_id)
+            )
+
+    def _finalize(self, job: OutboxJob) -> List[Tuple]:
+        """
+        Записать итоговый статус и вернуть завершенные публикации группы
+
+        Группа удаляется из базы, когда завершены все ее публикации.
+        """
+        error = None
+        if job.error is not None:
+            error = json.dumps(
+                {'message': str(job.error), 'kind': getattr(job.error, 'kind', type(job.error).__name__)},
+                ensure_ascii=False
+            )
+        result = str(job.result) if job.result is not None else None
+        connection = self._connect()
+        with connection:
+            connection.execute(
+                "UPDATE publish_outbox SET status = ?, result = ?, error = ? WHERE job_id = ?",
+                (job.status, result, error, job.job_id)
+            )
+            group_rows = connection.execute(
+                f"SELECT {_COLUMNS} FROM publish_outbox WHERE COALESCE(group_id, job_id) = ? "
+                "ORDER BY created_at",
+                (job.group_id,)
+            ).fetchall()
+            final_rows = [row for row in group_rows if row[9] is not None]
+            if len(final_rows) == len(group_rows):
+                connection.execute(
+                    "DELETE FROM publish_outbox WHERE COALESCE(group_id, job_id) = ?", (job.group_id,)
+                )
+        return final_rows
+
+    def _claim(self, now: float, include_own: bool) -> List[OutboxJob]:
+        """
+        Забрать публикации без владельца или с истекшей арендой одной транзакцией
+
+        include_own - забрать и публикации с тем же владельцем: после перезапуска
+        процесса с постоянным owner они не ждут истечения аренды. Вместе с забранными
+        возвращаются завершенные публикации их групп - для итогового статуса.
+        """
+        connection = self._connect()
+        # BEGIN IMMEDIATE: два процесса не заберут одну публикацию одновременно
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows = connection.execute(
+                f"SELECT {_COLUMNS} FROM publish_outbox WHERE status IS NULL "
+                "AND (owner IS NULL OR (owner = ? AND ?) OR (owner != ? AND lease_until < ?)) "
+                "ORDER BY created_at",
+                (self.owner, include_own, self.owner, now)
+            ).fetchall()
+            connection.executemany(
+                "UPDATE publish_outbox SET owner = ?, lease_until = ? WHERE job_id = ?",
+                [(self.owner, now + self.lease, row[0]) for row in rows]
+            )
+            group_ids = sorted({row[8] or row[0] for row in rows})
+            final_rows = connection.execute(
+                f"SELECT {_COLUMNS} FROM publish_outbox WHERE status IS NOT NULL "
+                f"AND COALESCE(group_id, job_id) IN ({', '.join('?' * len(group_ids))}) "
+                "ORDER BY created_at",
+                group_ids
+            ).fetchall() if group_ids else []
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return [OutboxJob.from_row(row) for row in sorted(rows + final_rows, key=lambda row: row[7])]
+
+    def _renew(self, now: float):
+        connection = self._connect()
+        with connection:
+            connection.execute(
+                "UPDATE publish_outbox SET lease_until = ? WHERE owner = ?", (now + self.lease, self.owner)
+            )
+
+    def _extend(self, job_id: str, now: float) -> bool:
+        """Продлить аренду перед отправкой; False - публикация уже не принадлежит процессу"""
+        connection = self._connect()
+        with connection:
+            cursor = connection.execute(
+                "UPDATE publish_outbox SET lease_until = ? WHERE job_id = ? AND owner = ?",
+                (now + self.lease, job_id, self.owner)
+            )
+        return cursor.rowcount > 0
+
+    def _close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
@@ -0,0 +1,252 @@
+"""
+Общий для процесса ограничитель запросов к OpenAI: корзины RPM/TPM и очередь с приоритетами
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+# Классы приоритета: меньше - раньше
+PRIORITY_INTERACTIVE = 0  # Правки поста, которых пользователь ждет прямо сейчас
+PRIORITY_GENERATION = 1   # Генерация поста по /news
+PRIORITY_BACKGROUND = 2   # Спекулятивные варианты, черновики, заготовки правок
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: 'interactive',
+    PRIORITY_GENERATION: 'generation',
+    PRIORITY_BACKGROUND: 'background',
+}
+
+# Приоритет, заданный вызывающим кодом для всех запросов внутри блока
+_priority_override: ContextVar[Optional[int]] = ContextVar('request_priority', default=None)
+
+
+@contextmanager
+def priority_scope(priority: int):
+    """Выполнить блок с заданным приоритетом запросов (наследуется задачами и потоками пула)"""
+    token = _priority_override.set(priority)
+    try:
+        yield
+    finally:
+        _priority_override.reset(token)
+
+
+def current_priority(default: int) -> int:
+    """Приоритет из контекста или значение по умолчанию для вида вызовов"""
+    priority = _priority_override.get()
+    return default if priority is None else priority
+
+
+def usage_tokens(result: Any) -> Optional[int]:
+    """
+    Фактически израсходованные токены из ответа
+
+    Поддерживаются ответ openai (usage.total_tokens) и RunResponse agno (metrics['total_tokens']).
+    """
+    usage = getattr(result, 'usage', None)
+    total = getattr(usage, 'total_tokens', None)
+    if isinstance(total, int):
+        return total
+
+    metrics = getattr(result, 'metrics', None)
+    if isinstance(metrics, dict):
+        total = metrics.get('total_tokens')
+        if isinstance(total, list):
+            total = sum(value for value in total if isinstance(value, (int, float)))
+        if isinstance(total, (int, float)):
+            return int(total)
+    return None
+
+
+class Reservation:
+    """Разрешение на один запрос с оценкой токенов"""
+
+    __slots__ = ('tokens', 'priority', 'granted', 'cancelled', '_wake', 'enqueued_at')
+
+    def __init__(self, tokens: int, priority: int, wake):
+        self.tokens = tokens
+        self.priority = priority
+        self.granted = False
+        self.cancelled = False
+        self._wake = wake
+        self.enqueued_at = time.monotonic()
+
+
+class RateLimiter:
+    """
+    Корзины запросов и токенов в минуту с общей очередью по приоритетам
+
+    Запрос ждет, пока в обеих корзинах хватит места и впереди нет запросов
+    с более высоким приоритетом. После ответа оценка токенов заменяется
+    фактическим расходом: перерасход уходит в долг, остаток возвращается.
+    Работает и из event loop, и из потоков пула генерации.
+    """
+
+    def __init__(self, rpm: float = 500, tpm: float = 30000):
+        """
+        Инициализация ограничителя
+
+        Args:
+            rpm: Запросов в минуту
+            tpm: Токенов в минуту
+        """
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._queue: List = []
+        self._sequence = itertools.count()
+        self._timer: Optional[threading.Timer] = None
+        self._timer_at = 0.0
+
+        self._granted = {priority: 0 for priority in PRIORITY_NAMES}
+        self._wait_total = {priority: 0.0 for priority in PRIORITY_NAMES}
+        self._wait_max = {priority: 0.0 for priority in PRIORITY_NAMES}
+
+    def acquire_sync(self, tokens: int, priority: int, timeout: Optional[float] = None) -> Reservation:
+        """
+        Дождаться разрешения на запрос в текущем потоке
+
+        Raises:
+            TimeoutError: Разрешение не выдано за timeout секунд (запрос снят с очереди)
+        """
+        event = threading.Event()
+        reservation = self._enqueue(tokens, priority, event.set)
+        if not event.wait(timeout):
+            with self._lock:
+                # Разрешение могло быть выдано между ожиданием и блокировкой
+                if not reservation.granted:
+                    reservation.cancelled = True
+            if reservation.cancelled:
+                self._dispatch()
+                raise TimeoutError(f"Разрешение ограничителя не получено за {timeout:.1f} с")
+        return reservation
+
+    async def acquire(self, tokens: int, priority: int) -> Reservation:
+        """Дождаться разрешения на запрос в event loop"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        reservation = self._enqueue(tokens, priority, wake)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if reservation.granted:
+                    # Разрешение выдано, но запрос так и не ушел - вернуть токены
+                    self._requests += 1
+                    self._tokens += reservation.tokens
+                else:
+                    reservation.cancelled = True
+            self._dispatch()
+            raise
+        return reservation
+
+    def settle(self, reservation: Reservation, actual_tokens: Optional[int]):
+        """Заменить оценку токенов фактическим расходом"""
+        if actual_tokens is None:
+            return
+        with self._lock:
+            self._tokens += reservation.tokens - actual_tokens
+            reservation.tokens = actual_tokens
+        self._dispatch()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Глубина очереди и время ожидания по классам приоритета"""
+        with self._lock:
+            self._refill()
+            depth = {name: 0 for name in PRIORITY_NAMES.values()}
+            for _, _, reservation in self._queue:
+                if not reservation.cancelled:
+                    depth[PRIORITY_NAMES[reservation.priority]] += 1
+            return {
+                'queue_depth': depth,
+                'granted': {PRIORITY_NAMES[p]: count for p, count in self._granted.items()},
+                'avg_wait': {
+                    PRIORITY_NAMES[p]: self._wait_total[p] / count if count else 0.0
+                    for p, count in self._granted.items()
+                },
+                'max_wait': {PRIORITY_NAMES[p]: wait for p, wait in self._wait_max.items()},
+                'requests_available': self._requests,
+                'tokens_available': self._tokens,
+            }
+
+    def _enqueue(self, tokens: int, priority: int, wake) -> Reservation:
+        reservation = Reservation(tokens, priority, wake)
+        with self._lock:
+            heapq.heappush(self._queue, (priority, next(self._sequence), reservation))
+        self._dispatch()
+        return reservation
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(float(self.rpm), self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(float(self.tpm), self._tokens + elapsed * self.tpm / 60)
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+        self._dispatch()
+
+    def _dispatch(self):
+        """Выдать разрешения головным запросам очереди, пока хватает места в корзинах"""
+        wakes = []
+        retry_in = None
+        with self._lock:
+            self._refill()
+            while self._queue:
+                _, _, head = self._queue[0]
+                if head.cancelled:
+                    heapq.heappop(self._queue)
+                    continue
+
+                # Оценка больше всей корзины не должна блокировать очередь навсегда
+                needed = min(head.tokens, self.tpm)
+                if self._requests < 1 or self._tokens < needed:
+                    retry_in = max(
+                        (1 - self._requests) * 60 / self.rpm,
+                        (needed - self._tokens) * 60 / self.tpm,
+                        0.001
+                    )
+                    break
+
+                heapq.heappop(self._queue)
+                self._requests -= 1
+                self._tokens -= head.tokens
+                head.granted = True
+
+                waited = time.monotonic() - head.enqueued_at
+                self._granted[head.priority] += 1
+                self._wait_total[head.priority] += waited
+                self._wait_max[head.priority] = max(self._wait_max[head.priority], waited)
+                wakes.append(head._wake)
+
+            # Один таймер на ближайшее пополнение корзин, а не поток на каждого ждущего
+            if retry_in is None:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            else:
+                fire_at = self._updated + retry_in
+                if self._timer is None or fire_at < self._timer_at:
+                    if self._timer is not None:
+                        self._timer.cancel()
+                    self._timer = threading.Timer(retry_in, self._on_timer)
+                    self._timer.daemon = True
+                    self._timer.start()
+                    self._timer_at = fire_at
+
+        for wake in wakes:
+            wake()
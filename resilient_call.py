@@ -0,0 +1,314 @@
+"""
+Повторы и хеджирование вызовов модели: ограничение хвостовых задержек и временных ошибок
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Optional
+
+from rate_limiter import PRIORITY_GENERATION, RateLimiter, current_priority, usage_tokens
+
+logger = logging.getLogger(__name__)
+
+# Имена классов временных ошибок openai/httpx/agno (проверяются по MRO, без импорта библиотек)
+_TRANSIENT_ERRORS = {
+    'APIConnectionError', 'APITimeoutError', 'RateLimitError', 'InternalServerError',
+    'TimeoutException', 'NetworkError', 'RemoteProtocolError',
+}
+_TRANSIENT_STATUSES = {408, 409, 429}
+
+# Встроенные повторы клиента для потоковых запросов: поток нельзя повторить
+# или продублировать с середины (обычные запросы повторяет ResilientCaller)
+STREAM_RETRIES = 2
+
+# Общие потоки для хеджированных блокирующих вызовов: проигравший вызов
+# нельзя прервать, он просто дорабатывает в фоне
+_hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+
+
+def is_transient(error: BaseException) -> bool:
+    """Ошибка временная: повтор запроса может пройти успешно"""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    if isinstance(status, int):
+        return status in _TRANSIENT_STATUSES or status >= 500
+
+    return any(cls.__name__ in _TRANSIENT_ERRORS for cls in type(error).__mro__)
+
+
+class LatencyTracker:
+    """Скользящее окно задержек успешных вызовов"""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, latency: float):
+        with self._lock:
+            self._samples.append(latency)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Квантиль q (0..1) или None, если замеров нет"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class ResilientCaller:
+    """
+    Обертка вызова модели: повторы временных ошибок с джиттером в пределах дедлайна
+    и необязательный хедж - дубль запроса, если ответ задерживается дольше p95
+
+    Задержки учитываются отдельно для каждой обертки, поэтому у каждого
+    вида вызовов (редактор, аналитик, форматтер) должна быть своя - см. clone().
+    """
+
+    def __init__(
+        self,
+        name: str = 'openai',
+        attempts: int = 3,
+        deadline: float = 90.0,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        min_samples: int = 20,
+        limiter: Optional[RateLimiter] = None,
+        priority: int = PRIORITY_GENERATION
+    ):
+        """
+        Инициализация обертки
+
+        Args:
+            name: Имя вида вызовов для логов
+            attempts: Максимум попыток (1 - без повторов)
+            deadline: Общий дедлайн всех попыток, включая паузы (сек)
+            base_delay: Базовая пауза перед повтором (удваивается с каждой попыткой)
+            max_delay: Максимальная пауза перед повтором
+            hedge: Отправлять дубль запроса, если ответ дольше квантиля hedge_quantile
+            hedge_quantile: Квантиль наблюдаемых задержек, после которого отправляется дубль
+            min_samples: Сколько замеров нужно, прежде чем хеджировать
+            limiter: Общий ограничитель RPM/TPM (каждая попытка и дубль - отдельный запрос)
+            priority: Приоритет вызовов, если контекст не задает другой (priority_scope)
+        """
+        self.name = name
+        self.attempts = max(1, attempts)
+        self.deadline = deadline
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.min_samples = min_samples
+        self.limiter = limiter
+        self.priority = priority
+        self.latencies = LatencyTracker()
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def clone(self, name: str, priority: Optional[int] = None) -> 'ResilientCaller':
+        """Обертка с теми же настройками и ограничителем, но собственной статистикой задержек"""
+        return ResilientCaller(
+            name=name,
+            attempts=self.attempts,
+            deadline=self.deadline,
+            base_delay=self.base_delay,
+            max_delay=self.max_delay,
+            hedge=self.hedge,
+            hedge_quantile=self.hedge_quantile,
+            min_samples=self.min_samples,
+            limiter=self.limiter,
+            priority=self.priority if priority is None else priority
+        )
+
+    def hedge_delay(self) -> Optional[float]:
+        """Через сколько секунд отправлять дубль (None - хеджирование сейчас не применяется)"""
+        if not self.hedge or len(self.latencies) < self.min_samples:
+            return None
+        return self.latencies.percentile(self.hedge_quantile)
+
+    def backoff(self, attempt: int) -> float:
+        """Пауза перед повтором номер attempt (full jitter)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def call(self, func: Callable[..., Awaitable[Any]], *args, tokens: int = 0, **kwargs) -> Any:
+        """
+        Выполнить асинхронный вызов с повторами и хеджированием
+
+        Args:
+            func: Корутинная функция; вызывается заново для каждой попытки и дубля
+            tokens: Оценка токенов запроса для ограничителя
+
+        Returns:
+            Результат первого успешного вызова
+
+        Raises:
+            Exception: Последняя ошибка, если попытки или дедлайн исчерпаны
+        """
+        request = (func, args, kwargs, tokens, current_priority(self.priority))
+        deadline_at = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            remaining = deadline_at - time.monotonic()
+            try:
+                return await asyncio.wait_for(self._hedged(request), remaining)
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError) and time.monotonic() >= deadline_at:
+                    raise TimeoutError(f"{self.name}: дедлайн {self.deadline:.0f} с исчерпан") from e
+                delay = self._next_delay(e, attempt, deadline_at)
+                if delay is None:
+                    raise
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def call_sync(self, func: Callable[..., Any], *args, tokens: int = 0, **kwargs) -> Any:
+        """
+        Выполнить блокирующий вызов с повторами и хеджированием (для Agent.run и синхронного клиента)
+
+        Дедлайн проверяется между попытками: прервать уже идущий блокирующий
+        вызов нельзя, его ограничивает таймаут самого клиента.
+        """
+        request = (func, args, kwargs, tokens, current_priority(self.priority))
+        deadline_at = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            try:
+                return self._hedged_sync(request, deadline_at)
+            except Exception as e:
+                delay = self._next_delay(e, attempt, deadline_at)
+                if delay is None:
+                    raise
+            attempt += 1
+            time.sleep(delay)
+
+    def _next_delay(self, error: Exception, attempt: int, deadline_at: float) -> Optional[float]:
+        """Пауза перед следующей попыткой или None, если повторять нельзя"""
+        if attempt + 1 >= self.attempts or not is_transient(error):
+            return None
+
+        delay = self.backoff(attempt)
+        # Повтор бессмысленен, если после паузы не останется времени хотя бы на типичный ответ
+        typical = self.latencies.percentile(0.5) or 0.0
+        if time.monotonic() + delay + typical >= deadline_at:
+            return None
+
+        self.retries += 1
+        logger.warning(
+            f"{self.name}: временная ошибка ({type(error).__name__}: {error}), "
+            f"повтор {attempt + 2}/{self.attempts} через {delay:.1f} с"
+        )
+        return delay
+
+    async def _acquire(self, request):
+        """Занять место в ограничителе (None - ограничитель не задан)"""
+        if self.limiter is None:
+            return None
+        _, _, _, tokens, priority = request
+        return await self.limiter.acquire(tokens, priority)
+
+    def _acquire_sync(self, request, deadline_at: float):
+        """Занять место в ограничителе, ожидая не дольше остатка дедлайна"""
+        if self.limiter is None:
+            return None
+        _, _, _, tokens, priority = request
+        return self.limiter.acquire_sync(tokens, priority, timeout=max(0.0, deadline_at - time.monotonic()))
+
+    def _settle(self, reservation, result):
+        if reservation is not None:
+            self.limiter.settle(reservation, usage_tokens(result))
+
+    async def _timed(self, request, reservation=None) -> Any:
+        func, args, kwargs, _, _ = request
+        if reservation is None:
+            reservation = await self._acquire(request)
+        started = time.monotonic()
+        result = await func(*args, **kwargs)
+        self.latencies.record(time.monotonic() - started)
+        self._settle(reservation, result)
+        return result
+
+    async def _hedged(self, request) -> Any:
+        """Одна попытка: основной запрос и, если он задержался, дубль"""
+        delay = self.hedge_delay()
+        # Ожидание в очереди ограничителя не считается задержкой ответа
+        reservation = await self._acquire(request)
+        primary = asyncio.ensure_future(self._timed(request, reservation))
+        if delay is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        self.hedges += 1
+        hedge = asyncio.ensure_future(self._timed(request))
+        pending = {primary, hedge}
+        try:
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = self._pick_winner(done, pending, hedge)
+                if winner is not None:
+                    return winner.result()
+        finally:
+            for task in (primary, hedge):
+                task.cancel()
+
+    def _timed_sync(self, request, deadline_at: float, reservation=None) -> Any:
+        func, args, kwargs, _, _ = request
+        if reservation is None:
+            reservation = self._acquire_sync(request, deadline_at)
+        started = time.monotonic()
+        result = func(*args, **kwargs)
+        self.latencies.record(time.monotonic() - started)
+        self._settle(reservation, result)
+        return result
+
+    def _hedged_sync(self, request, deadline_at: float) -> Any:
+        """Одна блокирующая попытка: основной вызов и, если он задержался, дубль в соседнем потоке"""
+        delay = self.hedge_delay()
+        reservation = self._acquire_sync(request, deadline_at)
+        if delay is None:
+            return self._timed_sync(request, deadline_at, reservation)
+
+        primary = _hedge_executor.submit(self._timed_sync, request, deadline_at, reservation)
+        done, _ = wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        self.hedges += 1
+        hedge = _hedge_executor.submit(self._timed_sync, request, deadline_at)
+        pending = {primary, hedge}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = self._pick_winner(done, pending, hedge)
+            if winner is not None:
+                return winner.result()
+
+    def _pick_winner(self, done, pending, hedge):
+        """
+        Выбрать завершившийся запрос: успешный сразу, ошибку - только когда ждать больше некого
+
+        Returns:
+            Задача/future, результат которой нужно вернуть, или None, если ждем второй запрос
+        """
+        for future in done:
+            if future.exception() is None:
+                if future is hedge:
+                    self.hedge_wins += 1
+                return future
+        # Ошибка одного из запросов не повод отказываться от второго
+        return None if pending else next(iter(done))
@@ -0,0 +1,140 @@
+"""
+Потоковый вывод ответа модели в сообщение Telegram с ограничением частоты правок
+"""
+
+import asyncio
+import contextvars
+import logging
+import re
+import threading
+import time
+from concurrent.futures import Executor
+from typing import Any, AsyncIterator, Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Конец предложения или абзаца: до этой позиции текст показывается пользователю
+SENTENCE_END = re.compile(r'[.!?…](?=\s)|\n')
+
+# Лимит длины текста сообщения Telegram
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+_STREAM_END = object()
+
+
+async def iterate_in_thread(
+    func: Callable[..., Iterable[Any]],
+    *args,
+    executor: Optional[Executor] = None
+) -> AsyncIterator[Any]:
+    """
+    Итерировать блокирующий генератор в отдельном потоке
+
+    Args:
+        func: Функция, возвращающая блокирующий итератор (поток токенов модели)
+        *args: Аргументы функции
+        executor: Пул потоков (по умолчанию - пул event loop)
+
+    Yields:
+        Элементы итератора по мере поступления
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stopped = threading.Event()
+
+    def produce():
+        try:
+            for item in func(*args):
+                # Потребитель прекратил чтение - дальше генерировать незачем
+                if stopped.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        except BaseException as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, _STREAM_END)
+
+    # Контекст (например, приоритет запросов) переносится в поток явно
+    producer = loop.run_in_executor(executor, contextvars.copy_context().run, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is _STREAM_END:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stopped.set()
+        await asyncio.wait({producer})
+
+
+class StreamingPreview:
+    """Постепенное обновление сообщения по мере генерации текста"""
+
+    def __init__(self, message, header: str = "", min_interval: float = 1.5):
+        """
+        Инициализация потокового превью
+
+        Args:
+            message: Сообщение aiogram, которое будет редактироваться
+            header: Строка над текстом (например, "✍️ Пишу пост...")
+            min_interval: Минимальный интервал между правками в секундах
+                (Telegram ограничивает частоту правок в одном чате)
+        """
+        self.message = message
+        self.header = header
+        self.min_interval = min_interval
+        self.text = ""
+        self.edits = 0
+        self._shown = ""
+        self._next_edit_at = 0.0
+        self._started = time.monotonic()
+        self.first_edit_after: Optional[float] = None
+
+    def _visible_text(self) -> str:
+        """Текст до конца последнего завершенного предложения"""
+        last_end = None
+        for match in SENTENCE_END.finditer(self.text):
+            last_end = match.end()
+        return self.text[:last_end].strip() if last_end else ""
+
+    async def set_header(self, header: str):
+        """Сменить заголовок и сразу показать его"""
+        self.header = header
+        await self._edit(self._shown, force=True)
+
+    async def feed(self, delta: str):
+        """Добавить фрагмент текста и обновить сообщение, если пришло время"""
+        self.text += delta
+        if time.monotonic() < self._next_edit_at:
+            return
+
+        visible = self._visible_text()
+        if visible and visible != self._shown:
+            await self._edit(visible)
+
+    async def _edit(self, visible: str, force: bool = False):
+        """Отредактировать сообщение с учетом ограничений Telegram"""
+        if not force and time.monotonic() < self._next_edit_at:
+            return
+
+        body = f"{visible} ▌" if visible else ""
+        text = f"{self.header}\n\n{body}".strip()[:TELEGRAM_MESSAGE_LIMIT]
+        self._next_edit_at = time.monotonic() + self.min_interval
+
+        try:
+            # Без parse_mode: незавершенная HTML-разметка не должна ломать правку
+            await self.message.edit_text(text)
+        except Exception as e:
+            retry_after = getattr(e, 'retry_after', None)
+            if retry_after:
+                self._next_edit_at = time.monotonic() + retry_after
+            logger.debug(f"Не удалось обновить потоковое превью: {e}")
+            return
+
+        self._shown = visible
+        self.edits += 1
+        if visible and self.first_edit_after is None:
+            self.first_edit_after = time.monotonic() - self._started
+            logger.info(f"Первый фрагмент текста показан через {self.first_edit_after:.2f} с")
@@ -8,11 +8,27 @@ from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.storage.memory import MemoryStorage
 from dotenv import load_dotenv
 import os
-from news_agent import NewsAgent
+from news_agent import NewsAgent, NO_NEWS_MESSAGE
 from content_formatter import ContentFormatter
 from post_editor import PostEditor
+from resilient_call import ResilientCaller
+from rate_limiter import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, RateLimiter, priority_scope
+from edit_cache import EditPrefetcher
+from post_history import PostHistory
+from post_store import create_post_store
+from generation_pool import GenerationPool, GenerationLimitError
+from news_research import NewsResearcher, format_results
+from news_cache import TTLCache, SingleFlight, normalize_topic
+from draft_scheduler import DraftScheduler, parse_quiet_hours, parse_topics
+from stream_preview import StreamingPreview
+from duplicate_index import DuplicateIndex
+from channel_info import ChannelInfoCache, ChannelTarget, is_access_error, parse_channels
+from publish_outbox import (
+    FINAL_STATUSES, OutboxJob, PublishOutbox, StoredSendError, is_transient_send_error, retry_after
+)
 from datetime import datetime
 import hashlib
+import html
 
 # Загрузка переменных окружения
 load_dotenv()
@@ -32,40 +48,164 @@ if missing_vars:
     logger.error(f"Отсутствуют обязательные переменные окружения: {missing_vars}")
     exit(1)
 
-# Инициализация редактора постов
-post_editor = PostEditor(api_key=os.getenv('OPENAI_API_KEY'))
+# Общий на процесс лимит запросов и токенов OpenAI в минуту: правки идут
+# раньше генерации по /news, а фоновые черновики и заготовки - в последнюю очередь
+rate_limiter = RateLimiter(
+    rpm=float(os.getenv('OPENAI_RPM', '500')),
+    tpm=float(os.getenv('OPENAI_TPM', '30000'))
+)
+
+# Повторы временных ошибок и хеджирование медленных вызовов модели
+# (редактор и каждый агент ведут собственную статистику задержек)
+model_caller = ResilientCaller(
+    attempts=int(os.getenv('MODEL_RETRY_ATTEMPTS', '3')),
+    deadline=float(os.getenv('MODEL_CALL_DEADLINE', '90')),
+    hedge=os.getenv('MODEL_HEDGING', 'false').lower() == 'true',
+    hedge_quantile=float(os.getenv('MODEL_HEDGE_QUANTILE', '0.95')),
+    limiter=rate_limiter
+)
+
+# Инициализация редактора постов: 'async' - общий пул соединений и лимит одновременных правок,
+# 'thread' - синхронный клиент в потоках executor'а
+post_editor = PostEditor(
+    api_key=os.getenv('OPENAI_API_KEY'),
+    client_mode=os.getenv('EDITOR_CLIENT_MODE', 'async'),
+    max_concurrency=int(os.getenv('EDITOR_MAX_CONCURRENCY', '8')),
+    timeout=float(os.getenv('EDITOR_TIMEOUT', '60')),
+    # 'full' - пост целиком с потоковым выводом, 'patch' - точечные замены
+    # (меньше токенов вывода на локальных правках, но ответ без потока)
+    edit_mode=os.getenv('EDITOR_EDIT_MODE', 'full'),
+    caller=model_caller.clone('editor', priority=PRIORITY_INTERACTIVE)
+)
+
+# Общий Redis для нескольких процессов бота: состояния FSM и посты на подтверждении
+REDIS_URL = os.getenv('REDIS_URL')
 
 # Инициализация бота и диспетчера с FSM
-storage = MemoryStorage()
+if REDIS_URL:
+    from aiogram.fsm.storage.redis import RedisStorage
+    storage = RedisStorage.from_url(REDIS_URL)
+else:
+    storage = MemoryStorage()
 bot = Bot(token=os.getenv('TELEGRAM_BOT_TOKEN'))
 dp = Dispatcher(storage=storage)
 
+# Сведения о канале и правах бота: прогреваются на старте, публикация - один запрос
+channel_info = ChannelInfoCache(bot, ttl=float(os.getenv('CHANNEL_INFO_TTL', '3600')))
+
 # Состояния для FSM
 class NewsStates(StatesGroup):
     waiting_for_approval = State()
     edit_instruction = State()  # Новое состояние для редактирования
 
+# Режим конвейера: 'two_step' - обзор аналитика + форматирование,
+# 'single' - пост пишется сразу из результатов поиска за один вызов модели
+PIPELINE_MODE = os.getenv('PIPELINE_MODE', 'two_step')
+
 # Инициализация агентов
 try:
-    news_agent = NewsAgent()
-    content_formatter = ContentFormatter()
+    news_agent = NewsAgent(caller=model_caller)
+    content_formatter = ContentFormatter(
+        pipeline_mode=PIPELINE_MODE,
+        token_budget=int(os.getenv('COMPRESSION_TOKEN_BUDGET', '0')),
+        caller=model_caller
+    )
     logger.info("Агенты инициализированы успешно")
 except Exception as e:
     logger.error(f"Ошибка инициализации агентов: {e}")
     exit(1)
 
-# Хранилище для постов (в продакшене используйте базу данных)
-pending_posts = {}
+# Пул воркеров для генерации: агенты блокирующие, поэтому выполняются вне event loop
+generation_pool = GenerationPool(
+    max_workers=int(os.getenv('GENERATION_WORKERS', '4')),
+    per_user_limit=int(os.getenv('GENERATION_USER_LIMIT', '1')),
+    background_workers=int(os.getenv('GENERATION_BACKGROUND_WORKERS', '1'))
+)
+
+# Потоковый вывод текста модели в сообщение с превью
+STREAMING_PREVIEW = os.getenv('STREAMING_PREVIEW', 'false').lower() == 'true'
+STREAM_EDIT_INTERVAL = float(os.getenv('STREAM_EDIT_INTERVAL', '1.5'))
+
+def create_streaming_preview(message: Message, header: str):
+    """Создать потоковое превью для сообщения, если потоковый режим включен"""
+    if not STREAMING_PREVIEW:
+        return None
+    return StreamingPreview(message, header=header, min_interval=STREAM_EDIT_INTERVAL)
+
+# Несколько вариантов поста за один вызов форматтера (1 - обычная генерация)
+POST_VARIANTS = int(os.getenv('POST_VARIANTS', '1'))
+
+# Спекулятивная генерация альтернативного варианта после показа превью
+SPECULATIVE_GENERATION = os.getenv('SPECULATIVE_GENERATION', 'false').lower() == 'true'
+
+# Параллельный поиск по источникам: 'fanout' - все источники сразу с дедлайном,
+# 'agent' - последовательные вызовы инструментов самим агентом
+RESEARCH_MODE = os.getenv('RESEARCH_MODE', 'fanout')
+news_researcher = NewsResearcher(
+    deadline=float(os.getenv('RESEARCH_DEADLINE', '8')),
+    max_results=int(os.getenv('RESEARCH_MAX_RESULTS', '8'))
+)
+
+# Кэш исследованных новостей: повторные темы и перегенерация платят только за форматирование
+news_cache = TTLCache(
+    ttl=float(os.getenv('NEWS_CACHE_TTL', '900')),
+    max_size=int(os.getenv('NEWS_CACHE_SIZE', '128'))
+)
+# Одновременные запросы одной темы ждут общего исследования
+research_flight = SingleFlight()
+# Заголовки источников последнего исследования темы (для индекса дубликатов)
+news_sources = TTLCache(ttl=news_cache.ttl, max_size=news_cache.max_size)
+
+# Индекс опубликованных постов и заголовков их источников
+duplicate_index = DuplicateIndex(
+    path=os.getenv('DUPLICATE_INDEX_PATH', 'published_index.json'),
+    window=float(os.getenv('DUPLICATE_WINDOW_HOURS', '24')) * 3600
+)
+
+def duplicate_overlap(post_content: str) -> float:
+    """Сходство поста с опубликованными: 1 - точный повтор, 0 - похожих нет"""
+    match = duplicate_index.find(post_content, kind='post')
+    if match is None:
+        return 0.0
+    return 1.0 - match['distance'] / (duplicate_index.max_distance + 1)
+
+def duplicate_warning(post_content: str) -> str:
+    """Предупреждение для превью, если пост похож на уже опубликованный"""
+    match = duplicate_index.find(post_content, kind='post')
+    if match is None:
+        return ""
+    published_at = datetime.fromtimestamp(match['created_at']).strftime('%d.%m %H:%M')
+    return f"⚠️ **Похоже на пост, опубликованный {published_at}**\n\n"
+
+# Хранилище постов, ожидающих подтверждения: 'sqlite' - переживает перезапуск бота,
+# 'redis' - общее для нескольких процессов, 'memory' - словарь в памяти процесса
+# Лимиты действуют только для 'memory': при превышении вытесняются давно не открывавшиеся посты.
+# SQLite и Redis хранят посты вне процесса, их ограничивает только PENDING_POST_TTL
+PENDING_MAX_POSTS = os.getenv('PENDING_MAX_POSTS')
+PENDING_MAX_BYTES = os.getenv('PENDING_MAX_BYTES')
+post_store = create_post_store(
+    os.getenv('POST_STORE', 'redis' if REDIS_URL else 'sqlite'),
+    os.getenv('POST_STORE_PATH', 'pending_posts.db'),
+    redis_url=REDIS_URL,
+    max_posts=int(PENDING_MAX_POSTS) if PENDING_MAX_POSTS else None,
+    max_bytes=int(PENDING_MAX_BYTES) if PENDING_MAX_BYTES else None,
+    on_evict=lambda post_id: release_post(post_id)
+)
+
+# Сколько пост ждет подтверждения, прежде чем удалиться (сек)
+PENDING_POST_TTL = float(os.getenv('PENDING_POST_TTL', '3600'))
+
+# Сколько постов показывать в /mydrafts
+MY_DRAFTS_LIMIT = 10
 
 # Функция для безопасного получения поста
-def get_post_safely(post_id: str, user_id: int = None):
+async def get_post_safely(post_id: str, user_id: int = None):
     """Безопасно получить пост из хранилища"""
-    if post_id not in pending_posts:
-        logger.warning(f"Пост {post_id} не найден в хранилище. Доступные посты: {list(pending_posts.keys())}")
+    post_data = await post_store.get(post_id)
+    if post_data is None:
+        logger.warning(f"Пост {post_id} не найден в хранилище")
         return None
     
-    post_data = pending_posts[post_id]
-    
     # Дополнительная проверка владельца (опционально)
     if user_id and post_data.get('user_id') != user_id:
         logger.warning(f"Пост {post_id} принадлежит другому пользователю")
@@ -73,6 +213,101 @@ def get_post_safely(post_id: str, user_id: int = None):
         
     return post_data
 
+# Фоновые задачи генерации альтернативных вариантов: post_id -> задача
+speculative_tasks = {}
+
+def schedule_speculative_variant(post_id: str, post_data: dict):
+    """Запустить фоновую генерацию альтернативного варианта поста"""
+    if not SPECULATIVE_GENERATION:
+        return
+    # Запасные варианты уже есть - "Другой вариант" сработает и без фоновой генерации
+    if post_data.get('variants'):
+        return
+    
+    speculative_tasks[post_id] = asyncio.create_task(
+        _generate_speculative_variant(post_id, post_data['topic'])
+    )
+
+async def _generate_speculative_variant(post_id: str, topic: str):
+    """Сгенерировать альтернативный вариант из того же исследования и сохранить в посте"""
+    try:
+        raw_news = await telegram_news_bot.research_news(topic, background=True)
+        alternative = await generation_pool.run_background(
+            content_formatter.format_news_post, raw_news
+        )
+        
+        # Пост мог быть подтвержден или отменен, пока шла генерация
+        if await post_store.update(post_id, alternative=alternative) is not None:
+            logger.info(f"Альтернативный вариант для поста {post_id} готов")
+    except Exception as e:
+        logger.warning(f"Не удалось заранее сгенерировать вариант для поста {post_id}: {e}")
+    finally:
+        if speculative_tasks.get(post_id) is asyncio.current_task():
+            del speculative_tasks[post_id]
+
+async def take_speculative_variant(post_id: str):
+    """Забрать заранее сгенерированный вариант, дождавшись фоновой задачи"""
+    task = speculative_tasks.get(post_id)
+    if task is not None:
+        await asyncio.wait({task})
+    
+    # Старый пост удаляется сразу после замены, поэтому вариант из него не убирается
+    post_data = await post_store.get(post_id)
+    return post_data.get('alternative') if post_data else None
+
+def cancel_speculative_variant(post_id: str):
+    """Отменить фоновую генерацию варианта для поста"""
+    task = speculative_tasks.pop(post_id, None)
+    if task is not None:
+        task.cancel()
+
+# Инструкции быстрых правок: результат зависит только от текста поста
+QUICK_EDIT_INSTRUCTIONS = {
+    "shorter": "Сделай пост короче, убери лишние детали, оставь только самое важное",
+    "details": "Добавь больше деталей и подробностей, расширь информацию",
+    "engaging": "Сделай пост более привлекательным и интересным, улучши заголовок",
+    "emoji": "Добавь больше подходящих эмодзи для лучшего визуального восприятия"
+}
+
+# Заблаговременные быстрые правки при открытии меню редактирования
+QUICK_EDIT_PREFETCH = os.getenv('QUICK_EDIT_PREFETCH', 'true').lower() == 'true'
+
+async def prefetch_edit(content: str, instruction: str) -> str:
+    """Заготовка быстрой правки: пользователь ее еще не запросил, поэтому фоновый приоритет"""
+    with priority_scope(PRIORITY_BACKGROUND):
+        return await post_editor.edit_post(content, instruction)
+
+quick_edits = EditPrefetcher(prefetch_edit)
+
+# История правок поста: сколько версий хранить для отмены и возврата
+EDIT_HISTORY_VERSIONS = int(os.getenv('EDIT_HISTORY_VERSIONS', '20'))
+
+def create_history(content: str) -> PostHistory:
+    """Создать историю версий для нового поста"""
+    return PostHistory(content, max_versions=EDIT_HISTORY_VERSIONS)
+
+def edit_base(post_data: dict) -> str:
+    """Текст, к которому применяется правка: оригинал или текущая версия"""
+    return post_data['content'] if post_data.get('edit_current') else post_data['original_content']
+
+async def save_edit(post_id: str, post_data: dict, edited_content: str):
+    """Записать правку новой версией поста"""
+    post_data['content'] = post_data['history'].push(edited_content)
+    await post_store.update(post_id, content=post_data['content'], history=post_data['history'])
+
+def release_post(post_id: str):
+    """Отменить фоновые задачи и заготовки правок поста"""
+    cancel_speculative_variant(post_id)
+    quick_edits.evict(post_id)
+
+async def discard_post(post_id: str):
+    """Удалить пост из хранилища вместе с его фоновыми задачами и заготовками правок"""
+    release_post(post_id)
+    await post_store.delete(post_id)
+
+class PublishError(Exception):
+    """Окончательная ошибка публикации с готовым сообщением для пользователя"""
+
 class TelegramNewsBot:
     def __init__(self):
         # Получаем ID канала и преобразуем в int если это возможно
@@ -89,17 +324,73 @@ class TelegramNewsBot:
         logger.info(f"Инициализация бота с каналом: {self.channel_username} (ID: {self.channel_id})")
         logger.info(f"Тип channel_id: {type(self.channel_id)}, значение из env: '{channel_id_str}'")
         
-    async def generate_news_post(self, topic: str = "latest news"):
-        """Генерировать новостной пост"""
+        # Несколько каналов (региональные и т.п.) с необязательным лимитом длины для каждого;
+        # без TELEGRAM_CHANNELS публикуется в единственный канал из переменных выше
+        self.channels = parse_channels(os.getenv('TELEGRAM_CHANNELS', ''))
+        if not self.channels and self.target_channel:
+            self.channels = [ChannelTarget(self.target_channel)]
+        logger.info(f"Каналы для публикации: {[target.chat_id for target in self.channels]}")
+        
+    async def generate_news_post(
+        self,
+        topic: str = "latest news",
+        user_id: int = None,
+        preview: StreamingPreview = None
+    ):
+        """Генерировать новостной пост
+        
+        Raises:
+            GenerationLimitError: Если у пользователя уже идет генерация
+        """
+        variants = await self.generate_news_variants(topic, user_id, preview)
+        return variants[0]
+    
+    async def generate_news_variants(
+        self,
+        topic: str = "latest news",
+        user_id: int = None,
+        preview: StreamingPreview = None
+    ) -> list:
+        """Генерировать варианты поста: первый - лучший, остальные - для мгновенной замены
+        
+        Без режима вариантов (POST_VARIANTS=1) и при потоковом превью возвращает один пост.
+        
+        Raises:
+            GenerationLimitError: Если у пользователя уже идет генерация
+        """
+        async with generation_pool.user_slot(user_id):
+            if POST_VARIANTS > 1 and preview is None:
+                return await self._generate_news_variants(topic)
+            return [await self._generate_news_post(topic, preview)]
+    
+    async def _generate_news_variants(self, topic: str) -> list:
+        """Выполнить генерацию нескольких вариантов поста одним вызовом форматтера"""
+        try:
+            raw_news = await self.research_news(topic)
+            return await generation_pool.run(
+                content_formatter.format_news_variants, raw_news, POST_VARIANTS, duplicate_overlap
+            )
+        except Exception as e:
+            logger.error(f"Ошибка при генерации вариантов поста: {e}")
+            return [f"❌ Ошибка: {str(e)}"]
+    
+    async def _generate_news_post(self, topic: str, preview: StreamingPreview = None) -> str:
+        """Выполнить генерацию поста в пуле воркеров"""
         try:
             logger.info(f"Получение новостей по теме: {topic}")
             
             # Шаг 1: Получить новости
-            raw_news = news_agent.get_latest_news(topic)
+            raw_news = await self.research_news(topic)
             logger.info("Новости получены успешно")
             
             # Шаг 2: Форматировать контент
-            formatted_post = content_formatter.format_news_post(raw_news)
+            if preview is not None:
+                await preview.set_header("✍️ Пишу пост...")
+                async for delta in generation_pool.stream(content_formatter.stream_news_post, raw_news):
+                    await preview.feed(delta)
+                formatted_post = content_formatter.sanitize(preview.text or "Ошибка форматирования")
+            else:
+                formatted_post = await generation_pool.run(content_formatter.format_news_post, raw_news)
             logger.info("Контент отформатирован")
             
             return formatted_post
@@ -108,80 +399,244 @@ class TelegramNewsBot:
             logger.error(f"Ошибка при обработке новостей: {e}")
             return f"❌ Ошибка: {str(e)}"
     
-    async def edit_post_with_ai(self, original_post: str, edit_instructions: str) -> str:
+    async def research_news(self, topic: str, background: bool = False) -> str:
+        """Собрать и проанализировать новости по теме (с кэшированием)
+        
+        Args:
+            topic: Тема
+            background: Фоновая работа (спекулятивный вариант, черновик): вызовы агентов
+                идут через фоновые слоты пула и не занимают места интерактивных запросов
+        """
+        cache_key = normalize_topic(topic)
+        raw_news = news_cache.get(cache_key)
+        if raw_news is not None:
+            logger.info(f"Новости по теме '{topic}' взяты из кэша")
+            return raw_news
+        
+        # Фоновая работа присоединяется к интерактивному исследованию, но не наоборот:
+        # иначе /news ждал бы фоновый слот пула и фоновый приоритет ограничителя
+        flight_key = cache_key
+        if background and cache_key not in research_flight:
+            flight_key = f"{cache_key}:background"
+        return await research_flight.do(
+            flight_key, lambda: self._research_and_cache(topic, cache_key, background)
+        )
+    
+    async def _research_and_cache(self, topic: str, cache_key: str, background: bool = False) -> str:
+        """Выполнить исследование и сохранить успешный результат в кэш"""
+        raw_news = await self._research_news(topic, background)
+        if raw_news != NO_NEWS_MESSAGE:
+            news_cache.set(cache_key, raw_news)
+        return raw_news
+    
+    async def _research_news(self, topic: str, background: bool = False) -> str:
+        """Собрать и проанализировать новости по теме"""
+        run = generation_pool.run_background if background else generation_pool.run
+        if RESEARCH_MODE == 'fanout' or PIPELINE_MODE == 'single':
+            results = self._skip_published_stories(await news_researcher.search(topic))
+            news_sources.set(normalize_topic(topic), [result['title'] for result in results])
+            if results and PIPELINE_MODE == 'single':
+                # Форматтер сам напишет пост из результатов поиска
+                return format_results(results)
+            if results:
+                return await run(news_agent.analyze_search_results, topic, format_results(results))
+            logger.warning("Параллельный поиск не дал результатов, используем агента с инструментами")
+        
+        return await run(news_agent.get_latest_news, topic)
+    
+    @staticmethod
+    def _skip_published_stories(results):
+        """Убрать результаты поиска, заголовки которых уже стояли за опубликованными постами"""
+        fresh = [
+            result for result in results
+            if duplicate_index.find(result['title'], kind='headline') is None
+        ]
+        if len(fresh) < len(results):
+            logger.info(f"Пропущено уже опубликованных историй: {len(results) - len(fresh)}")
+        # Если все истории уже публиковались, работаем с ними - превью покажет предупреждение
+        return fresh or results
+    
+    async def edit_post_with_ai(
+        self,
+        original_post: str,
+        edit_instructions: str,
+        preview: StreamingPreview = None
+    ) -> str:
         """Редактировать пост с помощью ИИ"""
         try:
-            return await post_editor.edit_post(original_post, edit_instructions)
+            if preview is None:
+                return await post_editor.edit_post(original_post, edit_instructions)
+            
+            async for delta in post_editor.edit_post_stream(original_post, edit_instructions):
+                await preview.feed(delta)
+            
+            edited_post = preview.text.strip()
+            if not edited_post:
+                raise Exception("Получен пустой ответ от ИИ")
+            return edited_post
         except Exception as e:
             logger.error(f"Ошибка редактирования поста: {e}")
             raise e
     
-    async def publish_to_channel(self, post_content: str):
-        """Опубликовать пост в канале"""
-        # Определить целевой канал
-        target_channel = self.channel_id or self.channel_username
+    @property
+    def target_channel(self):
+        """Канал для публикации: ID или @username"""
+        return self.channel_id or self.channel_username
+
+    async def send_to_channel(self, target_channel, post_content: str, sources: list = None) -> str:
+        """Отправить пост в канал
         
-        if not target_channel:
-            logger.error("Канал не настроен - отсутствует TELEGRAM_CHANNEL_ID и TELEGRAM_CHANNEL_USERNAME")
-            return "⚠️ Канал не настроен в переменных окружения"
+        Ошибки Telegram пробрасываются: повторы и паузы выполняет очередь публикаций.
+        
+        Raises:
+            PublishError: Канал недоступен или у бота нет прав - повтор не поможет
+        """
+        try:
+            chat_info = await channel_info.get(target_channel)
+        except Exception as chat_error:
+            logger.error(f"Не удалось получить информацию о канале {target_channel}: {chat_error}")
+            if retry_after(chat_error) is not None or is_transient_send_error(chat_error):
+                raise
+            raise PublishError(
+                f"❌ Канал не найден или недоступен: {target_channel}. Убедитесь, что бот добавлен в канал."
+            ) from chat_error
+        
+        if chat_info.is_admin is False:
+            logger.error(f"Бот не является администратором канала {target_channel}")
+            raise PublishError(
+                "❌ Бот не является администратором канала. Добавьте бота как администратора с правами на отправку сообщений."
+            )
         
         try:
-            logger.info(f"Попытка публикации в канал: {target_channel} (тип: {type(target_channel)})")
-            logger.info(f"channel_id: {self.channel_id}, channel_username: {self.channel_username}")
-            
-            # Сначала проверить доступ к каналу
-            try:
-                chat_info = await bot.get_chat(target_channel)
-                logger.info(f"Канал найден: {chat_info.title} (ID: {chat_info.id})")
-                
-                # Проверить права администратора
-                try:
-                    admins = await bot.get_chat_administrators(chat_info.id)
-                    bot_info = await bot.get_me()
-                    is_admin = any(admin.user.id == bot_info.id for admin in admins)
-                    
-                    if not is_admin:
-                        logger.error(f"Бот не является администратором канала {target_channel}")
-                        return "❌ Бот не является администратором канала. Добавьте бота как администратора с правами на отправку сообщений."
-                        
-                    logger.info("Бот имеет права администратора")
-                    
-                except Exception as admin_error:
-                    logger.warning(f"Не удалось проверить права администратора: {admin_error}")
-                    
-            except Exception as chat_error:
-                logger.error(f"Не удалось получить информацию о канале {target_channel}: {chat_error}")
-                return f"❌ Канал не найден или недоступен: {target_channel}. Убедитесь, что бот добавлен в канал."
-            
             # Отправить сообщение с HTML парсингом
             message = await bot.send_message(
-                chat_id=target_channel,
+                chat_id=chat_info.chat_id,
                 text=post_content,
                 parse_mode='HTML',  # Используем HTML парсинг для поддержки HTML тегов
                 disable_web_page_preview=False
             )
-            
-            logger.info(f"✅ Пост успешно опубликован в канале {target_channel} (message_id: {message.message_id})")
-            return f"✅ Пост успешно опубликован в канале {chat_info.title}!"
-            
         except Exception as e:
-            error_msg = str(e)
-            logger.error(f"❌ Ошибка публикации в канале {target_channel}: {error_msg}")
-            
-            # Детализированная обработка ошибок
-            if "chat not found" in error_msg.lower():
-                return f"❌ Канал {target_channel} не найден. Проверьте правильность имени канала."
-            elif "not enough rights" in error_msg.lower() or "forbidden" in error_msg.lower():
-                return f"❌ Недостаточно прав для публикации в канале {target_channel}. Добавьте бота как администратора."
-            elif "bot was blocked" in error_msg.lower():
-                return f"❌ Бот заблокирован в канале {target_channel}."
-            else:
-                return f"❌ Ошибка публикации: {error_msg}"
+            logger.error(f"❌ Ошибка публикации в канале {target_channel}: {e}")
+            # Права или канал изменились - следующая публикация проверит их заново
+            if is_access_error(e):
+                channel_info.invalidate(target_channel)
+            raise
+        
+        logger.info(f"✅ Пост успешно опубликован в канале {target_channel} (message_id: {message.message_id})")
+        return f"✅ Пост успешно опубликован в канале {chat_info.title}!"
+
+    @staticmethod
+    def describe_publish_error(target_channel, error: BaseException) -> str:
+        """Сообщение для пользователя об окончательной ошибке публикации"""
+        # Ошибка канала, отправленного до перезапуска, восстанавливается из очереди публикаций
+        if isinstance(error, PublishError) or (
+            isinstance(error, StoredSendError) and error.kind == PublishError.__name__
+        ):
+            return str(error)
+        
+        # Детализированная обработка ошибок
+        error_msg = str(error)
+        if "chat not found" in error_msg.lower():
+            return f"❌ Канал {target_channel} не найден. Проверьте правильность имени канала."
+        elif "not enough rights" in error_msg.lower() or "forbidden" in error_msg.lower():
+            return f"❌ Недостаточно прав для публикации в канале {target_channel}. Добавьте бота как администратора."
+        elif "bot was blocked" in error_msg.lower():
+            return f"❌ Бот заблокирован в канале {target_channel}."
+        else:
+            return f"❌ Ошибка публикации: {error_msg}"
+
+    @staticmethod
+    def record_published(post_content: str, sources: list):
+        """Записать опубликованный пост и заголовки его источников в индекс"""
+        try:
+            duplicate_index.add(post_content, kind='post', save=False)
+            for headline in sources:
+                duplicate_index.add(headline, kind='headline', save=False)
+            duplicate_index.save()
+        except Exception as e:
+            logger.error(f"Не удалось обновить индекс дубликатов: {e}")
 
 # Создание экземпляра бота
 telegram_news_bot = TelegramNewsBot()
 
-def create_approval_keyboard(post_id: str) -> InlineKeyboardMarkup:
+def publish_status_line(job: OutboxJob) -> str:
+    """Строка статуса публикации в одном канале"""
+    if job.status == 'published':
+        return f"{job.chat_id}: {job.result}"
+    if job.status == 'failed':
+        return f"{job.chat_id}: {telegram_news_bot.describe_publish_error(job.chat_id, job.error)}"
+    if job.status == 'retrying':
+        retry_at = datetime.fromtimestamp(job.next_attempt).strftime('%H:%M:%S')
+        return f"{job.chat_id}: ⏳ отложено до {retry_at} ({job.error})"
+    return f"{job.chat_id}: 📤 в очереди"
+
+async def notify_publish(job: OutboxJob):
+    """Показать статус публикации по каждому каналу в сообщении, где пост был подтвержден"""
+    # Пост попадает в индекс дубликатов один раз, при первой успешной отправке: группа
+    # включает итоги каналов, отправленных другим процессом или до перезапуска
+    if job.status == 'published' and sum(member.status == 'published' for member in job.group) == 1:
+        telegram_news_bot.record_published(job.content, job.sources)
+    
+    notify = job.notify or {}
+    if 'message_id' not in notify:
+        return
+    
+    # ID каналов и тексты ошибок Telegram содержат '_', '*' и '<' - экранируются для HTML
+    lines = "\n".join(html.escape(publish_status_line(member)) for member in job.group)
+    topic = html.escape(notify.get('topic', ''))
+    if all(member.status in FINAL_STATUSES for member in job.group):
+        text = (
+            f"✅ <b>Пост обработан!</b>\n\n"
+            f"<b>Тема:</b> {topic}\n"
+            f"<b>Результат:</b>\n{lines}\n"
+            f"<b>Время:</b> {datetime.now().strftime('%H:%M:%S')}"
+        )
+    else:
+        text = f"📤 <b>Публикация поста</b>\n\n<b>Тема:</b> {topic}\n\n{lines}"
+    
+    await bot.edit_message_text(
+        text, chat_id=notify['chat_id'], message_id=notify['message_id'], parse_mode='HTML'
+    )
+
+# Очередь публикаций: подтвержденные посты переживают перезапуск и уходят
+# в канал с учетом лимитов Telegram (RetryAfter выдерживается точно)
+publish_outbox = PublishOutbox(
+    send=telegram_news_bot.send_to_channel,
+    path=os.getenv('PUBLISH_OUTBOX_PATH', 'publish_outbox.db'),
+    on_update=notify_publish,
+    global_rps=float(os.getenv('PUBLISH_GLOBAL_RPS', '30')),
+    chat_rpm=float(os.getenv('PUBLISH_CHAT_RPM', '20')),
+    # Постоянный ID процесса (например, имя хоста) - свои публикации подхватываются сразу после перезапуска
+    owner=os.getenv('PUBLISH_OUTBOX_OWNER') or None
+)
+
+async def generate_scheduled_draft(topic: str):
+    """Сгенерировать черновик для очереди планировщика с низким приоритетом
+    
+    Источники сохраняются в самом черновике: он живет до DRAFT_MAX_AGE,
+    а news_sources - только NEWS_CACHE_TTL.
+    """
+    with priority_scope(PRIORITY_BACKGROUND):
+        raw_news = await telegram_news_bot.research_news(topic, background=True)
+        if raw_news == NO_NEWS_MESSAGE:
+            return None
+        sources = news_sources.get(normalize_topic(topic)) or []
+        content = await generation_pool.run_background(content_formatter.format_news_post, raw_news)
+        return {'content': content, 'sources': sources} if content else None
+
+# Заблаговременная генерация черновиков по темам в тихие часы
+draft_scheduler = DraftScheduler(
+    generate=generate_scheduled_draft,
+    topics=parse_topics(os.getenv('DRAFT_TOPICS', '')),
+    quiet_hours=parse_quiet_hours(os.getenv('DRAFT_QUIET_HOURS', '0-7')),
+    max_age=float(os.getenv('DRAFT_MAX_AGE', '10800')),
+    queue_size=int(os.getenv('DRAFT_QUEUE_SIZE', '2')),
+    min_interval=float(os.getenv('DRAFT_MIN_INTERVAL', '300')),
+    # Не конкурировать с интерактивными запросами
+    is_busy=lambda: generation_pool.active > 0 or generation_pool.queued > 0
+)
+
+def create_approval_keyboard(post_id: str, post_data: dict = None) -> InlineKeyboardMarkup:
     """Создать клавиатуру для подтверждения поста"""
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [
@@ -205,9 +660,19 @@ def create_approval_keyboard(post_id: str) -> InlineKeyboardMarkup:
             )
         ]
     ])
+    
+    # Переход между версиями поста без вызовов модели
+    history = (post_data or {}).get('history')
+    history_row = []
+    if history is not None and history.can_undo:
+        history_row.append(InlineKeyboardButton(text="↩️ Отменить правку", callback_data=f"undo_{post_id}"))
+    if history is not None and history.can_redo:
+        history_row.append(InlineKeyboardButton(text="↪️ Вернуть правку", callback_data=f"redo_{post_id}"))
+    if history_row:
+        keyboard.inline_keyboard.append(history_row)
     return keyboard
 
-def create_quick_edit_keyboard(post_id: str) -> InlineKeyboardMarkup:
+def create_quick_edit_keyboard(post_id: str, post_data: dict = None) -> InlineKeyboardMarkup:
     """Создать клавиатуру для быстрого редактирования"""
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [
@@ -241,6 +706,14 @@ def create_quick_edit_keyboard(post_id: str) -> InlineKeyboardMarkup:
             )
         ]
     ])
+    
+    # Правки применяются к оригиналу, пока не выбрана текущая версия
+    post_data = post_data or {}
+    if post_data.get('history') is not None and post_data['history'].index > 0:
+        base_text = "🧷 Править: текущую версию" if post_data.get('edit_current') else "🧷 Править: оригинал"
+        keyboard.inline_keyboard.append([
+            InlineKeyboardButton(text=base_text, callback_data=f"toggle_base_{post_id}")
+        ])
     return keyboard
 
 def generate_post_id(user_id: int, topic: str) -> str:
@@ -261,6 +734,8 @@ async def start_command(message: Message):
         "**Доступные команды:**\n"
         "📰 /news - Получить последние новости\n"
         "🔍 /news <тема> - Получить новости по теме\n"
+        "📋 /drafts - Взять готовый черновик из очереди\n"
+        "🗂 /mydrafts - Мои посты, ожидающие подтверждения\n"
         "⚙️ /status - Проверить статус бота\n"
         "ℹ️ /help - Показать справку",
         parse_mode='Markdown'
@@ -274,6 +749,8 @@ async def help_command(message: Message):
         "🔹 `/start` - Начать работу с ботом\n"
         "🔹 `/news` - Получить последние новости\n"
         "🔹 `/news технологии` - Новости по теме 'технологии'\n"
+        "🔹 `/drafts` - Готовый черновик из очереди (`/drafts тема` - по теме)\n"
+        "🔹 `/mydrafts` - Мои посты, ожидающие подтверждения\n"
         "🔹 `/status` - Проверить работу бота\n\n"
         "💡 **Как работает публикация:**\n"
         "1️⃣ Запросите новости командой `/news`\n"
@@ -296,18 +773,55 @@ async def help_command(message: Message):
         parse_mode='Markdown'
     )
 
+def channel_status_line(target: ChannelTarget) -> str:
+    """Строка /status о канале публикации по сведениям из кэша, без запросов к Telegram"""
+    info = channel_info.peek(target.chat_id)
+    if info is None:
+        state = "❓ нет сведений"
+    elif info.is_admin:
+        state = "✅ бот - администратор"
+    elif info.is_admin is False:
+        state = "❌ нет прав на публикацию"
+    else:
+        state = "⚠️ права не проверены"
+    # Обратные кавычки: '_' и '*' в @username и названии не ломают Markdown
+    title = f" ({info.title})" if info is not None and info.title else ""
+    limit = f", лимит {target.max_length} символов" if target.max_length else ""
+    return f"  • `{str(target.chat_id).replace('`', '')}{title.replace('`', '')}`: {state}{limit}"
+
 @dp.message(Command("status"))
 async def status_command(message: Message):
     """Обработчик команды /status"""
     try:
-        channel_status = "✅ Настроен" if telegram_news_bot.channel_id else "⚠️ Не настроен"
+        channel_lines = "\n".join(map(channel_status_line, telegram_news_bot.channels)) or "  ⚠️ Не настроены"
+        limits = rate_limiter.metrics()
+        queue_depth = ", ".join(f"{name} {count}" for name, count in limits['queue_depth'].items())
+        avg_wait = ", ".join(f"{name} {wait:.1f}с" for name, wait in limits['avg_wait'].items())
+        store_stats = post_store.stats()
+        outbox = publish_outbox.stats()
+        memory_line = (
+            f"💾 Память черновиков: {store_stats['bytes'] / 1024:.0f} КБ, "
+            f"~{store_stats['bytes_per_post'] / 1024:.1f} КБ на пост "
+            f"(вытеснено {store_stats['evicted']}, истекло {store_stats['expired']})\n"
+            if store_stats else ""
+        )
         
         await message.answer(
             f"🔧 **Статус бота:**\n\n"
             f"🤖 Агенты: ✅ Работают\n"
-            f"✏️ ИИ-редактор: ✅ Активен\n"
-            f"📺 Канал: {channel_status}\n"
-            f"📊 Активных постов: {len(pending_posts)}\n"
+            f"✏️ ИИ-редактор: ✅ Активен (режим {post_editor.edit_mode}, "
+            f"сэкономлено ~{post_editor.saved_tokens_total} токенов вывода)\n"
+            f"📺 Каналы:\n{channel_lines}\n"
+            f"📊 Активных постов: {await post_store.count()}\n"
+            f"{memory_line}"
+            f"📤 Публикации: в очереди {outbox['queued'] + outbox['sending']}, "
+            f"опубликовано {outbox['published']}, ошибок {outbox['failed']}, повторов {outbox['retries']}\n"
+            f"⚙️ Генераций: {generation_pool.active}/{generation_pool.max_workers} "
+            f"(в очереди: {generation_pool.queued})\n"
+            f"🚦 Очередь OpenAI: {queue_depth}; среднее ожидание: {avg_wait}\n"
+            f"🗂 Кэш новостей: {len(news_cache)} тем, попаданий {news_cache.hits}, "
+            f"промахов {news_cache.misses}, объединено запросов {research_flight.shared}\n"
+            f"📋 Готовых черновиков: {sum(draft_scheduler.ready_counts().values())}\n"
             f"⏰ Время: {datetime.now().strftime('%H:%M:%S')}\n"
             f"📅 Дата: {datetime.now().strftime('%d.%m.%Y')}",
             parse_mode='Markdown'
@@ -328,7 +842,17 @@ async def news_command(message: Message, state: FSMContext):
         loading_message = await message.answer("🔄 Генерирую новостной пост, подождите...")
         
         # Сгенерировать пост
-        post_content = await telegram_news_bot.generate_news_post(topic)
+        try:
+            post_content, *variants = await telegram_news_bot.generate_news_variants(
+                topic,
+                message.from_user.id,
+                preview=create_streaming_preview(loading_message, "🔎 Собираю новости...")
+            )
+        except GenerationLimitError:
+            await loading_message.edit_text(
+                "⏳ Предыдущий пост еще генерируется. Дождитесь его и попробуйте снова."
+            )
+            return
         
         # Удалить сообщение о загрузке
         await loading_message.delete()
@@ -337,16 +861,21 @@ async def news_command(message: Message, state: FSMContext):
         post_id = generate_post_id(message.from_user.id, topic)
         
         # Сохранить пост в хранилище
-        pending_posts[post_id] = {
+        post_data = {
             'content': post_content,
             'original_content': post_content,  # Сохраняем оригинал для редактирования
+            'history': create_history(post_content),
             'topic': topic,
+            'sources': news_sources.get(normalize_topic(topic)) or [],
+            'variants': variants,  # Остальные варианты для кнопки "Другой вариант"
             'user_id': message.from_user.id,
             'created_at': datetime.now()
         }
+        await post_store.put(post_id, post_data)
         
         # Отправить пост с кнопками подтверждения
         await message.answer(
+            f"{duplicate_warning(post_content)}"
             f"📰 **Предварительный просмотр поста:**\n"
             f"🏷️ **Тема:** {topic}\n\n"
             f"---\n\n{post_content}\n\n---\n\n"
@@ -354,6 +883,7 @@ async def news_command(message: Message, state: FSMContext):
             reply_markup=create_approval_keyboard(post_id),
             parse_mode='Markdown'
         )
+        schedule_speculative_variant(post_id, post_data)
         
         # Установить состояние ожидания подтверждения
         await state.set_state(NewsStates.waiting_for_approval)
@@ -363,12 +893,86 @@ async def news_command(message: Message, state: FSMContext):
         logger.error(f"Ошибка в команде /news: {e}")
         await message.answer(f"❌ Произошла ошибка: {str(e)}")
 
+@dp.message(Command("drafts"))
+async def drafts_command(message: Message, state: FSMContext):
+    """Обработчик команды /drafts - выдать заранее сгенерированный черновик"""
+    topic = message.text.replace("/drafts", "").strip() or None
+    
+    taken = draft_scheduler.take(topic)
+    if taken is None:
+        ready = draft_scheduler.ready_counts()
+        if not ready:
+            await message.answer("📋 Очередь черновиков не настроена (DRAFT_TOPICS).")
+            return
+        
+        counts = "\n".join(f"• {name}: {count}" for name, count in ready.items())
+        await message.answer(
+            f"📋 Готовых черновиков{' по этой теме' if topic else ''} нет.\n\n"
+            f"Очередь по темам:\n{counts}\n\n"
+            f"Используйте /news для генерации нового поста."
+        )
+        return
+    
+    topic, draft = taken
+    post_content = draft['content']
+    post_id = generate_post_id(message.from_user.id, topic)
+    post_data = {
+        'content': post_content,
+        'original_content': post_content,
+        'history': create_history(post_content),
+        'topic': topic,
+        'sources': draft['sources'],
+        'user_id': message.from_user.id,
+        'created_at': datetime.now()
+    }
+    await post_store.put(post_id, post_data)
+    
+    await message.answer(
+        f"{duplicate_warning(post_content)}"
+        f"📰 **Готовый черновик:**\n"
+        f"🏷️ **Тема:** {topic}\n\n"
+        f"---\n\n{post_content}\n\n---\n\n"
+        f"❓ **Что делаем с этим постом?**",
+        reply_markup=create_approval_keyboard(post_id),
+        parse_mode='Markdown'
+    )
+    schedule_speculative_variant(post_id, post_data)
+    
+    await state.set_state(NewsStates.waiting_for_approval)
+    await state.update_data(post_id=post_id)
+
+@dp.message(Command("mydrafts"))
+async def my_drafts_command(message: Message):
+    """Обработчик команды /mydrafts - посты пользователя, ожидающие подтверждения"""
+    posts = await post_store.user_posts(message.from_user.id, limit=MY_DRAFTS_LIMIT)
+    if not posts:
+        await message.answer(
+            "🗂 У вас нет постов, ожидающих подтверждения.\n\n"
+            "Используйте /news для генерации нового поста."
+        )
+        return
+    
+    # Кнопка открывает превью поста с обычными кнопками подтверждения и правки
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(
+            text=f"📰 {post_data['topic'][:40]} · {post_data['created_at'].strftime('%H:%M')}",
+            callback_data=f"back_to_post_{post_id}"
+        )]
+        for post_id, post_data in posts
+    ])
+    await message.answer(
+        f"🗂 **Ваши посты, ожидающие подтверждения ({len(posts)}):**\n\n"
+        f"Выберите пост, чтобы продолжить работу с ним.",
+        reply_markup=keyboard,
+        parse_mode='Markdown'
+    )
+
 @dp.callback_query(F.data.startswith("edit_"))
 async def edit_post(callback: CallbackQuery, state: FSMContext):
     """Обработчик редактирования поста"""
     post_id = callback.data.split("_", 1)[1]
     
-    post_data = get_post_safely(post_id, callback.from_user.id)
+    post_data = await get_post_safely(post_id, callback.from_user.id)
     if not post_data:
         await callback.answer("❌ Пост не найден или уже обработан", show_alert=True)
         return
@@ -383,10 +987,14 @@ async def edit_post(callback: CallbackQuery, state: FSMContext):
         f"🔥 **Более привлекательно** - улучшить подачу\n"
         f"📊 **Добавить эмодзи** - сделать ярче\n\n"
         f"Или выберите 'Свои инструкции' для пользовательского редактирования:",
-        reply_markup=create_quick_edit_keyboard(post_id),
+        reply_markup=create_quick_edit_keyboard(post_id, post_data),
         parse_mode='Markdown'
     )
     
+    # Пока пользователь выбирает, все быстрые правки выполняются параллельно
+    if QUICK_EDIT_PREFETCH:
+        quick_edits.prefetch(post_id, edit_base(post_data), QUICK_EDIT_INSTRUCTIONS)
+    
     await callback.answer("✏️ Выберите тип редактирования")
 
 @dp.callback_query(F.data.startswith("quick_edit_"))
@@ -396,20 +1004,12 @@ async def quick_edit_post(callback: CallbackQuery, state: FSMContext):
     post_id = parts[2]
     edit_type = parts[3]
     
-    post_data = get_post_safely(post_id, callback.from_user.id)
+    post_data = await get_post_safely(post_id, callback.from_user.id)
     if not post_data:
         await callback.answer("❌ Пост не найден или уже обработан", show_alert=True)
         return
     
-    # Определить инструкции по типу редактирования
-    edit_instructions = {
-        "shorter": "Сделай пост короче, убери лишние детали, оставь только самое важное",
-        "details": "Добавь больше деталей и подробностей, расширь информацию",
-        "engaging": "Сделай пост более привлекательным и интересным, улучши заголовок",
-        "emoji": "Добавь больше подходящих эмодзи для лучшего визуального восприятия"
-    }
-    
-    instruction = edit_instructions.get(edit_type, "Улучши пост")
+    instruction = QUICK_EDIT_INSTRUCTIONS.get(edit_type, "Улучши пост")
     
     # Показать индикатор загрузки
     await callback.message.edit_text(
@@ -418,14 +1018,20 @@ async def quick_edit_post(callback: CallbackQuery, state: FSMContext):
     )
     
     try:
-        # Применить редактирование
-        edited_content = await telegram_news_bot.edit_post_with_ai(
-            post_data['original_content'], 
-            instruction
-        )
+        # Взять готовую заготовку; незавершенная фоновая отменяется, и правка
+        # выполняется сейчас с интерактивным приоритетом
+        edited_content = await quick_edits.take(edit_base(post_data), edit_type)
+        if edited_content is None:
+            edited_content = await telegram_news_bot.edit_post_with_ai(
+                edit_base(post_data), 
+                instruction,
+                preview=create_streaming_preview(
+                    callback.message, f"🔄 Применяю изменения: {instruction.lower()}..."
+                )
+            )
         
         # Обновить данные поста
-        pending_posts[post_id]['content'] = edited_content
+        await save_edit(post_id, post_data, edited_content)
         
         # Отправить отредактированный пост
         await callback.message.edit_text(
@@ -435,7 +1041,7 @@ async def quick_edit_post(callback: CallbackQuery, state: FSMContext):
             f"🏷️ **Тема:** {post_data['topic']}\n\n"
             f"---\n\n{edited_content}\n\n---\n\n"
             f"❓ **Что делаем с этим постом?**",
-            reply_markup=create_approval_keyboard(post_id),
+            reply_markup=create_approval_keyboard(post_id, post_data),
             parse_mode='Markdown'
         )
         
@@ -447,7 +1053,7 @@ async def quick_edit_post(callback: CallbackQuery, state: FSMContext):
             f"❌ Не удалось применить изменения.\n\n"
             f"**Тема:** {post_data['topic']}\n\n"
             f"Попробуйте другой тип редактирования:",
-            reply_markup=create_quick_edit_keyboard(post_id),
+            reply_markup=create_quick_edit_keyboard(post_id, post_data),
             parse_mode='Markdown'
         )
         await callback.answer("❌ Ошибка редактирования")
@@ -457,7 +1063,7 @@ async def back_to_post(callback: CallbackQuery, state: FSMContext):
     """Вернуться к просмотру поста"""
     post_id = callback.data.split("_", 3)[3]
     
-    post_data = get_post_safely(post_id, callback.from_user.id)
+    post_data = await get_post_safely(post_id, callback.from_user.id)
     if not post_data:
         await callback.answer("❌ Пост не найден или уже обработан", show_alert=True)
         return
@@ -468,18 +1074,67 @@ async def back_to_post(callback: CallbackQuery, state: FSMContext):
         f"🏷️ **Тема:** {post_data['topic']}\n\n"
         f"---\n\n{post_data['content']}\n\n---\n\n"
         f"❓ **Что делаем с этим постом?**",
-        reply_markup=create_approval_keyboard(post_id),
+        reply_markup=create_approval_keyboard(post_id, post_data),
         parse_mode='Markdown'
     )
     
     await callback.answer("⬅️ Возврат к посту")
 
+@dp.callback_query(F.data.startswith("undo_") | F.data.startswith("redo_"))
+async def move_post_version(callback: CallbackQuery, state: FSMContext):
+    """Отменить или вернуть правку: версии восстанавливаются локально, без вызова модели"""
+    action, post_id = callback.data.split("_", 1)
+    
+    post_data = await get_post_safely(post_id, callback.from_user.id)
+    if not post_data:
+        await callback.answer("❌ Пост не найден или уже обработан", show_alert=True)
+        return
+    
+    history = post_data['history']
+    post_data['content'] = history.undo() if action == "undo" else history.redo()
+    await post_store.update(post_id, content=post_data['content'], history=history)
+    
+    await callback.message.edit_text(
+        f"📰 **Предварительный просмотр поста:**\n"
+        f"🏷️ **Тема:** {post_data['topic']}\n"
+        f"🕘 **Версия:** {history.index + 1} из {len(history)}\n\n"
+        f"---\n\n{post_data['content']}\n\n---\n\n"
+        f"❓ **Что делаем с этим постом?**",
+        reply_markup=create_approval_keyboard(post_id, post_data),
+        parse_mode='Markdown'
+    )
+    
+    await callback.answer("↩️ Правка отменена" if action == "undo" else "↪️ Правка возвращена")
+
+@dp.callback_query(F.data.startswith("toggle_base_"))
+async def toggle_edit_base(callback: CallbackQuery, state: FSMContext):
+    """Переключить, к чему применяются правки: к оригиналу или к текущей версии"""
+    post_id = callback.data.split("_", 2)[2]
+    
+    post_data = await get_post_safely(post_id, callback.from_user.id)
+    if not post_data:
+        await callback.answer("❌ Пост не найден или уже обработан", show_alert=True)
+        return
+    
+    post_data['edit_current'] = not post_data.get('edit_current')
+    await post_store.update(post_id, edit_current=post_data['edit_current'])
+    
+    # Быстрые правки зависят от исходного текста - готовим их для нового
+    if QUICK_EDIT_PREFETCH:
+        quick_edits.prefetch(post_id, edit_base(post_data), QUICK_EDIT_INSTRUCTIONS)
+    
+    await callback.message.edit_reply_markup(reply_markup=create_quick_edit_keyboard(post_id, post_data))
+    await callback.answer(
+        "🧷 Правки применяются к текущей версии" if post_data['edit_current']
+        else "🧷 Правки применяются к оригиналу"
+    )
+
 @dp.callback_query(F.data.startswith("custom_edit_"))
 async def custom_edit_post(callback: CallbackQuery, state: FSMContext):
     """Обработчик пользовательского редактирования"""
     post_id = callback.data.split("_", 2)[2]
     
-    post_data = get_post_safely(post_id, callback.from_user.id)
+    post_data = await get_post_safely(post_id, callback.from_user.id)
     if not post_data:
         await callback.answer("❌ Пост не найден или уже обработан", show_alert=True)
         return
@@ -513,12 +1168,12 @@ async def handle_edit_instruction(message: Message, state: FSMContext):
         post_id = state_data.get('post_id')
         message_id = state_data.get('message_id')
         
-        if not post_id or post_id not in pending_posts:
+        post_data = await post_store.get(post_id) if post_id else None
+        if post_data is None:
             await message.answer("❌ Ошибка: пост не найден")
             await state.clear()
             return
         
-        post_data = pending_posts[post_id]
         edit_instructions = message.text
         
         # Показать индикатор загрузки
@@ -527,12 +1182,13 @@ async def handle_edit_instruction(message: Message, state: FSMContext):
         try:
             # Применить редактирование с помощью ИИ
             edited_content = await telegram_news_bot.edit_post_with_ai(
-                post_data['original_content'], 
-                edit_instructions
+                edit_base(post_data), 
+                edit_instructions,
+                preview=create_streaming_preview(loading_message, "🔄 Применяю ваши изменения...")
             )
             
             # Обновить данные поста
-            pending_posts[post_id]['content'] = edited_content
+            await save_edit(post_id, post_data, edited_content)
             
             # Удалить сообщение о загрузке
             await loading_message.delete()
@@ -545,7 +1201,7 @@ async def handle_edit_instruction(message: Message, state: FSMContext):
                 f"🏷️ **Тема:** {post_data['topic']}\n\n"
                 f"---\n\n{edited_content}\n\n---\n\n"
                 f"❓ **Что делаем с этим постом?**",
-                reply_markup=create_approval_keyboard(post_id),
+                reply_markup=create_approval_keyboard(post_id, post_data),
                 parse_mode='Markdown'
             )
             
@@ -572,48 +1228,65 @@ async def approve_post(callback: CallbackQuery, state: FSMContext):
     """Обработчик подтверждения поста"""
     post_id = callback.data.split("_", 1)[1]
     
-    post_data = get_post_safely(post_id, callback.from_user.id)
+    post_data = await get_post_safely(post_id, callback.from_user.id)
     if not post_data:
         await callback.answer("❌ Пост не найден или уже обработан", show_alert=True)
         return
     
-    # Показать индикатор загрузки
-    await callback.message.edit_text(
-        f"📤 Публикую пост в канале...\n\n"
-        f"**Тема:** {post_data['topic']}",
-        parse_mode='Markdown'
-    )
-    
-    # Опубликовать в канале
-    result = await telegram_news_bot.publish_to_channel(post_data['content'])
+    if not telegram_news_bot.channels:
+        logger.error("Канал не настроен - отсутствует TELEGRAM_CHANNEL_ID и TELEGRAM_CHANNEL_USERNAME")
+        await callback.answer("⚠️ Канал не настроен в переменных окружения", show_alert=True)
+        return
     
-    # Обновить сообщение с результатом
-    await callback.message.edit_text(
-        f"✅ **Пост обработан!**\n\n"
-        f"**Тема:** {post_data['topic']}\n"
-        f"**Результат:** {result}\n"
-        f"**Время:** {datetime.now().strftime('%H:%M:%S')}",
-        parse_mode='Markdown'
-    )
+    # Забрать пост атомарно: при повторном нажатии или нескольких процессах бота
+    # публикует только тот, кто забрал пост первым
+    post_data = await post_store.take(post_id)
+    if post_data is None:
+        await callback.answer("❌ Пост уже обработан", show_alert=True)
+        return
     
-    # Удалить пост из хранилища
-    del pending_posts[post_id]
+    # Поставить в очередь публикаций во все каналы сразу: каналы отправляются
+    # параллельно, статус по каждому в сообщении обновляет сама очередь
+    try:
+        await publish_outbox.enqueue_many(
+            [(target.chat_id, target.format(post_data['content'])) for target in telegram_news_bot.channels],
+            post_data.get('sources'),
+            notify={
+                'chat_id': callback.message.chat.id,
+                'message_id': callback.message.message_id,
+                'topic': post_data['topic'],
+            }
+        )
+    except Exception as e:
+        # Пост не попал в очередь - вернуть его, чтобы подтверждение можно было повторить
+        logger.error(f"Не удалось поставить пост {post_id} в очередь публикаций: {e}")
+        await post_store.put(post_id, post_data)
+        await callback.answer("❌ Не удалось поставить пост в очередь, попробуйте еще раз", show_alert=True)
+        return
+    release_post(post_id)
     
     # Очистить состояние
     await state.clear()
     
-    await callback.answer("✅ Пост опубликован!")
+    await callback.answer("📤 Пост поставлен в очередь на публикацию")
 
 @dp.callback_query(F.data.startswith("regenerate_"))
 async def regenerate_post(callback: CallbackQuery, state: FSMContext):
     """Обработчик перегенерации поста"""
     post_id = callback.data.split("_", 1)[1]
     
-    post_data = get_post_safely(post_id, callback.from_user.id)
+    post_data = await get_post_safely(post_id, callback.from_user.id)
     if not post_data:
         await callback.answer("❌ Пост не найден или уже обработан", show_alert=True)
         return
     
+    variants = list(post_data.get('variants') or [])
+    has_speculative_variant = bool(variants) or 'alternative' in post_data or post_id in speculative_tasks
+    if (not has_speculative_variant
+            and generation_pool.user_inflight(callback.from_user.id) >= generation_pool.per_user_limit):
+        await callback.answer("⏳ Дождитесь завершения текущей генерации", show_alert=True)
+        return
+    
     # Показать индикатор загрузки
     await callback.message.edit_text(
         f"🔄 Генерирую новый вариант поста...\n\n"
@@ -621,26 +1294,47 @@ async def regenerate_post(callback: CallbackQuery, state: FSMContext):
         parse_mode='Markdown'
     )
     
-    # Сгенерировать новый пост
-    new_content = await telegram_news_bot.generate_news_post(post_data['topic'])
+    # Взять запасной или заранее сгенерированный вариант, иначе сгенерировать новые
+    new_content = variants.pop(0) if variants else await take_speculative_variant(post_id)
+    if new_content is None:
+        try:
+            new_content, *variants = await telegram_news_bot.generate_news_variants(
+                post_data['topic'], callback.from_user.id
+            )
+        except GenerationLimitError:
+            await callback.message.edit_text(
+                f"📰 **Предварительный просмотр поста:**\n"
+                f"🏷️ **Тема:** {post_data['topic']}\n\n"
+                f"---\n\n{post_data['content']}\n\n---\n\n"
+                f"❓ **Что делаем с этим постом?**",
+                reply_markup=create_approval_keyboard(post_id, post_data),
+                parse_mode='Markdown'
+            )
+            await callback.answer("⏳ Дождитесь завершения текущей генерации", show_alert=True)
+            return
     
     # Создать новый ID для поста
     new_post_id = generate_post_id(callback.from_user.id, post_data['topic'])
     
     # Обновить данные поста
-    pending_posts[new_post_id] = {
+    new_post_data = {
         'content': new_content,
         'original_content': new_content,  # Новый оригинал
+        'history': create_history(new_content),
         'topic': post_data['topic'],
+        'sources': post_data.get('sources', []),
+        'variants': variants,
         'user_id': callback.from_user.id,
         'created_at': datetime.now()
     }
+    await post_store.put(new_post_id, new_post_data)
     
-    # Удалить старый пост
-    del pending_posts[post_id]
+    # Удалить старый пост (мог быть отменен, пока шла генерация)
+    await discard_post(post_id)
     
     # Отправить новый пост
     await callback.message.edit_text(
+        f"{duplicate_warning(new_content)}"
         f"📰 **Новый вариант поста:**\n"
         f"🏷️ **Тема:** {post_data['topic']}\n\n"
         f"---\n\n{new_content}\n\n---\n\n"
@@ -648,6 +1342,7 @@ async def regenerate_post(callback: CallbackQuery, state: FSMContext):
         reply_markup=create_approval_keyboard(new_post_id),
         parse_mode='Markdown'
     )
+    schedule_speculative_variant(new_post_id, new_post_data)
     
     await callback.answer("🔄 Новый вариант сгенерирован!")
 
@@ -656,13 +1351,13 @@ async def cancel_post(callback: CallbackQuery, state: FSMContext):
     """Обработчик отмены поста"""
     post_id = callback.data.split("_", 1)[1]
     
-    post_data = get_post_safely(post_id, callback.from_user.id)
+    post_data = await get_post_safely(post_id, callback.from_user.id)
     if not post_data:
         await callback.answer("❌ Пост не найден или уже обработан", show_alert=True)
         return
     
     # Удалить пост из хранилища
-    del pending_posts[post_id]
+    await discard_post(post_id)
     
     # Обновить сообщение
     await callback.message.edit_text(
@@ -693,24 +1388,33 @@ async def handle_text(message: Message, state: FSMContext):
     )
 
 async def cleanup_old_posts():
-    """Очистка старых постов (запускается периодически)"""
-    current_time = datetime.now()
-    posts_to_remove = []
-    
-    for post_id, post_data in pending_posts.items():
-        # Удалить посты старше 1 часа
-        if (current_time - post_data['created_at']).total_seconds() > 3600:
-            posts_to_remove.append(post_id)
-    
-    for post_id in posts_to_remove:
-        del pending_posts[post_id]
+    """Очистка старых постов (запускается к сроку ближайшего поста)"""
+    for post_id in await post_store.expire(PENDING_POST_TTL):
+        release_post(post_id)
         logger.info(f"Удален старый пост: {post_id}")
+    
+    expired_topics = news_cache.purge_expired()
+    if expired_topics:
+        logger.info(f"Удалено устаревших тем из кэша новостей: {expired_topics}")
 
 async def periodic_cleanup():
-    """Периодическая очистка старых постов"""
+    """Очистка старых постов: просыпается к сроку самого старого поста, а не по расписанию"""
+    failures = 0
     while True:
-        await asyncio.sleep(1800)  # Каждые 30 минут
-        await cleanup_old_posts()
+        try:
+            # Пустое хранилище проверяется раз в срок жизни - новый пост раньше не истечет
+            deadline = await post_store.next_expiry(PENDING_POST_TTL)
+            delay = PENDING_POST_TTL if deadline is None else deadline - datetime.now().timestamp()
+            # Не чаще раза в секунду: посты, созданные почти одновременно, удаляются вместе
+            await asyncio.sleep(min(max(1.0, delay), PENDING_POST_TTL))
+            await cleanup_old_posts()
+            failures = 0
+        except Exception as e:
+            # Ошибка хранилища не должна останавливать очистку: пауза растет до минуты
+            failures += 1
+            backoff = min(60.0, 2.0 ** failures)
+            logger.error(f"Ошибка очистки старых постов, повтор через {backoff:.0f} с: {e}")
+            await asyncio.sleep(backoff)
 
 async def main():
     """Основная функция запуска бота"""
@@ -721,15 +1425,33 @@ async def main():
         bot_info = await bot.get_me()
         logger.info(f"✅ Бот подключен: @{bot_info.username}")
         
+        # Прогреть сведения о каналах, чтобы публикация не проверяла их заново
+        if telegram_news_bot.channels:
+            await channel_info.warm([target.chat_id for target in telegram_news_bot.channels], bot_info)
+            asyncio.create_task(channel_info.run())
+        
+        # Отправить публикации, оставшиеся в очереди после перезапуска
+        await publish_outbox.start()
+        
         # Запустить задачу очистки в фоне
         asyncio.create_task(periodic_cleanup())
         
+        # Запустить планировщик черновиков, если заданы темы
+        if draft_scheduler.topics:
+            asyncio.create_task(draft_scheduler.run())
+            logger.info(f"📋 Планировщик черновиков запущен для тем: {draft_scheduler.topics}")
+        
         # Запустить polling
         await dp.start_polling(bot)
         
     except Exception as e:
         logger.error(f"❌ Ошибка запуска бота: {e}")
     finally:
+        generation_pool.shutdown()
+        await post_editor.close()
+        await publish_outbox.close()
+        await post_store.close()
+        await storage.close()
         await bot.session.close()
 
 if __name__ == "__main__":
@@ -0,0 +1,340 @@
+"""
+Однопроходная очистка HTML для Telegram с точным подсчетом длины
+
+Telegram считает длину сообщения по видимому тексту (без тегов, сущность -
+один символ) в единицах UTF-16. Обрезка выполняется по границам предложений,
+абзацев или тегов, а открытые теги закрываются, поэтому результат всегда
+проходит разбор parse_mode='HTML'.
+"""
+
+import html
+import re
+from typing import List, Optional, Sequence, Tuple
+
+# Теги, которые поддерживает parse_mode='HTML' в Telegram
+ALLOWED_TAGS = frozenset({
+    'b', 'strong', 'i', 'em', 'u', 'ins', 's', 'strike', 'del',
+    'a', 'code', 'pre', 'span', 'tg-spoiler', 'blockquote',
+})
+
+# Внутри этих тегов markdown-символы, ссылки и пробелы - часть содержимого
+_VERBATIM_TAGS = frozenset({'code', 'pre'})
+
+# Теги без атрибутов собираются заранее
+_SIMPLE_TAGS = {name: f'<{name}>' for name in ALLOWED_TAGS - {'a', 'span', 'code'}}
+
+# Разметка - теги и HTML-сущности; re.split отдает текст между ними без объектов Match,
+# а ссылки и markdown убираются внутри текста встроенными методами строк
+_MARKUP = re.compile(r'(</?[a-zA-Z][^<>]*>|&(?:#\d{1,7}|#x[0-9a-fA-F]{1,6}|[a-zA-Z]{2,8});)')
+
+# Именованные сущности, которые принимает Telegram; остальные заменяются символом
+_TELEGRAM_ENTITIES = frozenset({'&lt;', '&gt;', '&amp;', '&quot;'})
+
+_URL = re.compile(r'(?:https?://|www\.)[^\s<>"]*[^\s<>".,;:!?)\]»]')
+# str.translate на кириллице медленнее нескольких replace
+_MARKDOWN_CHARS = ('*', '_', '`', '#')
+
+_HREF = re.compile(r'''href\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))''', re.IGNORECASE)
+_SPOILER_CLASS = re.compile(r'''class\s*=\s*["']?tg-spoiler''', re.IGNORECASE)
+_CODE_LANGUAGE = re.compile(r'''class\s*=\s*["']?(language-[\w+-]+)''', re.IGNORECASE)
+
+_SENTENCE_BOUNDARY = re.compile(r'[.!?…]+["»)\]]*(?= |\n|$)|(?=\n)')
+_WORD_BOUNDARY = re.compile(r'(?=[ \n])')
+
+ELLIPSIS = '…'
+
+# Разделители по уровню: нет, пробел, перенос строки, абзац
+_SEPARATORS = ('', ' ', '\n', '\n\n')
+
+# Фрагмент вывода: (HTML, видимый текст или имя тега, вид: 'text', 'atom', 'open', 'close')
+_Piece = Tuple[str, str, str]
+
+
+def utf16_length(text: str) -> int:
+    """Длина строки в единицах UTF-16 (символы вне BMP занимают две единицы)"""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def visible_length(content: str) -> int:
+    """Длина видимого текста HTML-сообщения так, как ее считает Telegram"""
+    visible = _MARKUP.sub(
+        lambda match: '' if match.group(0).startswith('<') else html.unescape(match.group(0)),
+        content
+    )
+    return utf16_length(visible)
+
+
+def _open_tag(name: str, attrs: str) -> Optional[str]:
+    """Собрать разрешенный открывающий тег или None, если тег нужно отбросить"""
+    if name == 'a':
+        href = _HREF.search(attrs)
+        if not href:
+            return None
+        url = next(group for group in href.groups() if group is not None)
+        return f'<a href="{html.escape(html.unescape(url), quote=True)}">'
+    if name == 'span':
+        return '<span class="tg-spoiler">' if _SPOILER_CLASS.search(attrs) else None
+    if name == 'code':
+        language = _CODE_LANGUAGE.search(attrs)
+        return f'<code class="{language.group(1)}">' if language else '<code>'
+    return f'<{name}>'
+
+
+def _merge_spacing(level: int, whitespace: str) -> int:
+    """Добавить пробельный фрагмент к отложенному разделителю (не больше одного абзаца)"""
+    newlines = whitespace.count('\n')
+    if newlines:
+        return min(max(level, 1) + newlines, 3)
+    return max(level, 1)
+
+
+def _collapse_spaces(text: str) -> str:
+    """Сжать пробелы внутри текста, сохранив переносы строк и абзацы"""
+    lines: List[str] = []
+    blank = False
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line:
+            blank = True
+            continue
+        # split() создает объект на каждое слово - вызываем только при лишних пробелах
+        if '  ' in line or '\t' in line or '\r' in line:
+            line = ' '.join(line.split())
+        if lines:
+            lines.append('\n\n' if blank else '\n')
+        lines.append(line)
+        blank = False
+    return ''.join(lines)
+
+
+def sanitize_html(content: str, max_length: int = 1000) -> str:
+    """
+    Очистить ответ модели для отправки с parse_mode='HTML'
+
+    За один проход: оставляет только теги Telegram и балансирует их,
+    заменяет <br> переносом строки, убирает markdown-символы и ссылки
+    из текста (кроме <code>/<pre>), экранирует лишние '<', '>' и '&',
+    сжимает пробелы с сохранением абзацев и обрезает текст до max_length
+    видимых единиц UTF-16.
+
+    Args:
+        content: Исходный текст (HTML от модели)
+        max_length: Максимальная видимая длина в единицах UTF-16
+
+    Returns:
+        HTML, который Telegram примет без ошибок разбора
+    """
+    pieces: List[_Piece] = []
+    stack: List[str] = []
+    # Открывающие теги выводятся вместе с первым видимым текстом внутри них:
+    # пустые теги отбрасываются, а разделитель остается снаружи тега
+    deferred: List[_Piece] = []
+    length = 0
+    # Видимый текст не длиннее исходного (каждый видимый символ берется хотя бы из одного
+    # исходного), поэтому для коротких текстов длину по ходу можно не считать
+    measure = utf16_length(content) > max_length
+    # Разделитель выводится только перед следующим видимым текстом (индекс в _SEPARATORS)
+    pending = 0
+    # Число открытых <code>/<pre>: внутри них текст выводится как есть
+    verbatim = 0
+
+    # Нечетные элементы split - разметка, четные - текст между ней
+    is_markup = True
+    for value in _MARKUP.split(content):
+        is_markup = not is_markup
+        if not value:
+            continue
+        trailing = 0
+
+        if not is_markup:
+            kind = 'text'
+            if verbatim:
+                text = value
+            else:
+                # Односимвольные проверки in почти бесплатны, поэтому replace и регулярное
+                # выражение запускаются только когда в тексте есть что убирать
+                text = value
+                for char in _MARKDOWN_CHARS:
+                    if char in text:
+                        text = text.replace(char, '')
+                if (':' in text and '://' in text) or ('w' in text and 'www.' in text):
+                    text = _URL.sub('', text)
+                stripped = text.strip()
+                if not stripped:
+                    if pieces:
+                        pending = _merge_spacing(pending, text)
+                    continue
+                if not pieces:
+                    pending = 0
+                elif text[0].isspace():
+                    pending = _merge_spacing(pending, text[:len(text) - len(text.lstrip())])
+                if text[-1].isspace():
+                    trailing = _merge_spacing(0, text[len(text.rstrip()):])
+                if '  ' in stripped or '\t' in stripped or '\r' in stripped:
+                    text = _collapse_spaces(stripped) if '\n' in stripped else ' '.join(stripped.split())
+                elif '\n' in stripped and (' \n' in stripped or '\n ' in stripped or '\n\n\n' in stripped):
+                    text = _collapse_spaces(stripped)
+                else:
+                    text = stripped
+            visible = text
+            piece = html.escape(text, quote=False) if '&' in text or '<' in text or '>' in text else text
+
+        elif value[0] == '<':
+            close = value[1] == '/'
+            name, _, attrs = value[2 if close else 1:-1].partition(' ')
+            name = name.rstrip('/').lower()
+            if name == 'br':
+                if pieces:
+                    pending = _merge_spacing(pending, '\n')
+                continue
+            if name not in ALLOWED_TAGS:
+                continue
+            if close:
+                if name not in stack:
+                    continue
+                # Закрываем и вложенные теги, оставшиеся открытыми
+                while True:
+                    opened = stack.pop()
+                    if opened in _VERBATIM_TAGS:
+                        verbatim -= 1
+                    if deferred:
+                        deferred.pop()
+                    else:
+                        pieces.append((f'</{opened}>', opened, 'close'))
+                    if opened == name:
+                        break
+                continue
+            tag = _SIMPLE_TAGS.get(name) or _open_tag(name, attrs)
+            if tag is None:
+                continue
+            if name in _VERBATIM_TAGS:
+                verbatim += 1
+            deferred.append((tag, name, 'open'))
+            stack.append(name)
+            continue
+
+        else:
+            # HTML-сущность - неделимый видимый символ
+            visible, kind = html.unescape(value), 'atom'
+            if value[1] == '#' or value in _TELEGRAM_ENTITIES:
+                piece = value
+            else:
+                # &mdash;, &nbsp; и т.п. Telegram отклоняет - выводится сам символ
+                piece = html.escape(visible, quote=False)
+
+        if pending:
+            separator = _SEPARATORS[pending]
+            if deferred or kind == 'atom':
+                pieces.append((separator, separator, 'text'))
+                length += len(separator)
+                if measure and length > max_length:
+                    return _truncate(pieces, max_length)
+            else:
+                piece = separator + piece
+                visible = separator + visible
+        pending = trailing
+        if deferred:
+            pieces.extend(deferred)
+            deferred.clear()
+
+        pieces.append((piece, visible, kind))
+        if measure:
+            length += utf16_length(visible)
+            if length > max_length:
+                return _truncate(pieces, max_length)
+
+    open_tags = stack[:len(stack) - len(deferred)]
+    return ''.join([piece for piece, _, _ in pieces]).rstrip() + ''.join(
+        f'</{opened}>' for opened in reversed(open_tags)
+    )
+
+
+def _last_boundary(pattern: re.Pattern, visible: str, start: int, limit: int) -> Optional[int]:
+    """Позиция последней границы в тексте фрагмента, до которой длина не превышает limit"""
+    best = None
+    previous = 0
+    for boundary in pattern.finditer(visible):
+        position = boundary.end()
+        start += utf16_length(visible[previous:position])
+        if start > limit:
+            break
+        best = previous = position
+    return best
+
+
+def _truncate(pieces: List[_Piece], max_length: int) -> str:
+    """
+    Обрезать вывод, последний фрагмент которого превысил лимит
+
+    Граница предложения, абзаца или закрывающего тега выбирается, если
+    сохраняет хотя бы половину лимита, иначе - граница слова с многоточием.
+    Слово длиннее лимита режется по символам.
+    """
+    # Видимая длина перед каждым фрагментом и теги, открытые на его границе
+    starts: List[int] = []
+    stacks: List[Tuple[str, ...]] = []
+    stack: List[str] = []
+    length = 0
+    for piece, visible, kind in pieces:
+        starts.append(length)
+        if kind == 'open':
+            stacks.append(tuple(stack))
+            stack.append(visible)
+        elif kind == 'close':
+            stack.pop()
+            stacks.append(tuple(stack))
+        else:
+            stacks.append(tuple(stack))
+            length += utf16_length(visible)
+
+    # На многоточие резервируем одну единицу
+    word_limit = max_length - len(ELLIPSIS)
+
+    # Ищем с конца: первая найденная граница - самая поздняя
+    half = max_length // 2
+    for index in range(len(pieces) - 1, -1, -1):
+        piece, visible, kind = pieces[index]
+        if kind == 'close':
+            if starts[index] < half:
+                break
+            return _cut(pieces, index + 1, '', stacks[index], '')
+        if kind == 'text':
+            position = _last_boundary(_SENTENCE_BOUNDARY, visible, starts[index], max_length)
+            if position is not None:
+                if starts[index] + utf16_length(visible[:position]) < half:
+                    break
+                return _cut(pieces, index, visible[:position], stacks[index], '')
+
+    for index in range(len(pieces) - 1, -1, -1):
+        piece, visible, kind = pieces[index]
+        if kind == 'text':
+            position = _last_boundary(_WORD_BOUNDARY, visible, starts[index], word_limit)
+            if position and (index or visible[:position].strip()):
+                return _cut(pieces, index, visible[:position], stacks[index], ELLIPSIS)
+
+    # Первое слово длиннее лимита - режем по символам
+    last = len(pieces) - 1
+    piece, visible, kind = pieces[last]
+    room = word_limit - starts[last]
+    if room < 0:
+        return _cut(pieces, last, '', stacks[last], '')
+    head = ''
+    if kind == 'text':
+        for char in visible:
+            room -= utf16_length(char)
+            if room < 0:
+                break
+            head += char
+    return _cut(pieces, last, head, stacks[last], ELLIPSIS)
+
+
+def _cut(pieces: List[_Piece], count: int, head: str, open_tags: Sequence[str], suffix: str) -> str:
+    """Собрать результат из первых count фрагментов и видимого начала следующего, закрыв теги"""
+    if not head.strip():
+        # Не оставляем пустые теги, открытые прямо перед границей
+        open_tags = list(open_tags)
+        while count and pieces[count - 1][2] == 'open':
+            count -= 1
+            open_tags.pop()
+    result = ''.join([piece for piece, _, _ in pieces[:count]]) + html.escape(head, quote=False)
+    return result.rstrip() + suffix + ''.join(f'</{opened}>' for opened in reversed(open_tags))
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Тестирование кэша сведений о канале
+"""
+
+import asyncio
+
+from channel_info import ChannelInfoCache, ChannelTarget, is_access_error, parse_channels
+from telegram_html import visible_length
+
+
+class FakeChat:
+    def __init__(self, chat_id, title):
+        self.id = chat_id
+        self.title = title
+
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+class FakeMember:
+    def __init__(self, status, can_post_messages=None):
+        self.status = status
+        self.can_post_messages = can_post_messages
+
+
+class FakeBot:
+    """Замена aiogram.Bot, считающая запросы к Telegram"""
+
+    def __init__(self, status='administrator'):
+        self.status = status
+        self.error = None
+        self.calls = []
+
+    async def get_chat(self, target):
+        self.calls.append('get_chat')
+        await asyncio.sleep(0.01)
+        if self.error is not None:
+            raise self.error
+        if target == '@missing':
+            raise Exception("Telegram server says - Bad Request: chat not found")
+        return FakeChat(-100123, "OptimAI News")
+
+    async def get_me(self):
+        self.calls.append('get_me')
+        return FakeUser(42)
+
+    async def get_chat_member(self, chat_id, user_id):
+        self.calls.append('get_chat_member')
+        assert user_id == 42
+        return FakeMember(self.status)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_warm_and_ttl():
+    """Тестирование прогрева, срока жизни и сброса"""
+    print("📡 Тестирование кэша канала")
+
+    async def scenario():
+        bot, clock = FakeBot(), FakeClock()
+        cache = ChannelInfoCache(bot, ttl=60, clock=clock)
+
+        # get_me уже выполнен при старте - повторно не запрашивается
+        await cache.warm(['@optimaai_tg'], FakeUser(42))
+        assert bot.calls == ['get_chat', 'get_chat_member']
+
+        # Публикации в пределах срока не обращаются к Telegram
+        bot.calls.clear()
+        for _ in range(5):
+            info = await cache.get('@optimaai_tg')
+        assert bot.calls == [] and info.chat_id == -100123 and info.is_admin is True
+
+        # После срока жизни и после сброса сведения запрашиваются заново
+        clock.now = 61
+        await cache.get('@optimaai_tg')
+        assert bot.calls == ['get_chat', 'get_chat_member']
+        cache.invalidate('@optimaai_tg')
+        await cache.get('@optimaai_tg')
+        assert len(bot.calls) == 4
+
+        # Сбой фонового обновления не выбивает рабочую запись
+        bot.error = Exception("Telegram server says - Timeout")
+        await cache.warm(['@optimaai_tg'])
+        bot.error = None
+        bot.calls.clear()
+        assert (await cache.get('@optimaai_tg')).chat_id == -100123 and bot.calls == []
+
+        # Одновременные промахи объединяются в один запрос
+        cache.invalidate('@optimaai_tg')
+        bot.calls.clear()
+        await asyncio.gather(*(cache.get('@optimaai_tg') for _ in range(3)))
+        assert bot.calls == ['get_chat', 'get_chat_member']
+
+        # Ошибка прогрева не прерывает запуск
+        await cache.warm(['@missing'])
+        try:
+            await cache.get('@missing')
+        except Exception as e:
+            assert is_access_error(e)
+        else:
+            raise AssertionError("Ожидалась ошибка канала")
+
+    asyncio.run(scenario())
+    print("✅ Публикация в прогретый канал не делает проверочных запросов")
+
+
+def test_not_admin():
+    """Тестирование отказа в правах"""
+    print("🔐 Тестирование прав бота")
+
+    async def scenario():
+        bot = FakeBot(status='member')
+        cache = ChannelInfoCache(bot)
+        assert cache.peek(-100123) is None
+        info = await cache.get(-100123)
+        assert info.is_admin is False and 'get_me' in bot.calls
+        # Для /status отказ виден без нового запроса, хотя и не кэшируется
+        assert cache.peek(-100123) is info and cache.fetches == 1
+
+        # Отказ не кэшируется: после выдачи прав публикация проходит сразу
+        bot.status = 'administrator'
+        assert (await cache.get(-100123)).is_admin is True
+        assert cache.fetches == 2
+
+    asyncio.run(scenario())
+
+    assert is_access_error(Exception("Forbidden: bot is not a member of the channel chat"))
+    assert is_access_error(Exception("Bad Request: not enough rights to send text messages"))
+    assert not is_access_error(Exception("Too Many Requests: retry after 5"))
+    print("✅ Права перепроверяются после отказа")
+
+
+def test_channel_targets():
+    """Тестирование списка каналов и лимитов оформления"""
+    print("🗺️ Тестирование списка каналов")
+
+    targets = parse_channels(" @main, -1001234567890:600 ,, @spb:300 ")
+    assert [(target.chat_id, target.max_length) for target in targets] == [
+        ('@main', None), (-1001234567890, 600), ('@spb', 300),
+    ]
+    assert parse_channels("") == []
+
+    content = "<b>Центробанк сохранил ставку</b>\n\n" + "Регулятор оставил ставку без изменений. " * 20
+    assert ChannelTarget('@main').format(content) is content
+    short = ChannelTarget('@spb', 300).format(content)
+    assert visible_length(short) <= 300 and short.startswith("<b>Центробанк сохранил ставку</b>")
+    print("✅ Каналы разбираются, пост подгоняется под лимит канала")
+
+
+def main():
+    """Основная функция тестирования"""
+    print("🧪 Запуск тестов кэша канала\n")
+
+    test_warm_and_ttl()
+    test_not_admin()
+    test_channel_targets()
+
+    print("\n✅ Все тесты завершены!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Тестирование планировщика заблаговременных черновиков
+"""
+
+import asyncio
+from datetime import datetime
+
+from draft_scheduler import DraftScheduler, parse_quiet_hours, parse_topics
+
+
+class FakeClock:
+    """Управляемый источник времени"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def at_hour(hour: int) -> datetime:
+    return datetime(2024, 1, 1, hour, 30)
+
+
+def test_quiet_hours():
+    """Тестирование разбора и проверки тихих часов"""
+    print("🌙 Тестирование тихих часов")
+
+    assert parse_quiet_hours("") is None
+    assert parse_quiet_hours(" 0-7 ") == (0, 7)
+    assert parse_quiet_hours("22-30") == (22, 6)
+    assert parse_topics("ИИ, , финансы ,") == ["ИИ", "финансы"]
+
+    async def generate(topic):
+        return None
+
+    always = DraftScheduler(generate, ["ИИ"])
+    assert always.is_quiet_time(at_hour(15))
+
+    night = DraftScheduler(generate, ["ИИ"], quiet_hours=(0, 7))
+    assert night.is_quiet_time(at_hour(0)) and night.is_quiet_time(at_hour(6))
+    assert not night.is_quiet_time(at_hour(7)) and not night.is_quiet_time(at_hour(23))
+
+    # Интервал через полночь
+    wrapping = DraftScheduler(generate, ["ИИ"], quiet_hours=(22, 6))
+    assert wrapping.is_quiet_time(at_hour(23)) and wrapping.is_quiet_time(at_hour(2))
+    assert not wrapping.is_quiet_time(at_hour(6)) and not wrapping.is_quiet_time(at_hour(12))
+    print("✅ Тихие часы учитывают интервал через полночь")
+
+
+def test_tick():
+    """Тестирование условий генерации черновика"""
+    print("⚙️ Тестирование tick")
+
+    clock = FakeClock()
+    calls = []
+    busy = [False]
+    failures = [0]
+
+    async def generate(topic):
+        calls.append(topic)
+        if failures[0]:
+            failures[0] -= 1
+            raise RuntimeError("модель недоступна")
+        return f"Черновик: {topic} #{len(calls)}"
+
+    scheduler = DraftScheduler(
+        generate, ["ИИ", "финансы"], queue_size=1, min_interval=60,
+        is_busy=lambda: busy[0], clock=clock
+    )
+
+    async def scenario():
+        # Занятость интерактивными запросами откладывает генерацию
+        busy[0] = True
+        assert not await scheduler.tick()
+        busy[0] = False
+
+        assert await scheduler.tick()
+        # Слишком рано для следующей генерации
+        clock.now += 30
+        assert not await scheduler.tick()
+
+        # Ошибка генерации не роняет планировщик
+        clock.now += 60
+        failures[0] = 1
+        assert not await scheduler.tick()
+
+        clock.now += 60
+        assert await scheduler.tick()
+
+        # Обе очереди заполнены
+        clock.now += 60
+        assert not await scheduler.tick()
+
+    asyncio.run(scenario())
+
+    assert calls == ["ИИ", "финансы", "финансы"]
+    assert scheduler.ready_counts() == {"ИИ": 1, "финансы": 1}
+    assert scheduler.generated == 2
+    print("✅ Генерация учитывает занятость, интервал, ошибки и размер очередей")
+
+
+def test_take_and_purge():
+    """Тестирование выдачи черновиков и удаления устаревших"""
+    print("📤 Тестирование take и устаревания")
+
+    clock = FakeClock()
+    drafts = iter(["ИИ старый", "финансы", "ИИ новый"])
+
+    async def generate(topic):
+        return next(drafts)
+
+    scheduler = DraftScheduler(
+        generate, ["ИИ", "финансы"], queue_size=2, min_interval=0, max_age=100, clock=clock
+    )
+    # Темы чередуются по длине очереди: ИИ, финансы, ИИ
+    for _ in range(3):
+        clock.now += 10
+        assert asyncio.run(scheduler.tick())
+
+    # Тема без учета регистра, выдается самый свежий черновик
+    assert scheduler.take("ии") == ("ИИ", "ИИ новый")
+    assert scheduler.take("спорт") is None
+    # Без темы - самый свежий среди всех тем
+    assert scheduler.take() == ("финансы", "финансы")
+    assert scheduler.served == 2
+
+    # Оставшийся черновик устаревает
+    clock.now += 100
+    assert scheduler.purge_stale() == 1
+    assert scheduler.take() is None
+    assert scheduler.ready_counts() == {"ИИ": 0, "финансы": 0}
+
+    # Черновик выдается как сгенерирован - вместе с источниками
+    async def generate_with_sources(topic):
+        return {'content': f"Черновик: {topic}", 'sources': ["Центробанк сохранил ставку"]}
+
+    scheduler = DraftScheduler(generate_with_sources, ["финансы"], min_interval=0, clock=clock)
+    assert asyncio.run(scheduler.tick())
+    clock.now += 3600
+    assert scheduler.take("финансы") == (
+        "финансы", {'content': "Черновик: финансы", 'sources': ["Центробанк сохранил ставку"]}
+    )
+    print("✅ Выдается самый свежий черновик, устаревшие удаляются")
+
+
+def main():
+    """Основная функция тестирования"""
+    print("🧪 Запуск тестов планировщика черновиков\n")
+
+    test_quiet_hours()
+    test_tick()
+    test_take_and_purge()
+
+    print("\n✅ Все тесты завершены!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Тестирование индекса почти-дубликатов
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+
+from duplicate_index import DuplicateIndex, hamming_distance, simhash
+
+POST = (
+    "<b>Быстрые модели и новые правила: главное в ИИ за сутки</b>\n\n"
+    "OpenAI обновила GPT-4o: ответы стали быстрее, а работа с изображениями - точнее. "
+    "Google открыла разработчикам Gemini 2.5 Flash - модель для массовых и недорогих запросов. "
+    "Параллельно ЕС согласовал, как AI Act будет применяться к базовым моделям: "
+    "требования начнут действовать в августе."
+)
+
+OTHER_POST = (
+    "<b>Bitcoin выше 100 000, Ethereum снижает комиссии</b>\n\n"
+    "Bitcoin держится выше отметки 100 000 долларов благодаря притоку в биржевые фонды. "
+    "Ethereum готовит обновление сети, которое сделает транзакции дешевле."
+)
+
+
+def test_simhash_distance():
+    """Тестирование расстояния между отпечатками"""
+    print("🔢 Тестирование SimHash")
+
+    edited = POST.replace("точнее", "гораздо точнее")
+    assert simhash(POST) == simhash(POST.replace("<b>", "").replace("</b>", ""))
+    assert hamming_distance(simhash(POST), simhash(edited)) <= 6
+    assert hamming_distance(simhash(POST), simhash(OTHER_POST)) > 6
+
+    print("✅ Правка слова почти не меняет отпечаток, другая история - меняет")
+
+
+def test_find_duplicates():
+    """Тестирование поиска почти-дубликатов"""
+    print("🔍 Тестирование поиска дубликатов")
+
+    index = DuplicateIndex()
+    index.add(POST, kind='post')
+    index.add("Центробанк сохранил ключевую ставку", kind='headline')
+
+    match = index.find(POST.replace("в августе", "с 2 августа"), kind='post')
+    assert match is not None and match['kind'] == 'post'
+    assert index.find(OTHER_POST, kind='post') is None
+    assert index.find("ЦЕНТРОБАНК сохранил ключевую ставку!", kind='headline') is not None
+    assert index.find("Центробанк сохранил ключевую ставку", kind='post') is None
+
+    # Текст без слов не совпадает ни с чем и не индексируется
+    assert index.add(" \n ", kind='headline') == 0 and len(index) == 2
+    index.add("<b></b> — …", kind='post')
+    assert index.find("", kind='post') is None and index.find("   ") is None
+    assert index.find("<i>—</i>") is None and len(index) == 2
+
+    print("✅ Дубликаты находятся с учетом типа записи")
+
+
+def test_window_and_persistence():
+    """Тестирование окна поиска и сохранения на диск"""
+    print("💾 Тестирование окна поиска и сохранения")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'index.json')
+        index = DuplicateIndex(path=path, window=3600)
+        index.add(POST)
+
+        reloaded = DuplicateIndex(path=path, window=3600)
+        assert len(reloaded) == 1
+        assert reloaded.find(POST) is not None
+
+        # Новые записи дописываются в журнал, а не переписывают файл
+        reloaded.add(OTHER_POST)
+        batch = DuplicateIndex(path=path)
+        for i in range(3):
+            batch.add(f"Заголовок источника {i}", kind='headline', save=False)
+        with open(path, encoding='utf-8') as f:
+            assert len(f.readlines()) == 2
+        batch.save()
+        with open(path, encoding='utf-8') as f:
+            lines = f.readlines()
+        assert len(lines) == 5 and json.loads(lines[0])['text'] == POST[:200]
+        assert len(DuplicateIndex(path=path)) == 5
+
+        # Запись вне окна поиска не считается дубликатом
+        next(iter(reloaded._entries.values()))['created_at'] = time.time() - 7200
+        assert reloaded.find(POST) is None
+
+        # Журнал сжимается, когда устаревших строк больше, чем живых
+        for i in range(120):
+            batch.add(f"Новость {i} о событии {i * 13}", save=False)
+        batch.save()
+        for entry in batch._entries.values():
+            entry['created_at'] = time.time() - 8 * 86400
+        batch.add("Последняя новость дня")
+        with open(path, encoding='utf-8') as f:
+            assert len(f.readlines()) == len(batch) == 1
+
+        # Прежний формат - JSON-массив - загружается и переписывается журналом
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump([dict(entry) for entry in reloaded._entries.values()], f)
+        legacy = DuplicateIndex(path=path)
+        assert len(legacy) == 2
+        with open(path, encoding='utf-8') as f:
+            assert len(f.readlines()) == 2
+
+    print("✅ Индекс переживает перезапуск и учитывает окно")
+
+
+def test_concurrent_find_and_add():
+    """Тестирование поиска из потоков пула во время добавления"""
+    print("🧵 Тестирование многопоточного доступа")
+
+    index = DuplicateIndex(retention=3600)
+    errors = []
+    done = threading.Event()
+
+    def lookup():
+        try:
+            while not done.is_set():
+                index.find(POST)
+                index.prune()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=lookup) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for i in range(2000):
+        index.add(f"Новость номер {i} о событии {i * 7}", save=False)
+    done.set()
+    for thread in threads:
+        thread.join()
+
+    assert errors == [] and len(index) == 2000
+    print("✅ Поиск и добавление из разных потоков не мешают друг другу")
+
+
+def test_lookup_speed():
+    """Тестирование скорости проверки"""
+    print("⚡ Тестирование скорости проверки")
+
+    index = DuplicateIndex()
+    for i in range(2000):
+        index.add(f"Новость номер {i} о событии {i * 7} в регионе {i % 50}", save=False)
+    index.add(POST, save=False)
+
+    rounds = []
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(100):
+            assert index.find(POST) is not None
+        rounds.append((time.perf_counter() - started) / 100)
+    # Лучший из нескольких прогонов, чтобы не зависеть от случайных пауз машины
+    per_lookup = min(rounds)
+
+    # Проверка идет по полосам simhash, а не перебором, и укладывается в миллисекунду
+    assert per_lookup < 0.001, f"проверка заняла {per_lookup * 1000:.2f} мс"
+    print(f"✅ Проверка поста: {per_lookup * 1000:.3f} мс")
+
+
+def main():
+    """Основная функция тестирования"""
+    print("🧪 Запуск тестов индекса дубликатов\n")
+
+    test_simhash_distance()
+    test_find_duplicates()
+    test_window_and_persistence()
+    test_concurrent_find_and_add()
+    test_lookup_speed()
+
+    print("\n✅ Все тесты завершены!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Тестирование заблаговременных быстрых правок
+"""
+
+import asyncio
+import time
+
+from edit_cache import EditPrefetcher, content_hash
+
+INSTRUCTIONS = {
+    "shorter": "Сделай короче",
+    "details": "Добавь деталей",
+    "engaging": "Сделай привлекательнее",
+    "emoji": "Добавь эмодзи",
+}
+
+
+def test_parallel_prefetch():
+    """Тестирование параллельного запуска и мгновенной выдачи правок"""
+    print("⚡ Тестирование параллельных правок")
+
+    async def scenario():
+        calls = []
+
+        async def edit(content, instruction):
+            calls.append(instruction)
+            await asyncio.sleep(0.05)
+            return f"{content} [{instruction}]"
+
+        prefetcher = EditPrefetcher(edit)
+        started = time.perf_counter()
+        prefetcher.prefetch("post1", "Пост", INSTRUCTIONS)
+        # Пока пользователь выбирает правку, все четыре выполняются одновременно
+        await asyncio.sleep(0.08)
+        assert await prefetcher.take("Пост", "shorter") == "Пост [Сделай короче]"
+        assert await prefetcher.take("Пост", "emoji") == "Пост [Добавь эмодзи]"
+        assert time.perf_counter() - started < 0.15
+
+        # Повторное открытие меню не запускает правки заново
+        prefetcher.prefetch("post1", "Пост", INSTRUCTIONS)
+        assert len(calls) == 4
+        assert prefetcher.hits == 2
+
+        # Для другого текста заготовок нет
+        assert await prefetcher.take("Другой пост", "shorter") is None
+
+        # Незавершенная фоновая заготовка не задерживает нажатие: она отменяется
+        prefetcher.prefetch("post2", "Новый пост", INSTRUCTIONS)
+        await asyncio.sleep(0)
+        task = prefetcher._tasks[(content_hash("Новый пост"), "details")]
+        assert await prefetcher.take("Новый пост", "details") is None
+        await asyncio.sleep(0)
+        assert task.cancelled() and len(prefetcher) == 7
+
+    asyncio.run(scenario())
+    print("✅ Четыре правки выполнены параллельно и выданы из кэша")
+
+
+def test_failed_edit_falls_back():
+    """Тестирование неудачной правки"""
+    print("⚠️ Тестирование неудачной правки")
+
+    async def scenario():
+        async def edit(content, instruction):
+            if instruction == "Добавь деталей":
+                raise RuntimeError("API недоступен")
+            return content.upper()
+
+        prefetcher = EditPrefetcher(edit)
+        prefetcher.prefetch("post1", "пост", INSTRUCTIONS)
+        await asyncio.sleep(0.01)
+        assert await prefetcher.take("пост", "details") is None
+        assert await prefetcher.take("пост", "shorter") == "ПОСТ"
+        assert len(prefetcher) == 3
+
+    asyncio.run(scenario())
+    print("✅ Неудачная правка не кэшируется, бот выполнит ее заново")
+
+
+def test_evict_with_post():
+    """Тестирование удаления заготовок вместе с постом"""
+    print("🗑️ Тестирование удаления заготовок")
+
+    async def scenario():
+        async def edit(content, instruction):
+            await asyncio.sleep(1)
+            return content
+
+        prefetcher = EditPrefetcher(edit)
+        prefetcher.prefetch("post1", "Пост", INSTRUCTIONS)
+        prefetcher.prefetch("post2", "Пост", {"shorter": "Сделай короче"})
+        prefetcher.prefetch("post3", "Другой", INSTRUCTIONS)
+        tasks = dict(prefetcher._tasks)
+
+        # Заготовка "shorter" нужна еще посту post2
+        prefetcher.evict("post1")
+        assert len(prefetcher) == 5
+        prefetcher.evict("post2")
+        prefetcher.evict("post3")
+        assert len(prefetcher) == 0
+
+        await asyncio.sleep(0)
+        assert all(task.cancelled() for task in tasks.values())
+
+    asyncio.run(scenario())
+    print("✅ Незавершенные правки отменяются вместе с последним постом")
+
+
+def main():
+    """Основная функция тестирования"""
+    print("🧪 Запуск тестов быстрых правок\n")
+
+    test_parallel_prefetch()
+    test_failed_edit_falls_back()
+    test_evict_with_post()
+
+    print("\n✅ Все тесты завершены!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Тестирование пула генерации
+"""
+
+import asyncio
+import threading
+import time
+
+from generation_pool import GenerationLimitError, GenerationPool, PerThread
+
+
+class FakeAgent:
+    """Агент с общим состоянием запуска, как Agent из agno"""
+
+    created = 0
+
+    def __init__(self):
+        FakeAgent.created += 1
+        self.run_response = None
+
+    def run(self, prompt: str) -> str:
+        self.run_response = prompt
+        time.sleep(0.02)
+        # Общий агент вернул бы здесь ответ другого запроса
+        return self.run_response
+
+
+def test_per_thread_agents():
+    """Тестирование отдельных агентов для потоков пула"""
+    print("🧵 Тестирование агентов по потокам")
+
+    agents = PerThread(FakeAgent)
+    assert agents.get() is agents.get()
+
+    async def scenario():
+        pool = GenerationPool(max_workers=4)
+        prompts = [f"тема {i}" for i in range(8)]
+        results = await asyncio.gather(*(pool.run(lambda p=p: agents.get().run(p)) for p in prompts))
+        pool.shutdown()
+        return prompts, results
+
+    FakeAgent.created = 0
+    prompts, results = asyncio.run(scenario())
+    assert results == prompts
+    # Не больше одного агента на поток пула
+    assert FakeAgent.created <= 4
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(agents.get()))
+    thread.start()
+    thread.join()
+    assert other[0] is not agents.get()
+    print("✅ Одновременные запросы не получают чужие ответы")
+
+
+def test_user_limit():
+    """Тестирование лимита одновременных генераций пользователя"""
+    print("👤 Тестирование лимита пользователя")
+
+    async def scenario():
+        pool = GenerationPool(max_workers=2, per_user_limit=1)
+        started = asyncio.Event()
+
+        async def generate(user_id):
+            async with pool.user_slot(user_id):
+                started.set()
+                return await pool.run(time.sleep, 0.1)
+
+        first = asyncio.ensure_future(generate(1))
+        await started.wait()
+        # Вторая генерация того же пользователя отклоняется сразу, другого - выполняется
+        try:
+            await generate(1)
+        except GenerationLimitError:
+            pass
+        else:
+            raise AssertionError("Ожидался GenerationLimitError")
+        assert pool.user_inflight(1) == 1
+        await generate(2)
+        await first
+
+        # После завершения первой генерации слот освобождается
+        assert pool.user_inflight(1) == 0
+        await generate(1)
+        pool.shutdown()
+
+    asyncio.run(scenario())
+    print("✅ Повторная генерация пользователя отклоняется, пока идет первая")
+
+
+def test_loop_stays_responsive():
+    """Тестирование отзывчивости event loop во время блокирующего вызова"""
+    print("💓 Тестирование отзывчивости event loop")
+
+    async def scenario():
+        pool = GenerationPool(max_workers=1)
+        beats = []
+
+        async def heartbeat():
+            while True:
+                beats.append(time.monotonic())
+                await asyncio.sleep(0)
+
+        ticker = asyncio.ensure_future(heartbeat())
+        await asyncio.sleep(0)
+        started = time.monotonic()
+        await pool.run(time.sleep, 0.2)
+        ticker.cancel()
+        pool.shutdown()
+        return started, beats
+
+    started, beats = asyncio.run(scenario())
+    gaps = [later - earlier for earlier, later in zip(beats, beats[1:]) if earlier >= started]
+    # Блокирующий вызов в пуле не останавливает другие задачи loop
+    assert len(gaps) > 100 and max(gaps) < 0.05, f"пауза loop {max(gaps) * 1000:.0f} мс"
+    print(f"✅ Loop отвечал во время вызова: {len(gaps)} тиков, самая длинная пауза {max(gaps) * 1000:.1f} мс")
+
+
+def main():
+    """Основная функция тестирования"""
+    print("🧪 Запуск тестов пула генерации\n")
+
+    test_per_thread_agents()
+    test_user_limit()
+    test_loop_stays_responsive()
+
+    print("\n✅ Все тесты завершены!")
+
+
+if __name__ == "__main__":
+    main()
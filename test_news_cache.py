@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Тестирование кэша исследованных новостей
+"""
+
+import asyncio
+
+from news_cache import SingleFlight, TTLCache, normalize_topic
+
+
+class FakeClock:
+    """Управляемый источник времени"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_normalize_topic():
+    """Тестирование нормализации темы"""
+    print("🔑 Тестирование нормализации темы")
+
+    assert normalize_topic("ИИ,  Новости!") == normalize_topic("ии новости")
+    assert normalize_topic("  последние новости ") == "последние новости"
+    assert normalize_topic("AI") != normalize_topic("AI news")
+
+    print("✅ Нормализация работает корректно")
+
+
+def test_ttl_expiry():
+    """Тестирование устаревания записей"""
+    print("⏰ Тестирование времени жизни записей")
+
+    clock = FakeClock()
+    cache = TTLCache(ttl=60, max_size=10, clock=clock)
+    cache.set("последние новости", "raw news")
+
+    assert cache.get("последние новости") == "raw news"
+    clock.now = 59
+    assert cache.get("последние новости") == "raw news"
+    clock.now = 60
+    assert cache.get("последние новости") is None
+    assert cache.hits == 2 and cache.misses == 1
+
+    print("✅ Устаревшие записи не возвращаются")
+
+
+def test_lru_eviction():
+    """Тестирование вытеснения по размеру"""
+    print("📦 Тестирование вытеснения по размеру")
+
+    cache = TTLCache(ttl=60, max_size=2, clock=FakeClock())
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # "a" становится самой свежей
+    cache.set("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.evictions == 1
+
+    print("✅ Вытесняется давно использованная запись")
+
+
+def test_purge_expired():
+    """Тестирование очистки устаревших записей"""
+    print("🧹 Тестирование очистки")
+
+    clock = FakeClock()
+    cache = TTLCache(ttl=10, max_size=10, clock=clock)
+    cache.set("a", 1)
+    clock.now = 5
+    cache.set("b", 2)
+    clock.now = 12
+
+    assert cache.purge_expired() == 1
+    assert len(cache) == 1
+
+    print("✅ Очистка удаляет только устаревшие записи")
+
+
+def test_single_flight():
+    """Тестирование объединения одновременных запросов"""
+    print("🔀 Тестирование объединения запросов")
+
+    async def scenario():
+        flight = SingleFlight()
+        runs = 0
+
+        async def research():
+            nonlocal runs
+            runs += 1
+            await asyncio.sleep(0.01)
+            return f"raw news #{runs}"
+
+        first = asyncio.ensure_future(flight.do("ии", research))
+        await asyncio.sleep(0)
+        assert "ии" in flight and "спорт" not in flight
+        results = await asyncio.gather(
+            first, *(flight.do("ии", research) for _ in range(4))
+        )
+        assert runs == 1
+        assert results == ["raw news #1"] * 5
+        assert flight.shared == 4 and len(flight) == 0
+
+        # После завершения следующий запрос снова выполняет работу
+        assert await flight.do("ии", research) == "raw news #2"
+
+    asyncio.run(scenario())
+    print("✅ Пять одинаковых запросов выполнены одним исследованием")
+
+
+def test_single_flight_cancellation():
+    """Тестирование отмены одного из ожидающих"""
+    print("🛑 Тестирование отмены ожидающего")
+
+    async def scenario():
+        flight = SingleFlight()
+
+        async def research():
+            await asyncio.sleep(0.02)
+            return "raw news"
+
+        first = asyncio.create_task(flight.do("ии", research))
+        second = asyncio.create_task(flight.do("ии", research))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        assert await second == "raw news"
+
+    asyncio.run(scenario())
+    print("✅ Отмена одного ожидающего не прерывает остальных")
+
+
+def main():
+    """Основная функция тестирования"""
+    print("🧪 Запуск тестов кэша новостей\n")
+
+    test_normalize_topic()
+    test_ttl_expiry()
+    test_lru_eviction()
+    test_purge_expired()
+    test_single_flight()
+    test_single_flight_cancellation()
+
+    print("\n✅ Все тесты завершены!")
+
+
+if __name__ == "__main__":
+    main()
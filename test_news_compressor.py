@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Тестирование экстрактивного сжатия новостей
+"""
+
+from news_compressor import compress, estimate_tokens, split_sentences
+
+NEWS = (
+    "## Обзор новостей\n"
+    "- **Центробанк** сохранил ключевую ставку на уровне 16% сегодня утром.\n"
+    "- Курс рубля укрепился после решения регулятора.\n"
+    "- В Москве прошел дождь.\n"
+    "- Аналитики ждут снижения ставки Центробанком в сентябре.\n"
+    "- Курс рубля укрепился после решения регулятора.\n"
+)
+
+
+def test_budget_and_order():
+    """Тестирование бюджета и порядка предложений"""
+    print("✂️ Тестирование бюджета и порядка")
+
+    sentences = split_sentences(NEWS)
+    # Markdown-префиксы убраны, повтор удален
+    assert sentences[0] == "Обзор новостей"
+    assert sentences[1].startswith("Центробанк сохранил")
+    assert len(sentences) == 5
+
+    # Текст в пределах бюджета не меняется
+    text, stats = compress(NEWS, 1000)
+    assert text == NEWS and stats['ratio'] == 1.0
+
+    budget = 40
+    text, stats = compress(NEWS, budget)
+    kept = text.split("\n")
+    assert 0 < estimate_tokens(text) <= budget
+    assert stats['compressed_tokens'] == estimate_tokens(text) < stats['original_tokens']
+    # Оставшиеся предложения идут в исходном порядке
+    assert kept == [sentence for sentence in sentences if sentence in kept]
+    assert any("ставк" in sentence for sentence in kept)
+    print(f"✅ Сжатие до {stats['compressed_tokens']} токенов с исходным порядком: {len(kept)} из {len(sentences)}")
+
+
+def test_oversized_sentences():
+    """Тестирование случая, когда каждое предложение длиннее бюджета"""
+    print("📏 Тестирование длинных предложений")
+
+    text = (
+        "Центробанк сохранил ключевую ставку на уровне шестнадцати процентов и указал на замедление инфляции. "
+        "Министерство финансов сообщило о размещении новых облигаций федерального займа на крупную сумму."
+    )
+    compressed, stats = compress(text, 10)
+    assert compressed
+    assert estimate_tokens(compressed) <= 10
+    assert compressed.endswith("…")
+    # Обрезается самое значимое предложение - первое, по границе слова
+    assert text.startswith(compressed[:-1])
+    assert stats['compressed_tokens'] > 0
+
+    # Без слов ранжировать нечего: текст возвращается как есть
+    assert compress("… — … — …" * 20, 5)[0] == "… — … — …" * 20
+    print(f"✅ Вместо пустой строки - начало главного предложения: {compressed}")
+
+
+def main():
+    """Основная функция тестирования"""
+    print("🧪 Запуск тестов сжатия новостей\n")
+
+    test_budget_and_order()
+    test_oversized_sentences()
+
+    print("\n✅ Все тесты завершены!")
+
+
+if __name__ == "__main__":
+    main()
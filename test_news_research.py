@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Тестирование параллельного поиска новостей
+"""
+
+import asyncio
+import time
+
+from news_research import NewsResearcher, format_results, merge_results
+
+
+def result(title: str, url: str, source: str) -> dict:
+    """Результат поиска в формате источников"""
+    return {'title': title, 'url': url, 'snippet': f"Текст: {title}", 'source': source, 'published': ''}
+
+
+def test_merge_results():
+    """Тестирование удаления дубликатов и порядка"""
+    print("🔗 Тестирование объединения результатов")
+
+    merged = merge_results([
+        result("Центробанк сохранил ставку", "https://www.cbr.ru/news/1?utm=tg", 'DuckDuckGo'),
+        result("Курс рубля вырос", "https://rbc.ru/finance/2", 'DuckDuckGo'),
+        # Тот же URL без www, схемы и параметров
+        result("Ставка ЦБ: решение", "http://cbr.ru/news/1/", 'Tavily'),
+        # Тот же заголовок с другим регистром и пунктуацией
+        result("Курс рубля вырос!", "https://lenta.ru/2", 'Tavily'),
+        result("Нефть подорожала", "https://exa.ai/3", 'Exa'),
+        # Результаты без URL и заголовка не сливаются друг с другом
+        result("", "", 'Exa'),
+        result("", "", 'Exa'),
+    ])
+
+    # Остаются первые вхождения в порядке поступления
+    assert [item['title'] for item in merged] == [
+        "Центробанк сохранил ставку", "Курс рубля вырос", "Нефть подорожала", "", "",
+    ]
+    assert [item['source'] for item in merged[:3]] == ['DuckDuckGo', 'DuckDuckGo', 'Exa']
+    assert merge_results([]) == []
+
+    text = format_results(merged[:1])
+    assert text.startswith("1. Центробанк сохранил ставку\nИсточник: DuckDuckGo\n")
+    print("✅ Дубликаты по URL и заголовку удаляются, порядок сохраняется")
+
+
+def test_deadline_and_failures():
+    """Тестирование дедлайна и ошибок отдельных источников"""
+    print("⏱️ Тестирование дедлайна")
+
+    def fast(topic, max_results):
+        assert max_results == 3
+        return [result(f"{topic}: быстрый {i}", f"https://fast.ru/{i}", 'fast') for i in range(5)][:max_results]
+
+    def slow(topic, max_results):
+        time.sleep(1.0)
+        return [result(f"{topic}: медленный", "https://slow.ru/1", 'slow')]
+
+    def broken(topic, max_results):
+        raise ConnectionError("источник недоступен")
+
+    def duplicate(topic, max_results):
+        return [result(f"{topic}: быстрый 0", "https://mirror.ru/0", 'duplicate')]
+
+    async def scenario():
+        researcher = NewsResearcher(
+            deadline=0.2, max_results=3,
+            providers={'fast': fast, 'slow': slow, 'broken': broken, 'duplicate': duplicate}
+        )
+        started = time.monotonic()
+        found = await researcher.search("ставка")
+        elapsed = time.monotonic() - started
+        return found, elapsed
+
+    found, elapsed = asyncio.run(scenario())
+
+    # Медленный источник не задерживает ответ, сломанный не роняет поиск
+    assert elapsed < 0.6
+    assert [item['source'] for item in found] == ['fast', 'fast', 'fast']
+    assert asyncio.run(NewsResearcher(providers={}).search("ставка")) == []
+    print(f"✅ Поиск уложился в дедлайн ({elapsed:.2f} с) без медленного и сломанного источников")
+
+
+def test_bounded_executor():
+    """Тестирование отдельного ограниченного пула для вызовов источников"""
+    print("🧵 Тестирование пула источников")
+
+    calls = []
+
+    def hung(topic, max_results):
+        calls.append(topic)
+        time.sleep(0.4)
+        return [result(topic, f"https://hung.ru/{topic}", 'hung')]
+
+    researcher = NewsResearcher(deadline=0.1, providers={'hung': hung}, max_workers=1)
+
+    async def scenario():
+        # Второй поиск ждет свободного потока и отменяется к дедлайну, не успев начаться
+        return await asyncio.gather(researcher.search("ставка"), researcher.search("нефть"))
+
+    assert asyncio.run(scenario()) == [[], []]
+    time.sleep(0.5)
+    assert calls == ["ставка"]
+    print("✅ Зависший источник занимает только свой пул, очередь вызовов отменяется к дедлайну")
+
+
+def main():
+    """Основная функция тестирования"""
+    print("🧪 Запуск тестов поиска новостей\n")
+
+    test_merge_results()
+    test_deadline_and_failures()
+    test_bounded_executor()
+
+    print("\n✅ Все тесты завершены!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Тестирование истории версий поста
+"""
+
+from post_history import PostHistory, apply_delta, make_delta
+
+ORIGINAL = (
+    "<b>Центробанк сохранил ставку</b>\n\n"
+    "Регулятор оставил ставку на уровне 16%. Инфляция замедляется второй месяц подряд, "
+    "но аналитики ждут снижения только осенью.\n\n"
+    "<i>Кредиты пока не подешевеют.</i>"
+)
+
+
+def test_delta_roundtrip():
+    """Тестирование дельт от оригинала"""
+    print("🧮 Тестирование дельт")
+
+    edited = ORIGINAL.replace("Центробанк сохранил ставку", "🏦 Ставка осталась 16%").replace("осенью", "в сентябре")
+    delta = make_delta(ORIGINAL, edited)
+    assert apply_delta(ORIGINAL, delta) == edited
+    assert apply_delta(ORIGINAL, make_delta(ORIGINAL, "")) == ""
+    assert make_delta(ORIGINAL, ORIGINAL) == []
+    # Дельта небольшой правки намного меньше самого поста
+    assert sum(len(replacement) for _, _, replacement in delta) < len(edited) / 4
+
+    print("✅ Версии восстанавливаются из дельт")
+
+
+def test_undo_redo():
+    """Тестирование отмены и возврата"""
+    print("↩️ Тестирование отмены и возврата")
+
+    history = PostHistory(ORIGINAL)
+    first = history.push(ORIGINAL.replace("16%", "16 процентов"))
+    second = history.push(first + "\n\n📊 Следующее заседание - в июле.")
+    assert len(history) == 3 and not history.can_redo
+
+    assert history.undo() == first
+    assert history.undo() == ORIGINAL
+    assert history.undo() == ORIGINAL and not history.can_undo
+    assert history.redo() == first
+    assert history.redo() == second
+
+    # Новая правка после отмены отбрасывает отмененные версии
+    history.undo()
+    third = history.push(first.replace("осенью", "в сентябре"))
+    assert len(history) == 3 and history.text == third and not history.can_redo
+    assert history.undo() == first
+
+    print("✅ Версии переключаются без вызовов модели")
+
+
+def test_memory_bound():
+    """Тестирование ограничения памяти"""
+    print("💾 Тестирование ограничения памяти")
+
+    history = PostHistory(ORIGINAL, max_versions=5, max_chars=400)
+    for i in range(50):
+        history.push(ORIGINAL + f" Обновление {i}." + "!" * (i % 7))
+    assert len(history) <= 6
+    assert history.size <= 400
+    assert history.text.startswith(ORIGINAL) and "Обновление 49." in history.text
+
+    # Самые старые правки вытеснены, оригинал доступен всегда
+    while history.can_undo:
+        history.undo()
+    assert history.text == ORIGINAL
+
+    # Объем в байтах растет с правками, но остается порядка оригинала, а не суммы версий
+    fresh = PostHistory(ORIGINAL)
+    assert not hasattr(fresh, '__dict__')
+    assert fresh.nbytes < history.nbytes < fresh.nbytes + 6 * len(ORIGINAL.encode())
+
+    print(f"✅ Хранится {len(history)} версий, {history.size} символов дельт")
+
+
+def main():
+    """Основная функция тестирования"""
+    print("🧪 Запуск тестов истории версий\n")
+
+    test_delta_roundtrip()
+    test_undo_redo()
+    test_memory_bound()
+
+    print("\n✅ Все тесты завершены!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Тестирование точечных правок поста
+"""
+
+from post_patch import PatchError, apply_patch, parse_patch
+
+def assert_patch_error(func, *args, match: str = ""):
+    """Проверить, что вызов отклоняется с PatchError"""
+    try:
+        func(*args)
+    except PatchError as e:
+        assert match in str(e), e
+    else:
+        raise AssertionError(f"Ожидалась PatchError для {args!r}")
+
+
+POST = (
+    "<b>Центробанк сохранил ставку</b>\n\n"
+    "Регулятор оставил ставку на уровне 16%. Инфляция замедляется.\n\n"
+    "<i>Кредиты пока не подешевеют.</i>"
+)
+
+
+def test_parse_patch():
+    """Тестирование разбора ответа модели"""
+    print("🧩 Тестирование разбора патча")
+
+    response = '```json\n{"replacements": [{"find": "сохранил ставку</b>", "replace": "не тронул ставку</b>"}]}\n```'
+    assert parse_patch(response) == [("сохранил ставку</b>", "не тронул ставку</b>")]
+
+    for broken in ('не JSON', '{"replacements": []}', '[1, 2]', '{"replacements": [{"find": "", "replace": "x"}]}'):
+        assert_patch_error(parse_patch, broken)
+
+    print("✅ Корректный патч разобран, некорректные отклонены")
+
+
+def test_apply_patch():
+    """Тестирование применения замен"""
+    print("✏️ Тестирование применения патча")
+
+    edited = apply_patch(POST, [
+        ("<b>Центробанк сохранил ставку</b>", "<b>🏦 Ставка осталась 16%</b>"),
+        ("Инфляция замедляется.", "Инфляция замедляется второй месяц подряд."),
+    ])
+    assert edited.startswith("<b>🏦 Ставка осталась 16%</b>\n\n")
+    assert "второй месяц подряд." in edited
+    assert edited.endswith("<i>Кредиты пока не подешевеют.</i>")
+
+    # Неоднозначный или отсутствующий фрагмент - повод для полной перезаписи
+    assert_patch_error(apply_patch, POST, [("ставк", "ставк")], match="встречается 2 раз")
+    assert_patch_error(apply_patch, POST, [("Биткоин", "Эфир")], match="не найден")
+
+    print("✅ Замены применены по порядку, неоднозначные отклонены")
+
+
+def main():
+    """Основная функция тестирования"""
+    print("🧪 Запуск тестов точечных правок\n")
+
+    test_parse_patch()
+    test_apply_patch()
+
+    print("\n✅ Все тесты завершены!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Тестирование локальной проверки поста по правилам канала
+"""
+
+from post_scorer import RULE_SUGGESTIONS, score_post, score_posts, tag_errors
+
+GOOD = (
+    "<b>Центробанк сохранил ставку</b>\n\n"
+    "Регулятор оставил ключевую ставку без изменений третий раз подряд.\n\n"
+    "<i>Кредиты пока не подешевеют, вклады остаются выгодными.</i>"
+)
+
+
+def test_good_post():
+    """Тестирование поста без нарушений"""
+    print("✅ Тестирование корректного поста")
+
+    check = score_post(GOOD)
+    assert check.passed and check.score == 1.0
+    assert check.issues == [] and check.suggestions() == []
+
+    print("✅ Пост по правилам проходит проверку без замечаний")
+
+
+def test_rule_violations():
+    """Тестирование отдельных правил"""
+    print("📏 Тестирование правил")
+
+    assert score_post("<b>Заголовок</b>\n\n" + "Текст. " * 200).rules == ['length', 'paragraphs']
+    assert score_post(GOOD.replace("</i>", "")).rules == ['tags']
+    assert score_post("Просто текст без заголовка").rules == ['headline']
+    assert score_post("<b>" + "Очень длинный заголовок " * 5 + "</b>\n\nТекст").rules == ['headline']
+    assert score_post(GOOD + "\n\n**Важно** #новости").rules == ['markdown']
+    assert score_post(GOOD + " 🚀").rules == ['emoji']
+    assert score_post(GOOD + " 🚀", allow_emoji=True).passed
+    assert score_post("<b>Только заголовок</b>").rules == ['paragraphs']
+
+    # HTML-сущность с решеткой не считается хэштегом
+    assert score_post(GOOD.replace("раз", "&#1088;аз")).passed
+
+    assert tag_errors("<br><b>текст</i>") == ["несбалансированный тег </i>", "неподдерживаемые теги: ['br']"]
+    assert tag_errors("<b><i>текст</i>") == ["незакрытые теги: ['b']"]
+    print("✅ Каждое правило находит свое нарушение")
+
+
+def test_score_and_suggestions():
+    """Тестирование оценки и готовых советов"""
+    print("💡 Тестирование советов")
+
+    bad = "**Заголовок** 🚀\n" + "Текст без абзацев. " * 80
+    check = score_post(bad)
+    assert set(check.rules) == {'length', 'headline', 'markdown', 'emoji', 'paragraphs'}
+    assert 0.0 <= check.score < score_post(GOOD + " 🚀").score < 1.0
+
+    suggestions = check.suggestions()
+    assert len(suggestions) == len(check.rules)
+    assert suggestions[0] == RULE_SUGGESTIONS['length'].format(max_length=1000)
+
+    # Пачка постов проверяется с общими лимитами
+    scores = score_posts([GOOD, bad], max_length=2000)
+    assert scores[0].passed and 'length' not in scores[1].rules
+
+    print("✅ Советы по нарушенным правилам готовы без модели")
+
+
+def main():
+    """Основная функция тестирования"""
+    print("🧪 Запуск тестов проверки постов\n")
+
+    test_good_post()
+    test_rule_violations()
+    test_score_and_suggestions()
+
+    print("\n✅ Все тесты завершены!")
+
+
+if __name__ == "__main__":
+    main()
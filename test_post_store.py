@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+Тестирование хранилищ постов, ожидающих подтверждения
+"""
+
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from post_history import PostHistory
+import post_store
+from post_store import MemoryPostStore, PostRecord, RedisPostStore, SQLitePostStore, create_post_store
+
+ORIGINAL = "<b>Центробанк сохранил ставку</b>\n\nРегулятор оставил ставку без изменений."
+
+
+class FakeRedis:
+    """
+    Локальная замена асинхронного клиента Redis с нужным подмножеством команд
+
+    Каждая команда уступает event loop, поэтому одновременные вызовы
+    из нескольких "процессов" перемешиваются, как с настоящим сервером.
+    """
+
+    def __init__(self):
+        self.data = {}
+        # Скрипты Lua атомарны: их аналоги выполняются без переключения event loop
+        self.scripts = {
+            post_store._REDIS_UPDATE: self._update_script,
+            post_store._REDIS_TAKE: self._take_script,
+        }
+
+    def register_script(self, source):
+        script = self.scripts[source]
+
+        async def run(keys, args):
+            await asyncio.sleep(0)
+            return script(keys, args)
+        return run
+
+    async def hgetall(self, key):
+        await asyncio.sleep(0)
+        return dict(self.data.get(key, {}))
+
+    async def hget(self, key, field):
+        await asyncio.sleep(0)
+        return self.data.get(key, {}).get(field)
+
+    async def hset(self, key, mapping):
+        await asyncio.sleep(0)
+        self._hset(key, mapping)
+
+    async def delete(self, *keys):
+        await asyncio.sleep(0)
+        return self._delete(*keys)
+
+    async def zrem(self, key, *members):
+        await asyncio.sleep(0)
+        self._zrem(key, *members)
+
+    async def zrevrange(self, key, start, end):
+        await asyncio.sleep(0)
+        members = sorted(self.data.get(key, {}).items(), key=lambda item: item[1], reverse=True)
+        return [member for member, _ in members][start:end + 1]
+
+    async def zrange(self, key, start, end, withscores=False):
+        await asyncio.sleep(0)
+        members = sorted(self.data.get(key, {}).items(), key=lambda item: item[1])[start:end + 1]
+        return members if withscores else [member for member, _ in members]
+
+    async def zrangebyscore(self, key, low, high):
+        await asyncio.sleep(0)
+        low = float(low)
+        return [member for member, score in sorted(self.data.get(key, {}).items(), key=lambda item: item[1])
+                if low <= score <= float(high)]
+
+    async def zcard(self, key):
+        await asyncio.sleep(0)
+        return len(self.data.get(key, {}))
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def aclose(self):
+        pass
+
+    def _update_script(self, keys, args):
+        post = self.data.get(keys[0])
+        if not post or 'created_at' not in post:
+            return None
+        post.update(zip(args[::2], args[1::2]))
+        return [item for pair in post.items() for item in pair]
+
+    def _take_script(self, keys, args):
+        post = self.data.pop(keys[0], None)
+        if not post:
+            return None
+        self._zrem(keys[1], args[0])
+        return [item for pair in post.items() for item in pair]
+
+    def _hset(self, key, mapping):
+        self.data.setdefault(key, {}).update(mapping)
+        return len(mapping)
+
+    def _delete(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def _zadd(self, key, mapping):
+        self.data.setdefault(key, {}).update(mapping)
+
+    def _zrem(self, key, *members):
+        zset = self.data.get(key, {})
+        for member in members:
+            zset.pop(member, None)
+        if not zset:
+            self.data.pop(key, None)
+
+
+class FakePipeline:
+    """Транзакция MULTI/EXEC: команды копятся и выполняются разом"""
+
+    def __init__(self, redis: FakeRedis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((getattr(self.redis, f'_{name}'), args, kwargs))
+            return self
+        return queue
+
+    async def execute(self):
+        await asyncio.sleep(0)
+        return [command(*args, **kwargs) for command, args, kwargs in self.commands]
+
+
+def make_post(user_id: int, topic: str, age: float = 0) -> dict:
+    """Данные поста в том виде, в каком их сохраняет бот"""
+    return {
+        'content': ORIGINAL,
+        'original_content': ORIGINAL,
+        'history': PostHistory(ORIGINAL),
+        'topic': topic,
+        'sources': ["Ставка ЦБ"],
+        'variants': [],
+        'user_id': user_id,
+        'created_at': datetime.now() - timedelta(seconds=age),
+    }
+
+
+async def check_store(store):
+    """Общие проверки для любого хранилища"""
+    await store.put('a1', make_post(1, "экономика", age=30))
+    await store.put('a2', make_post(1, "технологии", age=20))
+    await store.put('b1', make_post(2, "спорт", age=10))
+    assert await store.count() == 3
+
+    # Ближайший срок - у самого старого поста
+    assert abs(await store.next_expiry(60) - (time.time() + 30)) < 2
+
+    # Посты пользователя - от новых к старым, с ограничением
+    assert [post_id for post_id, _ in await store.user_posts(1)] == ['a2', 'a1']
+    assert [post_id for post_id, _ in await store.user_posts(1, limit=1)] == ['a2']
+    assert await store.user_posts(3) == []
+
+    # Правка сохраняется вместе с историей версий
+    post_data = await store.get('a1')
+    history = post_data['history']
+    content = history.push(ORIGINAL.replace("без изменений", "на уровне 16%"))
+    await store.update('a1', content=content, history=history)
+    await store.update('a1', alternative="<b>Другой вариант</b>")
+
+    post_data = await store.get('a1')
+    assert post_data['content'] == content and post_data['alternative'] == "<b>Другой вариант</b>"
+    assert post_data['history'].undo() == ORIGINAL
+
+    # Удаленный пост не воскресает от запоздалого обновления
+    await store.delete('b1')
+    assert await store.update('b1', alternative="поздно") is None
+    assert await store.get('b1') is None
+    await store.delete('b1')
+
+    # Публикация забирает пост ровно один раз
+    await store.put('c1', make_post(3, "наука"))
+    taken = await asyncio.gather(store.take('c1'), store.take('c1'))
+    assert sum(post_data is not None for post_data in taken) == 1
+    assert await store.get('c1') is None and await store.user_posts(3) == []
+
+    assert sorted(await store.expire(15)) == ['a1', 'a2']
+    assert await store.count() == 0 and await store.user_posts(1) == []
+    assert await store.next_expiry(60) is None
+
+
+def test_memory_store():
+    """Тестирование хранилища в памяти"""
+    print("🧠 Тестирование хранилища в памяти")
+
+    asyncio.run(check_store(MemoryPostStore()))
+    print("✅ Хранилище в памяти работает")
+
+
+def test_memory_limits():
+    """Тестирование лимитов, вытеснения и сроков в хранилище в памяти"""
+    print("📏 Тестирование лимитов памяти")
+
+    async def scenario():
+        evicted = []
+        store = MemoryPostStore(max_posts=2, on_evict=evicted.append)
+        await store.put('p1', make_post(1, "экономика"))
+        await store.put('p2', make_post(1, "технологии"))
+        # Обращение к p1 делает вытесняемым p2
+        await store.get('p1')
+        await store.put('p3', make_post(1, "спорт"))
+        assert evicted == ['p2'] and await store.get('p2') is None
+        assert [post_id for post_id, _ in await store.user_posts(1)] == ['p3', 'p1']
+
+        stats = store.stats()
+        assert stats['posts'] == 2 and stats['evicted'] == 1
+        assert stats['bytes'] == sum(store._sizes.values()) > 0
+        assert stats['bytes_per_post'] == stats['bytes'] / 2
+
+        # Лимит по байтам: последний пост остается, даже если он один больше лимита
+        store = MemoryPostStore(max_bytes=stats['bytes_per_post'] * 1.5)
+        await store.put('p1', make_post(1, "экономика"))
+        await store.put('p2', make_post(1, "технологии"))
+        assert await store.count() == 1 and await store.get('p2') is not None
+        tiny = MemoryPostStore(max_bytes=1)
+        await tiny.put('p1', make_post(1, "экономика"))
+        assert await tiny.count() == 1
+
+        # Рост поста при правке тоже учитывается
+        before = store.stats()['bytes']
+        post_data = await store.get('p2')
+        content = post_data['history'].push(ORIGINAL + " Подробности." * 50)
+        await store.update('p2', content=content, history=post_data['history'])
+        assert store.stats()['bytes'] > before
+
+        # Пересозданный пост живет по новому сроку, удаленный не мешает куче
+        store = MemoryPostStore()
+        await store.put('p1', make_post(1, "экономика", age=100))
+        await store.put('p1', make_post(1, "экономика"))
+        await store.put('p2', make_post(1, "спорт", age=50))
+        await store.delete('p2')
+        assert await store.expire(30) == []
+        assert abs(await store.next_expiry(30) - (time.time() + 30)) < 2
+        assert await store.count() == 1 and store.stats()['expired'] == 0
+
+    asyncio.run(scenario())
+    print("✅ Давно не использованные посты вытесняются, сроки извлекаются из кучи")
+
+
+def test_post_record():
+    """Тестирование компактной записи поста"""
+    print("🧩 Тестирование записи поста")
+
+    record = PostRecord(make_post(1, "экономика"))
+    assert not hasattr(record, '__dict__')
+    assert record['content'] == record['original_content'] == ORIGINAL
+    # Текущая версия и оригинал не хранятся отдельными копиями
+    assert record['content'] is record['history'].text
+
+    record['content'] = ORIGINAL + " Обновлено."
+    assert len(record['history']) == 2 and record['original_content'] == ORIGINAL
+    assert record.get('alternative') is None and 'alternative' not in record
+    try:
+        record['alternative']
+    except KeyError:
+        pass
+    else:
+        raise AssertionError("Ожидался KeyError")
+
+    record.update({'alternative': "<b>Вариант</b>", 'scheduled': True})
+    assert record['alternative'] == "<b>Вариант</b>" and record['scheduled'] is True
+    assert {'content', 'topic', 'alternative', 'scheduled'} <= set(record.keys())
+    assert dict(record.items())['user_id'] == 1
+
+    # Пост без истории получает ее из оригинала
+    record = PostRecord({'original_content': ORIGINAL, 'content': ORIGINAL + "!", 'user_id': 2})
+    assert record['history'].undo() == ORIGINAL and record['content'] == ORIGINAL
+    print("✅ Запись ведет себя как словарь поста")
+
+
+def test_sqlite_store():
+    """Тестирование хранилища SQLite"""
+    print("🗄️ Тестирование хранилища SQLite")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'posts.db')
+
+        async def scenario():
+            store = SQLitePostStore(path)
+            await check_store(store)
+            await store.close()
+
+        asyncio.run(scenario())
+    print("✅ Хранилище SQLite работает")
+
+
+def test_redis_store():
+    """Тестирование хранилища Redis на локальной замене сервера"""
+    print("🧵 Тестирование хранилища Redis")
+
+    async def scenario():
+        await check_store(RedisPostStore(FakeRedis()))
+
+        # Два процесса бота с общим Redis
+        redis = FakeRedis()
+        first, second = RedisPostStore(redis), RedisPostStore(redis)
+        await first.put('p1', make_post(5, "экономика"))
+
+        # Пост, созданный одним процессом, виден другому
+        post_data = await second.get('p1')
+        assert post_data['topic'] == "экономика"
+
+        # Поля, измененные разными процессами одновременно, не затирают друг друга
+        history = post_data['history']
+        content = history.push(ORIGINAL + " Обновлено.")
+        await asyncio.gather(
+            first.update('p1', alternative="<b>Вариант</b>"),
+            second.update('p1', content=content, history=history),
+        )
+        post_data = await first.get('p1')
+        assert post_data['alternative'] == "<b>Вариант</b>" and post_data['content'] == content
+
+        # Подтверждение из двух процессов сразу: публикует только один
+        results = await asyncio.gather(first.take('p1'), second.take('p1'))
+        assert [post_data is not None for post_data in results].count(True) == 1
+
+        # Запоздалое обновление удаленного поста не оставляет обрывков
+        assert await second.update('p1', alternative="поздно") is None
+        assert await first.get('p1') is None and await first.count() == 0
+        # Промах take() не оставляет отметок и индексов
+        assert await first.take('missing') is None
+        assert not redis.data, redis.data
+
+    asyncio.run(scenario())
+    print("✅ Несколько процессов делят посты, публикация - ровно один раз")
+
+
+def test_sqlite_survives_restart():
+    """Тестирование сохранения постов между перезапусками"""
+    print("🔁 Тестирование перезапуска")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'posts.db')
+
+        async def before_restart():
+            store = create_post_store('sqlite', path)
+            post_data = make_post(7, "наука")
+            post_data['history'].push(ORIGINAL + " Следующее заседание - в июле.")
+            post_data['history'].undo()
+            await store.put('p1', post_data)
+            await store.update('p1', edit_current=True)
+            await store.close()
+
+        async def after_restart():
+            store = create_post_store('sqlite', path)
+            post_data = await store.get('p1')
+            await store.close()
+            return post_data
+
+        asyncio.run(before_restart())
+        post_data = asyncio.run(after_restart())
+
+        # Лимиты вне 'memory' не применяются, о чем предупреждает лог
+        warnings = []
+        with patch.object(post_store.logger, 'warning', warnings.append):
+            store = create_post_store('sqlite', path, max_posts=10)
+        asyncio.run(store.close())
+        assert len(warnings) == 1 and "max_posts=10" in warnings[0]
+
+        assert post_data['topic'] == "наука" and post_data['edit_current'] is True
+        assert isinstance(post_data['created_at'], datetime)
+        history = post_data['history']
+        assert history.index == 0 and history.can_redo
+        assert history.redo() == ORIGINAL + " Следующее заседание - в июле."
+
+        # Режим WAL записывается в сам файл базы
+        connection = sqlite3.connect(path)
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        connection.close()
+
+    try:
+        create_post_store('mongo')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Ожидался ValueError")
+
+    print("✅ Черновики и история правок переживают перезапуск")
+
+
+def main():
+    """Основная функция тестирования"""
+    print("🧪 Запуск тестов хранилища постов\n")
+
+    test_memory_store()
+    test_memory_limits()
+    test_post_record()
+    test_sqlite_store()
+    test_redis_store()
+    test_sqlite_survives_restart()
+
+    print("\n✅ Все тесты завершены!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Тестирование разбора и выбора вариантов поста
+"""
+
+from post_variants import html_violations, plural_ru, rank_variants, score_variant, split_variants
+
+GOOD = "<b>Центробанк сохранил ставку</b>\n\nРегулятор оставил ставку без изменений. <i>Кредиты пока не подешевеют.</i>"
+
+
+def test_split_variants():
+    """Тестирование разбора ответа модели"""
+    print("✂️ Тестирование разбора вариантов")
+
+    response = f"=== Вариант 1 ===\n{GOOD}\n===\n<b>Второй</b>\nТекст\n\n=====\n\n"
+    assert split_variants(response) == [GOOD, "<b>Второй</b>\nТекст"]
+    # Одинарные знаки равенства внутри текста не разделяют варианты
+    assert split_variants("<b>2 = 2</b>") == ["<b>2 = 2</b>"]
+
+    print("✅ Варианты разделены, пустые части отброшены")
+
+
+def test_plural_ru():
+    """Тестирование согласования числа вариантов в промпте"""
+    print("🔢 Тестирование форм слова")
+
+    forms = ('вариант', 'варианта', 'вариантов')
+    assert [plural_ru(n, forms) for n in (1, 2, 4, 5, 11, 12, 14, 21, 22, 25, 111)] == [
+        'вариант', 'варианта', 'варианта', 'вариантов', 'вариантов', 'вариантов',
+        'вариантов', 'вариант', 'варианта', 'вариантов', 'вариантов',
+    ]
+
+    print("✅ 2 варианта, 5 вариантов, 21 вариант")
+
+
+def test_html_violations():
+    """Тестирование проверки разметки"""
+    print("🏷️ Тестирование проверки разметки")
+
+    assert html_violations(GOOD) == []
+    violations = html_violations("**Заголовок**<br><i>текст <b>жирный</i> https://example.com")
+    assert "неподдерживаемые теги: ['br']" in violations
+    assert "несбалансированный тег </i>" in violations
+    assert "markdown-разметка" in violations
+    assert "прямые ссылки" in violations
+    assert "нет заголовка <b>" in violations
+
+    print("✅ Нарушения разметки найдены")
+
+
+def test_rank_variants():
+    """Тестирование выбора лучшего варианта"""
+    print("🏆 Тестирование выбора лучшего варианта")
+
+    too_long = "<b>Длинный</b>\n\n" + "Очень подробный текст. " * 80
+    broken = "**Заголовок**\n\n<div>Текст</div>" + GOOD[30:]
+    duplicate = GOOD.replace("сохранил", "оставил")
+
+    def overlap(content):
+        return 1.0 if "оставил ставку" in content and "Центробанк оставил" in content else 0.0
+
+    ranked = rank_variants([too_long, broken, duplicate, GOOD], max_length=200, overlap=overlap)
+    assert ranked[0][1] == GOOD
+    assert score_variant(GOOD, max_length=200) == 1.0
+    assert score_variant(GOOD) < 1.0  # Слишком короткий для лимита 1000
+    assert all(score < 1.0 for score, _ in ranked[1:])
+
+    # При равной оценке сохраняется порядок модели
+    other = GOOD.replace("Центробанк", "Банк России")
+    assert [text for _, text in rank_variants([other, GOOD], max_length=200)] == [other, GOOD]
+
+    print("✅ Лучший вариант не требует обрезки, чинки разметки и не повторяет опубликованное")
+
+
+def main():
+    """Основная функция тестирования"""
+    print("🧪 Запуск тестов вариантов поста\n")
+
+    test_split_variants()
+    test_plural_ru()
+    test_html_violations()
+    test_rank_variants()
+
+    print("\n✅ Все тесты завершены!")
+
+
+if __name__ == "__main__":
+    main()
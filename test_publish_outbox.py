@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Тестирование очереди публикаций
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+from publish_outbox import PublishOutbox
+
+
+class RetryAfter(Exception):
+    """Замена TelegramRetryAfter: Telegram требует паузу"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Flood control exceeded. Retry in {retry_after} seconds")
+        self.retry_after = retry_after
+
+
+class TelegramNetworkError(Exception):
+    """Замена временной сетевой ошибки aiogram"""
+
+
+class FakeChannels:
+    """Отправка в каналы с заранее заданными ошибками"""
+
+    def __init__(self, errors=None, delay: float = 0.0):
+        self.errors = dict(errors or {})
+        self.delay = delay
+        self.sent = []
+
+    async def send(self, chat_id, content, sources):
+        await asyncio.sleep(self.delay)
+        errors = self.errors.get(content)
+        if errors:
+            raise errors.pop(0)
+        self.sent.append((chat_id, content, time.monotonic()))
+        return f"опубликовано в {chat_id}"
+
+
+async def wait_for(condition, timeout: float = 3.0):
+    started = time.monotonic()
+    while not condition():
+        assert time.monotonic() - started < timeout, "Условие не выполнилось вовремя"
+        await asyncio.sleep(0.01)
+
+
+def test_retries():
+    """Тестирование RetryAfter, временных и окончательных ошибок"""
+    print("⏳ Тестирование повторов")
+
+    with tempfile.TemporaryDirectory() as directory:
+        async def scenario():
+            channels = FakeChannels({
+                'flood': [RetryAfter(0.3)],
+                'network': [TelegramNetworkError("Connection reset"), TelegramNetworkError("Connection reset")],
+                'forbidden': [Exception("Forbidden: bot is not a member of the channel chat")],
+            })
+            updates = []
+
+            async def on_update(job):
+                updates.append((job.content, job.status))
+
+            outbox = PublishOutbox(
+                channels.send, os.path.join(directory, 'outbox.db'), on_update,
+                chat_rpm=6000, base_delay=0.05
+            )
+            await outbox.start()
+
+            started = time.monotonic()
+            await outbox.enqueue('@news', 'flood')
+            # Пауза RetryAfter задерживает весь канал, но не другие каналы
+            await outbox.enqueue('@news', 'after')
+            await outbox.enqueue('@other', 'network')
+            await outbox.enqueue('@third', 'forbidden')
+            assert ('flood', 'queued') in updates
+
+            await wait_for(lambda: outbox.stats()['queued'] + outbox.stats()['sending'] == 0)
+            sent = {content: at - started for _, content, at in channels.sent}
+            assert 0.3 <= sent['flood'] < 0.6 and sent['after'] >= sent['flood']
+            assert sent['network'] < 0.3
+
+            stats = outbox.stats()
+            assert stats['published'] == 3 and stats['failed'] == 1 and stats['retries'] == 3
+            assert ('flood', 'retrying') in updates and ('forbidden', 'failed') in updates
+            assert updates.index(('flood', 'queued')) < updates.index(('flood', 'published'))
+            await outbox.close()
+
+        asyncio.run(scenario())
+    print("✅ Пауза Telegram выдерживается, временные ошибки повторяются")
+
+
+def test_rate_limits():
+    """Тестирование лимитов отправки"""
+    print("🚦 Тестирование лимитов")
+
+    with tempfile.TemporaryDirectory() as directory:
+        async def scenario():
+            channels = FakeChannels(delay=0.05)
+            outbox = PublishOutbox(
+                channels.send, os.path.join(directory, 'outbox.db'), chat_rpm=600, global_rps=1000
+            )
+            await outbox.start()
+            started = time.monotonic()
+            for i in range(3):
+                await outbox.enqueue('@news', f"пост {i}")
+            jobs = await outbox.enqueue_many([(chat, "региональный пост") for chat in ('@a', '@b', '@c')])
+            assert all(job.group is jobs for job in jobs) and len({job.group_id for job in jobs}) == 1
+            await wait_for(lambda: len(channels.sent) == 6)
+
+            # В один канал - по порядку и не чаще лимита, разные каналы - параллельно
+            news = [(content, at - started) for chat, content, at in channels.sent if chat == '@news']
+            assert [content for content, _ in news] == ["пост 0", "пост 1", "пост 2"]
+            # Допуск на пробуждение задач: отправка отмечается после паузы FakeChannels
+            assert news[2][1] - news[0][1] >= 0.19
+            # Все каналы группы получают пост почти одновременно, а не по очереди
+            regional = [at for chat, _, at in channels.sent if chat != '@news']
+            assert max(regional) - min(regional) < 0.04
+            await outbox.close()
+
+        asyncio.run(scenario())
+    print("✅ Лимит на канал и общий лимит соблюдаются")
+
+
+def test_group_updates():
+    """Тестирование уведомлений о публикации в нескольких каналах"""
+    print("📣 Тестирование публикации в несколько каналов")
+
+    with tempfile.TemporaryDirectory() as directory:
+        async def scenario():
+            channels = FakeChannels({'spb': [Exception("Bad Request: chat not found")]}, delay=0.02)
+            snapshots = []
+
+            async def on_update(job):
+                snapshots.append({member.chat_id: member.status for member in job.group})
+                await asyncio.sleep(0.01)
+
+            outbox = PublishOutbox(channels.send, os.path.join(directory, 'outbox.db'), on_update)
+            await outbox.start()
+            await outbox.enqueue_many([('@main', 'main'), ('@spb', 'spb'), ('@ekb', 'ekb')], notify={'message_id': 1})
+            await wait_for(lambda: len(snapshots) == 4 and not outbox._notify_locks)
+
+            # Первое уведомление - постановка всей группы, последнее - итог по каждому каналу
+            assert snapshots[0] == {'@main': 'queued', '@spb': 'queued', '@ekb': 'queued'}
+            assert snapshots[-1] == {'@main': 'published', '@spb': 'failed', '@ekb': 'published'}
+            await outbox.close()
+
+        asyncio.run(scenario())
+    print("✅ Итог публикации собирается по каждому каналу")
+
+
+def test_survives_restart():
+    """Тестирование сохранения очереди между перезапусками"""
+    print("🔁 Тестирование перезапуска")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'outbox.db')
+
+        async def before_restart():
+            # Telegram недоступен дольше, чем живет процесс
+            channels = FakeChannels({'пост': [RetryAfter(60)]})
+            outbox = PublishOutbox(channels.send, path)
+            await outbox.start()
+            await outbox.enqueue(-100123, 'пост', ["Ставка ЦБ"], notify={'chat_id': 1, 'message_id': 2})
+            await wait_for(lambda: outbox.stats()['retries'] == 1)
+            await outbox.close()
+
+        async def after_restart():
+            channels = FakeChannels()
+            updates = []
+
+            async def on_update(job):
+                updates.append(job)
+
+            outbox = PublishOutbox(channels.send, path, on_update, clock=lambda: time.time() + 61)
+            await outbox.start()
+            await wait_for(lambda: channels.sent)
+            await wait_for(lambda: updates)
+            await outbox.close()
+            return channels.sent, updates[0]
+
+        asyncio.run(before_restart())
+        sent, job = asyncio.run(after_restart())
+        assert [(chat, content) for chat, content, _ in sent] == [('-100123', 'пост')]
+        assert job.status == 'published' and job.notify == {'chat_id': 1, 'message_id': 2}
+        assert job.sources == ["Ставка ЦБ"] and job.attempts == 1
+
+        # Отправленная публикация удалена из базы
+        async def reopen():
+            outbox = PublishOutbox(FakeChannels().send, path)
+            await outbox.start()
+            stats = outbox.stats()
+            await outbox.close()
+            return stats
+
+        assert asyncio.run(reopen())['queued'] == 0
+    print("✅ Подтвержденный пост публикуется после перезапуска")
+
+
+def test_group_survives_restart():
+    """Тестирование итога группы, часть которой отправлена до перезапуска"""
+    print("🧩 Тестирование группы после перезапуска")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'outbox.db')
+        first_published = []
+
+        def record(job):
+            # Как в боте: пост попадает в индекс при первой успешной отправке группы
+            if job.status == 'published' and sum(member.status == 'published' for member in job.group) == 1:
+                first_published.append(job.chat_id)
+
+        async def before_restart():
+            channels = FakeChannels({
+                'spb': [RetryAfter(60)],
+                'ekb': [Exception("Bad Request: chat not found")],
+            })
+
+            async def on_update(job):
+                record(job)
+
+            outbox = PublishOutbox(channels.send, path, on_update)
+            await outbox.start()
+            await outbox.enqueue_many([('@main', 'main'), ('@spb', 'spb'), ('@ekb', 'ekb')], notify={'message_id': 1})
+            await wait_for(lambda: outbox.stats()['published'] == 1 and outbox.stats()['failed'] == 1)
+            await wait_for(lambda: outbox.stats()['retries'] == 1)
+            await outbox.close()
+
+        async def after_restart():
+            updates = []
+
+            async def on_update(job):
+                record(job)
+                updates.append({member.chat_id: (member.status, member.result) for member in job.group})
+
+            outbox = PublishOutbox(FakeChannels().send, path, on_update, clock=lambda: time.time() + 61)
+            await outbox.start()
+            assert outbox.stats()['queued'] == 1
+            await wait_for(lambda: updates)
+            await outbox.close()
+            return updates[-1], outbox
+
+        asyncio.run(before_restart())
+        summary, outbox = asyncio.run(after_restart())
+
+        # Итог включает каналы, завершенные до перезапуска, а пост учтен один раз
+        assert summary == {
+            '@main': ('published', "опубликовано в @main"),
+            '@spb': ('published', "опубликовано в @spb"),
+            '@ekb': ('failed', None),
+        }
+        assert first_published == ['@main']
+
+        # Завершенная группа удалена из базы целиком
+        assert outbox._connect().execute("SELECT COUNT(*) FROM publish_outbox").fetchone()[0] == 0
+        outbox._close()
+    print("✅ Каналы, отправленные до перезапуска, остаются в итоге публикации")
+
+
+def test_shared_outbox():
+    """Тестирование нескольких процессов с общей базой очереди"""
+    print("🤝 Тестирование общей очереди")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'outbox.db')
+
+        async def scenario():
+            # Первый процесс завис на отправке
+            first_channels = FakeChannels(delay=30)
+            first = PublishOutbox(first_channels.send, path, lease=0.3, owner='first')
+            await first.start()
+            await first.enqueue(-100123, 'пост')
+            await wait_for(lambda: first.stats()['sending'] == 1)
+
+            # Второй процесс не трогает публикацию, пока первый продлевает аренду
+            second_channels = FakeChannels()
+            second = PublishOutbox(second_channels.send, path, lease=0.3, owner='second')
+            await second.start()
+            await asyncio.sleep(0.6)
+            assert second.stats()['queued'] == 0 and second_channels.sent == []
+
+            # Первый процесс упал: после истечения аренды публикацию отправляет второй
+            await first.close()
+            await wait_for(lambda: second_channels.sent)
+            await second.close()
+
+            # Процесс с тем же владельцем после перезапуска забирает свое сразу
+            stuck = PublishOutbox(FakeChannels(delay=30).send, path, lease=60, owner='third')
+            await stuck.start()
+            await stuck.enqueue(-100123, 'второй пост')
+            await stuck.close()
+            restarted = PublishOutbox(FakeChannels().send, path, lease=60, owner='third')
+            await restarted.start()
+            queued = restarted.stats()['queued']
+            await restarted.close()
+            return second_channels.sent, queued
+
+        sent, queued = asyncio.run(scenario())
+        assert [(chat, content) for chat, content, _ in sent] == [('-100123', 'пост')]
+        assert queued == 1
+    print("✅ Публикация живого процесса не уходит повторно, брошенная - подбирается")
+
+
+def main():
+    """Основная функция тестирования"""
+    print("🧪 Запуск тестов очереди публикаций\n")
+
+    test_retries()
+    test_rate_limits()
+    test_group_updates()
+    test_survives_restart()
+    test_group_survives_restart()
+    test_shared_outbox()
+
+    print("\n✅ Все тесты завершены!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Тестирование общего ограничителя запросов к OpenAI
+"""
+
+import asyncio
+import threading
+import time
+
+from rate_limiter import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_GENERATION,
+    PRIORITY_INTERACTIVE,
+    RateLimiter,
+    current_priority,
+    priority_scope,
+    usage_tokens,
+)
+from resilient_call import ResilientCaller
+
+
+class FakeUsage:
+    def __init__(self, total_tokens: int):
+        self.total_tokens = total_tokens
+
+
+class FakeCompletion:
+    """Ответ с usage, как у chat.completions.create"""
+
+    def __init__(self, total_tokens: int):
+        self.usage = FakeUsage(total_tokens)
+
+
+def test_priority_order():
+    """Тестирование порядка выдачи разрешений по приоритетам"""
+    print("🚦 Тестирование приоритетов")
+
+    async def scenario():
+        # Корзина запросов пуста: все встают в очередь и получают разрешение по одному
+        limiter = RateLimiter(rpm=600, tpm=100000)
+        limiter._requests = 0
+        order = []
+
+        async def request(name, priority):
+            await limiter.acquire(10, priority)
+            order.append(name)
+
+        tasks = [
+            asyncio.ensure_future(request('фон', PRIORITY_BACKGROUND)),
+            asyncio.ensure_future(request('генерация', PRIORITY_GENERATION)),
+            asyncio.ensure_future(request('правка', PRIORITY_INTERACTIVE)),
+        ]
+        await asyncio.sleep(0.01)
+        depth = limiter.metrics()['queue_depth']
+        assert depth == {'interactive': 1, 'generation': 1, 'background': 1}
+
+        await asyncio.wait_for(asyncio.gather(*tasks), 2)
+        assert order == ['правка', 'генерация', 'фон']
+
+        metrics = limiter.metrics()
+        assert sum(metrics['queue_depth'].values()) == 0
+        assert metrics['granted']['background'] == 1
+        assert metrics['avg_wait']['background'] > metrics['avg_wait']['interactive']
+
+    asyncio.run(scenario())
+    print("✅ Правки получают разрешение раньше генерации и фона")
+
+
+def test_tokens_and_settle():
+    """Тестирование корзины токенов и учета фактического расхода"""
+    print("🪙 Тестирование токенов")
+
+    limiter = RateLimiter(rpm=1000, tpm=6000)
+    first = limiter.acquire_sync(5000, PRIORITY_GENERATION)
+
+    # Оценка завышена: возврат остатка сразу пропускает следующий запрос
+    limiter.settle(first, 1000)
+    started = time.monotonic()
+    limiter.acquire_sync(4000, PRIORITY_GENERATION)
+    assert time.monotonic() - started < 0.05
+
+    # Токенов не хватает: запрос ждет пополнения корзины (100 токенов/с)
+    started = time.monotonic()
+    limiter.acquire_sync(1030, PRIORITY_GENERATION)
+    assert 0.1 < time.monotonic() - started < 1.0
+
+    # Оценка больше всей корзины не блокирует очередь навсегда
+    big = RateLimiter(rpm=1000, tpm=100)
+    big.acquire_sync(500, PRIORITY_GENERATION)
+
+    assert usage_tokens(FakeCompletion(140)) == 140
+    assert usage_tokens(object()) is None
+    print("✅ Оценка заменяется фактическим расходом, корзина пополняется со временем")
+
+
+def test_cancelled_waiter():
+    """Тестирование отмены ожидающего запроса"""
+    print("🛑 Тестирование отмены")
+
+    async def scenario():
+        limiter = RateLimiter(rpm=60, tpm=100000)
+        limiter._requests = 0
+        waiter = asyncio.ensure_future(limiter.acquire(10, PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.sleep(0.01)
+        assert sum(limiter.metrics()['queue_depth'].values()) == 0
+
+    asyncio.run(scenario())
+
+    # Блокирующее ожидание ограничено таймаутом и дедлайном обертки
+    limiter = RateLimiter(rpm=60, tpm=100000)
+    limiter._requests = 0
+    started = time.monotonic()
+    try:
+        limiter.acquire_sync(10, PRIORITY_GENERATION, timeout=0.05)
+        assert False, "ожидалась ошибка TimeoutError"
+    except TimeoutError:
+        pass
+    assert time.monotonic() - started < 0.5
+    assert sum(limiter.metrics()['queue_depth'].values()) == 0
+
+    caller = ResilientCaller(limiter=limiter, deadline=0.1)
+    started = time.monotonic()
+    try:
+        caller.call_sync(lambda: FakeCompletion(10), tokens=10)
+        assert False, "ожидалась ошибка TimeoutError"
+    except TimeoutError:
+        pass
+    assert time.monotonic() - started < 0.5
+    print("✅ Отмененный или не дождавшийся запрос уходит из очереди")
+
+
+def test_priority_scope():
+    """Тестирование приоритета из контекста и обертки вызовов"""
+    print("🧭 Тестирование контекста приоритета")
+
+    assert current_priority(PRIORITY_GENERATION) == PRIORITY_GENERATION
+    with priority_scope(PRIORITY_BACKGROUND):
+        assert current_priority(PRIORITY_INTERACTIVE) == PRIORITY_BACKGROUND
+    assert current_priority(PRIORITY_INTERACTIVE) == PRIORITY_INTERACTIVE
+
+    limiter = RateLimiter(rpm=1000, tpm=10000)
+    caller = ResilientCaller(limiter=limiter, priority=PRIORITY_INTERACTIVE)
+    with priority_scope(PRIORITY_BACKGROUND):
+        assert caller.call_sync(lambda: FakeCompletion(300), tokens=2000).usage.total_tokens == 300
+    metrics = limiter.metrics()
+    assert metrics['granted']['background'] == 1 and metrics['granted']['interactive'] == 0
+    # Списан фактический расход, а не оценка
+    assert 9600 < metrics['tokens_available'] <= 10000
+
+    # Блокирующие вызовы из разных потоков делят одну корзину
+    limiter = RateLimiter(rpm=60, tpm=100000)
+    threads = [threading.Thread(target=limiter.acquire_sync, args=(1, PRIORITY_GENERATION)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(2)
+    assert limiter.metrics()['granted']['generation'] == 3
+
+    print("✅ priority_scope переопределяет приоритет обертки")
+
+
+def main():
+    """Основная функция тестирования"""
+    print("🧪 Запуск тестов ограничителя запросов\n")
+
+    test_priority_order()
+    test_tokens_and_settle()
+    test_cancelled_waiter()
+    test_priority_scope()
+
+    print("\n✅ Все тесты завершены!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Тестирование повторов и хеджирования вызовов модели
+"""
+
+import asyncio
+import threading
+import time
+
+from generation_pool import PerThread
+from resilient_call import ResilientCaller, is_transient
+
+
+class FakeAPIError(Exception):
+    """Ошибка API с HTTP-статусом, как у openai.APIStatusError"""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+class APITimeoutError(Exception):
+    """Класс с тем же именем, что и таймаут openai"""
+
+
+def test_is_transient():
+    """Тестирование классификации ошибок"""
+    print("🔎 Тестирование классификации ошибок")
+
+    assert is_transient(FakeAPIError(500)) and is_transient(FakeAPIError(429))
+    assert not is_transient(FakeAPIError(400)) and not is_transient(FakeAPIError(401))
+    assert is_transient(APITimeoutError()) and is_transient(TimeoutError())
+    assert not is_transient(ValueError("пустой ответ"))
+
+    print("✅ Повторяются только временные ошибки")
+
+
+def test_retries():
+    """Тестирование повторов"""
+    print("🔁 Тестирование повторов")
+
+    async def scenario():
+        caller = ResilientCaller(attempts=3, base_delay=0.001)
+        calls = 0
+
+        async def flaky():
+            nonlocal calls
+            calls += 1
+            if calls < 3:
+                raise FakeAPIError(503)
+            return "ok"
+
+        assert await caller.call(flaky) == "ok"
+        assert calls == 3 and caller.retries == 2
+
+        # Постоянные ошибки не повторяются
+        calls = 0
+
+        async def bad_request():
+            nonlocal calls
+            calls += 1
+            raise FakeAPIError(400)
+
+        try:
+            await caller.call(bad_request)
+        except FakeAPIError:
+            pass
+        assert calls == 1
+
+    asyncio.run(scenario())
+
+    # Блокирующий вариант для Agent.run
+    caller = ResilientCaller(attempts=2, base_delay=0.001)
+    attempts = []
+
+    def flaky_sync(prompt):
+        attempts.append(prompt)
+        if len(attempts) == 1:
+            raise ConnectionError("сброс соединения")
+        return prompt.upper()
+
+    assert caller.call_sync(flaky_sync, "пост") == "ПОСТ" and len(attempts) == 2
+
+    print("✅ Временные ошибки повторяются, постоянные - нет")
+
+
+def test_deadline():
+    """Тестирование дедлайна"""
+    print("⏱️ Тестирование дедлайна")
+
+    async def scenario():
+        caller = ResilientCaller(attempts=10, deadline=0.2, base_delay=0.05)
+
+        async def slow():
+            await asyncio.sleep(1)
+
+        started = time.perf_counter()
+        try:
+            await caller.call(slow)
+        except TimeoutError:
+            pass
+        else:
+            raise AssertionError("Ожидался TimeoutError")
+        assert time.perf_counter() - started < 0.5
+
+    asyncio.run(scenario())
+    print("✅ Вызов с повторами укладывается в дедлайн")
+
+
+def test_hedging():
+    """Тестирование хеджирования медленных вызовов"""
+    print("🏁 Тестирование хеджирования")
+
+    async def scenario():
+        caller = ResilientCaller(hedge=True, min_samples=5)
+        for _ in range(10):
+            caller.latencies.record(0.01)
+
+        delays = iter([1.0, 0.01])
+        cancelled = []
+
+        async def request():
+            delay = next(delays)
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                cancelled.append(delay)
+                raise
+            return delay
+
+        started = time.perf_counter()
+        assert await caller.call(request) == 0.01
+        assert time.perf_counter() - started < 0.2
+        assert caller.hedges == 1 and caller.hedge_wins == 1
+        await asyncio.sleep(0)
+        assert cancelled == [1.0]
+
+    asyncio.run(scenario())
+
+    # Блокирующий вариант: дубль уходит в соседний поток
+    caller = ResilientCaller(hedge=True, min_samples=5)
+    for _ in range(10):
+        caller.latencies.record(0.01)
+    delays = iter([0.5, 0.01])
+
+    def blocking_request():
+        delay = next(delays)
+        time.sleep(delay)
+        return delay
+
+    started = time.perf_counter()
+    assert caller.call_sync(blocking_request) == 0.01
+    assert time.perf_counter() - started < 0.3
+
+    print("✅ Дубль медленного запроса отвечает первым, основной отменяется")
+
+
+class StatefulAgent:
+    """Агент, который, как Agent из agno, хранит ответ запуска в себе"""
+
+    def __init__(self):
+        self.run_response = None
+
+    def run(self, prompt: str, delay: float) -> str:
+        self.run_response = prompt
+        time.sleep(delay)
+        return self.run_response
+
+
+def test_hedging_stateful_agents():
+    """Тестирование хеджирования вызовов агентов, созданных на поток"""
+    print("🧵 Тестирование хеджирования агентов")
+
+    caller = ResilientCaller(hedge=True, min_samples=5)
+    for _ in range(10):
+        caller.latencies.record(0.01)
+    agents = PerThread(StatefulAgent)
+    # Основные запросы медленные, дубли быстрые: оба идут одновременно
+    delays = iter([0.3, 0.3, 0.02, 0.02, 0.02, 0.02])
+    lock = threading.Lock()
+
+    def run_agent(prompt):
+        with lock:
+            delay = next(delays)
+        # Агент берется в потоке, где выполняется попытка
+        return agents.get().run(prompt, delay)
+
+    results = {}
+
+    def request(prompt):
+        results[prompt] = caller.call_sync(run_agent, prompt)
+
+    threads = [threading.Thread(target=request, args=(prompt,)) for prompt in ("первый", "второй")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(2)
+    assert results == {"первый": "первый", "второй": "второй"}
+    assert caller.hedges == 2
+    print("✅ Основной запрос и дубль не делят состояние агента")
+
+
+def main():
+    """Основная функция тестирования"""
+    print("🧪 Запуск тестов повторов и хеджирования\n")
+
+    test_is_transient()
+    test_retries()
+    test_deadline()
+    test_hedging()
+    test_hedging_stateful_agents()
+
+    print("\n✅ Все тесты завершены!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Тестирование потокового превью и чтения блокирующего потока в отдельном потоке
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+
+from stream_preview import StreamingPreview, iterate_in_thread
+
+request_tag = contextvars.ContextVar('request_tag', default=None)
+
+
+class FakeMessage:
+    """Замена сообщения aiogram, запоминающая правки"""
+
+    def __init__(self, errors=None):
+        self.edits = []
+        self.errors = list(errors or [])
+
+    async def edit_text(self, text):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.edits.append(text)
+
+
+class RetryAfter(Exception):
+    """Замена TelegramRetryAfter"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Flood control exceeded. Retry in {retry_after} seconds")
+        self.retry_after = retry_after
+
+
+def test_preview_throttling():
+    """Тестирование частоты правок и показа только завершенных предложений"""
+    print("⏱️ Тестирование частоты правок")
+
+    async def scenario():
+        message = FakeMessage()
+        preview = StreamingPreview(message, header="✍️ Пишу пост...", min_interval=0.1)
+
+        # Незавершенное предложение не показывается
+        await preview.feed("Центробанк сохранил")
+        assert message.edits == []
+
+        await preview.feed(" ставку. Инфляция")
+        assert message.edits == ["✍️ Пишу пост...\n\nЦентробанк сохранил ставку. ▌"]
+
+        # Внутри интервала новые предложения копятся без правок
+        await preview.feed(" замедляется. Рубль")
+        await preview.feed(" укрепился. Нефть")
+        assert len(message.edits) == 1
+
+        await asyncio.sleep(0.12)
+        await preview.feed(" дорожает")
+        assert message.edits[-1].endswith("Рубль укрепился. ▌") and preview.edits == 2
+
+        # Итоговый текст - весь поток, включая хвост без точки
+        assert preview.text == "Центробанк сохранил ставку. Инфляция замедляется. Рубль укрепился. Нефть дорожает"
+        assert preview.first_edit_after is not None
+
+        # Смена заголовка показывается сразу, несмотря на интервал
+        await preview.set_header("✅ Готово")
+        assert message.edits[-1].startswith("✅ Готово\n\nЦентробанк") and preview.edits == 3
+
+    asyncio.run(scenario())
+    print("✅ Правки не чаще min_interval, показываются только завершенные предложения")
+
+
+def test_preview_retry_after():
+    """Тестирование паузы, которую требует Telegram"""
+    print("🚦 Тестирование RetryAfter")
+
+    async def scenario():
+        message = FakeMessage(errors=[RetryAfter(0.2)])
+        preview = StreamingPreview(message, min_interval=0.01)
+
+        # Ошибка правки не прерывает генерацию
+        await preview.feed("Первое. ")
+        assert message.edits == [] and preview.edits == 0
+
+        await asyncio.sleep(0.05)
+        await preview.feed("Второе. ")
+        assert message.edits == []
+
+        await asyncio.sleep(0.2)
+        await preview.feed("Третье. ")
+        assert message.edits == ["Первое. Второе. Третье. ▌"]
+
+    asyncio.run(scenario())
+    print("✅ После RetryAfter правки возобновляются через указанную паузу")
+
+
+def test_iterate_in_thread():
+    """Тестирование порядка, контекста и ошибок блокирующего генератора"""
+    print("🧵 Тестирование iterate_in_thread")
+
+    def tokens(count, fail_after=None):
+        for i in range(count):
+            if i == fail_after:
+                raise ValueError("обрыв потока")
+            time.sleep(0.001)
+            yield f"{request_tag.get()}:{i}"
+
+    async def collect(*args):
+        return [item async for item in iterate_in_thread(tokens, *args)]
+
+    async def scenario():
+        request_tag.set("interactive")
+        assert await collect(5) == [f"interactive:{i}" for i in range(5)]
+
+        received = []
+        try:
+            async for item in iterate_in_thread(tokens, 5, 2):
+                received.append(item)
+        except ValueError as e:
+            assert str(e) == "обрыв потока"
+        else:
+            raise AssertionError("Ожидалась ошибка из потока генерации")
+        assert received == ["interactive:0", "interactive:1"]
+
+    asyncio.run(scenario())
+    print("✅ Элементы приходят по порядку, контекст и ошибки передаются из потока")
+
+
+def test_iterate_in_thread_stops_producer():
+    """Тестирование остановки генератора, когда потребитель прекратил чтение"""
+    print("🛑 Тестирование остановки генерации")
+
+    produced = []
+    closed = threading.Event()
+
+    def endless():
+        try:
+            while True:
+                produced.append(len(produced))
+                time.sleep(0.005)
+                yield produced[-1]
+        finally:
+            closed.set()
+
+    async def scenario():
+        stream = iterate_in_thread(endless)
+        async for item in stream:
+            if item == 2:
+                break
+        await stream.aclose()
+
+        # Отмена задачи-потребителя тоже останавливает поток
+        async def consume():
+            async for _ in iterate_in_thread(endless):
+                pass
+
+        closed.clear()
+        task = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.03)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(scenario())
+    assert closed.wait(1.0)
+    count = len(produced)
+    time.sleep(0.05)
+    assert len(produced) == count
+    print("✅ Генератор в потоке останавливается вместе с потребителем")
+
+
+def main():
+    """Основная функция тестирования"""
+    print("🧪 Запуск тестов потокового превью\n")
+
+    test_preview_throttling()
+    test_preview_retry_after()
+    test_iterate_in_thread()
+    test_iterate_in_thread_stops_producer()
+
+    print("\n✅ Все тесты завершены!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Тестирование однопроходной очистки HTML для Telegram
+"""
+
+import re
+
+from telegram_html import sanitize_html, utf16_length, visible_length
+
+TAG = re.compile(r'<(/?)([a-z-]+)[^>]*>')
+
+
+def assert_balanced(content: str):
+    """Проверить, что теги закрыты в правильном порядке и сущности целые"""
+    stack = []
+    for closing, name in TAG.findall(content):
+        if closing:
+            assert stack and stack.pop() == name, content
+        else:
+            stack.append(name)
+    assert not stack, content
+    assert re.search(r'&(?!amp;|lt;|gt;|quot;|#\d+;)', content) is None, content
+
+
+def test_tags_and_markup():
+    """Тестирование белого списка тегов и удаления разметки"""
+    print("🏷️ Тестирование тегов и разметки")
+
+    result = sanitize_html(
+        "<b>Заголовок</b><br><br><div>Текст</div> **важно** и #тег, "
+        "детали https://example.com/a?b=1&c=2 в блоге. <i>Курсив <u>вложенный</i> хвост"
+    )
+    assert result == (
+        "<b>Заголовок</b>\n\nТекст важно и тег, детали в блоге. "
+        "<i>Курсив <u>вложенный</u></i> хвост"
+    )
+    assert_balanced(result)
+
+    # Ссылки в <a href> и содержимое <code> сохраняются
+    result = sanitize_html('<a href="https://example.com">сайт</a> <code>a_b *c*</code> 1 < 2 & 3')
+    assert result == '<a href="https://example.com">сайт</a> <code>a_b *c*</code> 1 &lt; 2 &amp; 3'
+
+    # Именованные сущности вне списка Telegram заменяются символами
+    result = sanitize_html("<b>Итог&nbsp;дня</b> &mdash; &laquo;рост&raquo; &copy; AT&amp;T &#8212; &fake;")
+    assert result == "<b>Итог\xa0дня</b> — «рост» © AT&amp;T &#8212; &amp;fake;", result
+    assert_balanced(result)
+    assert visible_length(result) == visible_length("<b>Итог&nbsp;дня</b> &mdash; &laquo;рост&raquo; &copy; AT&amp;T &#8212; &fake;")
+
+    print("✅ Лишние теги и markdown удалены, теги сбалансированы")
+
+
+def test_newlines_preserved():
+    """Тестирование сохранения абзацев"""
+    print("↩️ Тестирование переносов строк")
+
+    result = sanitize_html("  <b>Заголовок</b>  \n \n\n\n  Первый   абзац.\nСтрока\n\nВторой абзац.\n")
+    assert result == "<b>Заголовок</b>\n\nПервый абзац.\nСтрока\n\nВторой абзац."
+
+    print("✅ Пробелы сжаты, абзацы сохранены")
+
+
+def test_utf16_length():
+    """Тестирование подсчета длины как в Telegram"""
+    print("📏 Тестирование длины в UTF-16")
+
+    assert utf16_length("Привет") == 6
+    assert utf16_length("🚀") == 2
+    assert visible_length("<b>AT&amp;T</b> 🚀") == 7
+
+    result = sanitize_html("🚀" * 10, max_length=9)
+    assert result == "🚀" * 4 + "…"
+    assert visible_length(result) <= 9
+
+    print("✅ Эмодзи считаются двумя единицами")
+
+
+def test_truncation_boundaries():
+    """Тестирование обрезки по границам предложений и слов"""
+    print("✂️ Тестирование обрезки")
+
+    post = (
+        "<b>Главное за день</b>\n\n"
+        "Центробанк сохранил ставку. Инфляция замедляется второй месяц подряд. "
+        "<i>Вывод: кредиты <b>не подешевеют</b> до осени &amp; позже</i>"
+    )
+    for max_length in range(10, len(post), 7):
+        result = sanitize_html(post, max_length=max_length)
+        assert visible_length(result) <= max_length, (max_length, result)
+        assert_balanced(result)
+
+    assert sanitize_html(post, max_length=60) == (
+        "<b>Главное за день</b>\n\nЦентробанк сохранил ставку."
+    )
+    assert sanitize_html("<b>слово слово слово слово слово", max_length=20) == "<b>слово слово слово…</b>"
+
+    print("✅ Теги и сущности не разрезаются, открытые теги закрываются")
+
+
+def main():
+    """Основная функция тестирования"""
+    print("🧪 Запуск тестов очистки HTML\n")
+
+    test_tags_and_markup()
+    test_newlines_preserved()
+    test_utf16_length()
+    test_truncation_boundaries()
+
+    print("\n✅ Все тесты завершены!")
+
+
+if __name__ == "__main__":
+    main()